@@ -0,0 +1,27 @@
+"""add documents content_hash
+
+Revision ID: 3f1a7c2b9d40
+Revises: 9e5c10d4eb29
+Create Date: 2026-10-17 09:12:41.518302
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1a7c2b9d40"
+down_revision: Union[str, Sequence[str], None] = "9e5c10d4eb29"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("content_hash", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "content_hash")
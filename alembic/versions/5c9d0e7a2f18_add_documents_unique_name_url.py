@@ -0,0 +1,69 @@
+"""add unique indexes on documents name and url
+
+Revision ID: 5c9d0e7a2f18
+Revises: b84e2d6f1c37
+Create Date: 2026-10-17 11:26:52.340871
+
+"""
+
+import logging
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c9d0e7a2f18"
+down_revision: Union[str, Sequence[str], None] = "b84e2d6f1c37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# Rows submitted twice with the same name and url by concurrent submits: keep one per pair, preferring a
+# SUCCESS row, then the most recently updated one, then the lowest uuid (so reruns pick the same row).
+DELETE_EXACT_DUPLICATES = """
+DELETE FROM documents d
+USING (
+    SELECT document_uuid,
+           row_number() OVER (
+               PARTITION BY name, url
+               ORDER BY status = 'SUCCESS' DESC, updated_at DESC, document_uuid
+           ) AS rank
+    FROM documents
+) ranked
+WHERE d.document_uuid = ranked.document_uuid AND ranked.rank > 1
+"""
+
+# A name (url) left on several rows now has different urls (names): which document is right is not ours to guess.
+SHARED_VALUES = """
+SELECT '{column}' AS column_name, {column} AS value, count(*) AS documents
+FROM documents GROUP BY {column} HAVING count(*) > 1
+ORDER BY documents DESC, value LIMIT 10
+"""
+
+
+def upgrade() -> None:
+    # Smart submission already refused name/url reuse; these make it race-free and back the upsert.
+    conn = op.get_bind()
+    deleted = conn.execute(sa.text(DELETE_EXACT_DUPLICATES)).rowcount
+    if deleted:
+        logger.info(f"Deleted {deleted} duplicate documents (same name and url) before adding the unique indexes")
+
+    clashes = [row for column in ("name", "url") for row in conn.execute(sa.text(SHARED_VALUES.format(column=column)))]
+    if clashes:
+        examples = "\n".join(f"  {column} {value!r}: {count} documents" for column, value, count in clashes)
+        raise RuntimeError(
+            "Cannot add unique indexes on documents.name and documents.url: some values are shared by documents "
+            f"that differ in the other column, e.g.\n{examples}\n"
+            "Rename or delete the extra documents, then run the migration again."
+        )
+
+    op.create_index("ux_documents_name", "documents", ["name"], unique=True)
+    op.create_index("ux_documents_url", "documents", ["url"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ux_documents_url", table_name="documents")
+    op.drop_index("ux_documents_name", table_name="documents")
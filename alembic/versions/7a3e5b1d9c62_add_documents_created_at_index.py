@@ -0,0 +1,27 @@
+"""add documents (created_at, document_uuid) index
+
+Revision ID: 7a3e5b1d9c62
+Revises: 5c9d0e7a2f18
+Create Date: 2026-10-17 12:08:05.114629
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7a3e5b1d9c62"
+down_revision: Union[str, Sequence[str], None] = "5c9d0e7a2f18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backs list ordering (created_at DESC, document_uuid DESC) and keyset pagination (scanned backwards).
+    op.create_index("ix_documents_created_at_uuid", "documents", ["created_at", "document_uuid"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_created_at_uuid", table_name="documents")
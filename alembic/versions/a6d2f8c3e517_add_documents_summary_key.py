@@ -0,0 +1,28 @@
+"""add documents summary_key
+
+Revision ID: a6d2f8c3e517
+Revises: f2a7c4e9b813
+Create Date: 2026-10-18 14:22:09.517364
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a6d2f8c3e517"
+down_revision: Union[str, Sequence[str], None] = "f2a7c4e9b813"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Left NULL on existing rows: their next run re-fetches the page in full instead of revalidating it
+    op.add_column("documents", sa.Column("summary_key", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "summary_key")
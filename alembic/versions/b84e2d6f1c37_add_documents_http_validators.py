@@ -0,0 +1,29 @@
+"""add documents etag and last_modified
+
+Revision ID: b84e2d6f1c37
+Revises: 3f1a7c2b9d40
+Create Date: 2026-10-17 10:03:17.906145
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b84e2d6f1c37"
+down_revision: Union[str, Sequence[str], None] = "3f1a7c2b9d40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("etag", sa.String(), nullable=True))
+    op.add_column("documents", sa.Column("last_modified", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "last_modified")
+    op.drop_column("documents", "etag")
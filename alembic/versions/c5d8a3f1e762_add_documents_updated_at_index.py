@@ -0,0 +1,27 @@
+"""add documents updated_at index
+
+Revision ID: c5d8a3f1e762
+Revises: e41b7c9a0d25
+Create Date: 2026-10-17 23:42:10.276031
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d8a3f1e762"
+down_revision: Union[str, Sequence[str], None] = "e41b7c9a0d25"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backs the scheduled refresh: stale documents are read oldest first in small batches.
+    op.create_index("ix_documents_updated_at", "documents", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_updated_at", table_name="documents")
@@ -0,0 +1,27 @@
+"""add documents truncated flag
+
+Revision ID: e41b7c9a0d25
+Revises: 7a3e5b1d9c62
+Create Date: 2026-10-17 15:21:44.503118
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e41b7c9a0d25"
+down_revision: Union[str, Sequence[str], None] = "7a3e5b1d9c62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("truncated", sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "truncated")
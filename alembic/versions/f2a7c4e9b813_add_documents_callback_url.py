@@ -0,0 +1,27 @@
+"""add documents callback url
+
+Revision ID: f2a7c4e9b813
+Revises: c5d8a3f1e762
+Create Date: 2026-10-18 00:05:31.842907
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a7c4e9b813"
+down_revision: Union[str, Sequence[str], None] = "c5d8a3f1e762"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("callback_url", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "callback_url")
@@ -0,0 +1,161 @@
+"""Throughput benchmarks for the worker pipeline and the HTTP API, against local stub services.
+
+    PYTHONPATH=src python -m benchmarks.run worker --jobs 200 --concurrency 20
+    PYTHONPATH=src python -m benchmarks.run api --api-url http://localhost:8000 --requests 2000
+    PYTHONPATH=src python -m benchmarks.run middleware --requests 2000 --rows 100
+    python -m benchmarks.run compare old.json new.json
+
+`worker` needs DATABASE_URL (seeded rows are removed afterwards); `api` needs a running API; `middleware`
+runs in-process and needs neither. Each run
+writes a JSON report (params, commit, jobs/sec, p50/p95/p99, per-stage breakdown) to --output.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from benchmarks.stubs import StubServer, stub_ollama_app, stub_origin_app
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(  # noqa: S603 - fixed command
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="scenario", required=True)
+
+    def add_common(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--concurrency", type=int, default=10)
+        p.add_argument("--output", type=Path, help="JSON report path (default: benchmarks/results/...)")
+        p.add_argument("--verbose", action="store_true", help="keep the app's per-request INFO logs")
+
+    worker = sub.add_parser("worker", help="run process_document on seeded documents")
+    add_common(worker)
+    worker.add_argument("--jobs", type=int, default=50)
+    worker.add_argument("--page-sizes", default="4,16,64", help="comma-separated page sizes in KiB")
+    worker.add_argument("--ollama-latency", type=float, default=0.2, help="seconds before the first token")
+    worker.add_argument("--ollama-tokens", type=int, default=60, help="tokens per generation")
+    worker.add_argument("--ollama-tokens-per-second", type=float, default=300.0)
+    worker.add_argument("--ollama-parallel", type=int, default=4, help="generations the stub runs at once")
+    worker.add_argument("--ollama-backends", type=int, default=1, help="number of stub Ollama instances")
+
+    api = sub.add_parser("api", help="submit and read documents through a running API")
+    add_common(api)
+    api.add_argument("--api-url", default="http://localhost:8000")
+    api.add_argument("--requests", type=int, default=500)
+
+    middleware = sub.add_parser("middleware", help="time the API's access log and compression middleware in-process")
+    add_common(middleware)
+    middleware.add_argument("--requests", type=int, default=2000)
+    middleware.add_argument("--rows", type=int, default=100, help="documents in the JSON response")
+
+    compare = sub.add_parser("compare", help="compare two JSON reports")
+    compare.add_argument("baseline", type=Path)
+    compare.add_argument("candidate", type=Path)
+    return parser
+
+
+async def _worker(args: argparse.Namespace) -> dict[str, Any]:
+    page_sizes = [int(s) for s in args.page_sizes.split(",")]
+    ollama_app = stub_ollama_app(
+        latency=args.ollama_latency,
+        tokens=args.ollama_tokens,
+        tokens_per_second=args.ollama_tokens_per_second,
+        parallel=args.ollama_parallel,
+    )
+    async with contextlib.AsyncExitStack() as stack:
+        origin = await stack.enter_async_context(StubServer(stub_origin_app()))
+        stubs = [await stack.enter_async_context(StubServer(ollama_app)) for _ in range(args.ollama_backends)]
+        # the app reads its configuration at import time: point it at the stubs first
+        os.environ["OLLAMA_BACKENDS"] = ",".join(stub.url for stub in stubs)
+        os.environ.setdefault("WORKER_METRICS_PORT", "0")
+        from benchmarks import scenarios  # noqa: PLC0415
+
+        return await scenarios.run_worker(
+            origin_url=origin.url, jobs=args.jobs, concurrency=args.concurrency, page_sizes=page_sizes
+        )
+
+
+async def _api(args: argparse.Namespace) -> dict[str, Any]:
+    async with StubServer(stub_origin_app()) as origin:
+        from benchmarks import scenarios  # noqa: PLC0415
+
+        return await scenarios.run_api(
+            api_url=args.api_url, origin_url=origin.url, requests=args.requests, concurrency=args.concurrency
+        )
+
+
+async def _middleware(args: argparse.Namespace) -> dict[str, Any]:
+    from benchmarks import scenarios  # noqa: PLC0415
+
+    return await scenarios.run_middleware(requests=args.requests, concurrency=args.concurrency, rows=args.rows)
+
+
+def _flatten(report: Any, prefix: str = "") -> dict[str, float]:
+    if isinstance(report, dict):
+        flat: dict[str, float] = {}
+        for key, value in report.items():
+            flat.update(_flatten(value, f"{prefix}.{key}" if prefix else key))
+        return flat
+    return {prefix: report} if isinstance(report, (int, float)) and not isinstance(report, bool) else {}
+
+
+def _compare(baseline_path: Path, candidate_path: Path) -> None:
+    baseline = _flatten(json.loads(baseline_path.read_text())["results"])
+    candidate = _flatten(json.loads(candidate_path.read_text())["results"])
+    print(f"{'metric':<40} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for key in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[key], candidate[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else ""
+        print(f"{key:<40} {old:>12} {new:>12} {change:>9}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parser().parse_args(argv)
+    if args.scenario == "compare":
+        _compare(args.baseline, args.candidate)
+        return
+
+    if not args.verbose:
+        for name in ("app", "httpx"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    scenario = {"worker": _worker, "api": _api, "middleware": _middleware}[args.scenario]
+    results = asyncio.run(scenario(args))
+    commit = _git_commit()
+    params = {k: v for k, v in vars(args).items() if k not in ("scenario", "output", "verbose")}
+    report = {
+        "scenario": args.scenario,
+        "commit": commit,
+        "started_at": started_at,
+        "params": params,
+        "results": results,
+    }
+
+    output = args.output or Path("benchmarks/results") / f"{args.scenario}-{commit}-{int(time.time())}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    json.dump(results, sys.stdout, indent=2)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
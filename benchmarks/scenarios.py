@@ -0,0 +1,263 @@
+"""Benchmark scenarios. Imported by `run.py` only after the environment points the app at the stubs."""
+
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Sequence
+
+import httpx
+from prometheus_client import REGISTRY
+from pydantic_core import to_json
+from sqlalchemy import delete, func, select
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+from starlette.types import ASGIApp
+
+from app.core.config import GZIP_COMPRESSLEVEL, GZIP_MINIMUM_SIZE
+from app.core.database import AsyncSessionLocal
+from app.core.middleware import LoggingMiddleware
+from app.core.models import Document, DocumentStatus
+from app.worker.tasks import process_document, shutdown, startup
+
+STAGES = ("fetch", "extract", "preprocess", "llm", "db_write")
+
+
+def latency_summary(seconds: Sequence[float]) -> dict[str, float]:
+    """p50/p95/p99/max in milliseconds."""
+    if not seconds:
+        return {}
+    ordered = sorted(seconds)
+    if len(ordered) == 1:
+        p50 = p95 = p99 = ordered[0]
+    else:
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    return {
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "p99_ms": round(p99 * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def _stage_totals() -> dict[str, tuple[float, float]]:
+    totals = {}
+    for stage in STAGES:
+        labels = {"stage": stage}
+        count = REGISTRY.get_sample_value("summarizer_job_stage_seconds_count", labels) or 0.0
+        total = REGISTRY.get_sample_value("summarizer_job_stage_seconds_sum", labels) or 0.0
+        totals[stage] = (count, total)
+    return totals
+
+
+def _stage_breakdown(before: dict[str, tuple[float, float]], after: dict[str, tuple[float, float]]) -> dict:
+    breakdown = {}
+    for stage in STAGES:
+        count = after[stage][0] - before[stage][0]
+        total = after[stage][1] - before[stage][1]
+        breakdown[stage] = {
+            "count": int(count),
+            "total_s": round(total, 3),
+            "mean_ms": round(total / count * 1000, 2) if count else None,
+        }
+    return breakdown
+
+
+async def _run_concurrently(
+    calls: Sequence[Callable[[], Awaitable[Any]]], concurrency: int
+) -> tuple[list[float], int, float]:
+    """Run the calls with at most `concurrency` in flight; returns latencies, error count and wall time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def timed(call: Callable[[], Awaitable[Any]]) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(call) for call in calls))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_worker(*, origin_url: str, jobs: int, concurrency: int, page_sizes: Sequence[int]) -> dict:
+    """Seed `jobs` PENDING documents pointing at the stub origin and run `process_document` on all of them.
+
+    Uses the worker's real startup (HTTP clients, Ollama pool, extraction processes) and the configured
+    Postgres; `concurrency` plays the role of WorkerSettings.max_jobs. Seeded rows are deleted afterwards.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as session:
+        documents = [
+            Document(
+                name=f"bench-{run_id}-{i}",
+                url=f"{origin_url}/page/{page_sizes[i % len(page_sizes)]}/{i}?run={run_id}",
+                status=DocumentStatus.PENDING,
+            )
+            for i in range(jobs)
+        ]
+        session.add_all(documents)
+        await session.commit()
+        uuids = [str(d.document_uuid) for d in documents]
+
+    ctx: dict[str, Any] = {}
+    await startup(ctx)
+    try:
+        before = _stage_totals()
+        latencies, errors, wall = await _run_concurrently(
+            [lambda u=u: process_document(ctx, u) for u in uuids], concurrency
+        )
+        stages = _stage_breakdown(before, _stage_totals())
+    finally:
+        await shutdown(ctx)
+
+    seeded = Document.name.like(f"bench-{run_id}-%")
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Document.status, func.count()).where(seeded).group_by(Document.status))
+        statuses = {status.value: count for status, count in result.all()}
+        await session.execute(delete(Document).where(seeded))
+        await session.commit()
+
+    return {
+        "jobs": jobs,
+        "errors": errors,
+        "statuses": statuses,
+        "wall_s": round(wall, 3),
+        "jobs_per_sec": round(jobs / wall, 2),
+        "latency": latency_summary(latencies),
+        "stages": stages,
+    }
+
+
+async def run_api(*, api_url: str, origin_url: str, requests: int, concurrency: int) -> dict:
+    """Drive a running API: submit `requests` documents, then read each of them back.
+
+    Submissions point at the stub origin so the API accepts them; no worker needs to be running. The
+    submitted rows (named bench-<run id>-<n>) stay in the API's database.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=30) as client:
+        created: list[str] = []
+
+        async def submit(i: int) -> None:
+            resp = await client.post(
+                "/documents/", json={"name": f"bench-{run_id}-{i}", "url": f"{origin_url}/page/8/{i}?run={run_id}"}
+            )
+            resp.raise_for_status()
+            created.append(resp.json()["document_uuid"])
+
+        async def read(document_uuid: str) -> None:
+            (await client.get(f"/documents/{document_uuid}/")).raise_for_status()
+
+        submit_latencies, submit_errors, submit_wall = await _run_concurrently(
+            [lambda i=i: submit(i) for i in range(requests)], concurrency
+        )
+        read_latencies, read_errors, read_wall = await _run_concurrently(
+            [lambda u=u: read(u) for u in created], concurrency
+        )
+
+    return {
+        "submit": {
+            "requests": requests,
+            "errors": submit_errors,
+            "requests_per_sec": round(requests / submit_wall, 2),
+            "latency": latency_summary(submit_latencies),
+        },
+        "get": {
+            "requests": len(created),
+            "errors": read_errors,
+            "requests_per_sec": round(len(created) / read_wall, 2) if created else 0.0,
+            "latency": latency_summary(read_latencies),
+        },
+    }
+
+
+class _BaseHTTPLoggingMiddleware(BaseHTTPMiddleware):
+    """The access logging the API used before LoggingMiddleware became plain ASGI, kept as a baseline."""
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        start_time = time.time()
+        response = None
+        try:
+            logging.getLogger("app").info(f"Incoming request: {request.method} {request.url}")
+            response = await call_next(request)
+            return response
+        finally:
+            duration = (time.time() - start_time) * 1000
+            status_code = response.status_code if response else "N/A"
+            logging.getLogger("app").info(
+                f"Completed {request.method} {request.url} with status {status_code} in {duration:.2f}ms"
+            )
+
+
+def _middleware_stacks(body: bytes) -> dict[str, ASGIApp]:
+    async def documents(_request: Request) -> Response:
+        return Response(body, media_type="application/json")
+
+    def endpoint() -> Starlette:
+        return Starlette(routes=[Route("/documents/", documents)])
+
+    return {
+        "none": endpoint(),
+        "base_http_logging": _BaseHTTPLoggingMiddleware(endpoint()),
+        "asgi_logging": LoggingMiddleware(endpoint()),
+        "asgi_logging_gzip": LoggingMiddleware(
+            GZipMiddleware(endpoint(), minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESSLEVEL)
+        ),
+    }
+
+
+async def run_middleware(*, requests: int, concurrency: int, rows: int) -> dict:
+    """In-process latency of one list-sized JSON response through each access-log/compression middleware stack.
+
+    No network and no database: the difference between stacks is the middleware's own cost. Clients ask for
+    gzip, so `asgi_logging_gzip` also reports the bytes saved.
+    """
+    body = to_json(
+        [
+            {
+                "document_uuid": str(uuid.uuid4()),
+                "name": f"Document {i}",
+                "url": f"https://example.test/articles/{i}",
+                "summary": " ".join(["summary text"] * 40),
+                "status": "SUCCESS",
+                "truncated": False,
+                "data_progress": 1.0,
+            }
+            for i in range(rows)
+        ]
+    )
+    results = {}
+    for name, stack in _middleware_stacks(body).items():
+        transport = httpx.ASGITransport(app=stack)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def get() -> httpx.Response:
+                resp = await client.get("/documents/", params={"limit": rows}, headers={"Accept-Encoding": "gzip"})
+                resp.raise_for_status()
+                return resp
+
+            sent = await get()  # warm-up
+            latencies, errors, wall = await _run_concurrently([get] * requests, concurrency)
+        results[name] = {
+            "requests": requests,
+            "errors": errors,
+            "requests_per_sec": round(requests / wall, 2),
+            "response_bytes": int(sent.headers.get("content-length", len(sent.content))),
+            "latency": latency_summary(latencies),
+        }
+    return results
@@ -0,0 +1,115 @@
+"""Local stand-ins for the services the worker talks to, served on ephemeral ports.
+
+- a stub Ollama: `/api/generate` waits `latency` seconds (queueing + prompt evaluation), then streams
+  `tokens` NDJSON chunks at `tokens_per_second`, with at most `parallel` generations at a time like a
+  real Ollama (OLLAMA_NUM_PARALLEL); `/api/version` answers health checks.
+- a stub origin: `/page/{size}/{n}` serves a deterministic HTML article of ~`size` KiB, with an ETag
+  and 304 answers to matching If-None-Match.
+"""
+
+import asyncio
+import json
+import random
+import socket
+from typing import AsyncIterator
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+WORDS = (
+    "system latency throughput queue worker document summary model token request cache page origin "
+    "network process memory budget stage limit batch stream result index cursor metric benchmark"
+).split()
+
+
+def stub_ollama_app(*, latency: float, tokens: int, tokens_per_second: float, parallel: int) -> Starlette:
+    slots = asyncio.Semaphore(parallel)
+
+    async def generate(request: Request) -> StreamingResponse:
+        body = await request.json()
+        prompt_tokens = len(body.get("prompt", "")) // 4
+
+        async def chunks() -> AsyncIterator[bytes]:
+            async with slots:
+                await asyncio.sleep(latency)
+                for i in range(tokens):
+                    yield (json.dumps({"response": f"{WORDS[i % len(WORDS)]} ", "done": False}) + "\n").encode()
+                    await asyncio.sleep(1 / tokens_per_second)
+                yield (
+                    json.dumps(
+                        {
+                            "response": "",
+                            "done": True,
+                            "prompt_eval_count": prompt_tokens,
+                            "prompt_eval_duration": int(latency * 1e9),
+                            "eval_count": tokens,
+                            "eval_duration": int(tokens / tokens_per_second * 1e9),
+                        }
+                    )
+                    + "\n"
+                ).encode()
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    async def version(_request: Request) -> JSONResponse:
+        return JSONResponse({"version": "stub"})
+
+    return Starlette(routes=[Route("/api/generate", generate, methods=["POST"]), Route("/api/version", version)])
+
+
+def article_html(size_kib: int, seed: int) -> str:
+    rng = random.Random(seed)  # noqa: S311 - deterministic filler text, not crypto
+    paragraphs: list[str] = []
+    length = 0
+    while length < size_kib * 1024:
+        sentence_count = rng.randint(3, 7)
+        paragraph = " ".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+            for _ in range(sentence_count)
+        )
+        paragraphs.append(f"<p>{paragraph}</p>")
+        length += len(paragraph) + 7
+    return (
+        f"<html><head><title>Benchmark article {seed}</title></head><body>"
+        f"<nav><a href='/'>Home</a> <a href='/about'>About</a></nav>"
+        f"<article><h1>Benchmark article {seed}</h1>{''.join(paragraphs)}</article>"
+        f"<footer>Generated fixture</footer></body></html>"
+    )
+
+
+def stub_origin_app() -> Starlette:
+    async def page(request: Request) -> Response:
+        size, n = int(request.path_params["size"]), int(request.path_params["n"])
+        etag = f'"{size}-{n}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return HTMLResponse(article_html(size, n), headers={"ETag": etag})
+
+    return Starlette(routes=[Route("/page/{size:int}/{n:int}", page)])
+
+
+class StubServer:
+    """Runs an ASGI app with uvicorn inside the current event loop, on a free local port."""
+
+    def __init__(self, app: Starlette) -> None:
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self.port = self._sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "StubServer":
+        self._task = asyncio.create_task(self._server.serve(sockets=[self._sock]))
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *_exc: object) -> None:
+        self._server.should_exit = True
+        if self._task:
+            await self._task
+        self._sock.close()
@@ -1,9 +1,13 @@
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Callable
+
 from fastapi import Depends
 from arq.connections import ArqRedis, create_pool, RedisSettings
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import AsyncSessionLocal
+from app.core.events import EventSubscriber
 from app.api.domain.document_repository import DocumentRepository
 
 async def get_session() -> AsyncSession:  # type: ignore
@@ -15,6 +19,18 @@ async def get_document_repository(session: AsyncSession = Depends(get_session))
     return DocumentRepository(session)
 
 
+@asynccontextmanager
+async def open_document_repository() -> AsyncIterator[DocumentRepository]:
+    async with AsyncSessionLocal() as session:
+        yield DocumentRepository(session)
+
+
+def get_document_repository_factory() -> Callable[[], AsyncContextManager[DocumentRepository]]:
+    """For streamed responses: request dependencies are closed before the body is sent, so the stream opens
+    its own session."""
+    return open_document_repository
+
+
 # Redis Singleton
 _redis: ArqRedis | None = None
 
@@ -43,3 +59,30 @@ async def get_redis() -> ArqRedis:
     if not _redis:
         raise RuntimeError("Redis not initialized! Make sure to call init_redis_pool() at startup.")
     return _redis
+
+
+# Live events: one shared pub/sub subscriber per process
+_events: EventSubscriber | None = None
+
+
+def init_event_subscriber(redis: ArqRedis) -> EventSubscriber:
+    """Create the shared subscriber once at startup, after the Redis pool."""
+    global _events
+    if not _events:
+        _events = EventSubscriber(redis)
+    return _events
+
+
+async def close_event_subscriber() -> None:
+    """Close the shared subscriber at shutdown, before the Redis pool."""
+    global _events
+    if _events:
+        await _events.close()
+        _events = None
+
+
+async def get_event_subscriber() -> EventSubscriber:
+    """Dependency for the routes relaying a document's live events."""
+    if not _events:
+        raise RuntimeError("Event subscriber not initialized! Make sure to call init_event_subscriber() at startup.")
+    return _events
@@ -1,82 +1,231 @@
-from typing import Iterable, Optional, Tuple
+import datetime as dt
+from typing import AsyncIterator, Optional, Sequence, Tuple
 from uuid import UUID
 
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import Boolean, Row, Select, case, func, insert, literal_column, select, tuple_, update
 
-from app.core.schemas import DocumentRead
+from app.api.pagination import Cursor
+from app.core.schemas import DocumentCreate, DocumentRead, SubmissionResult
 from app.core.models import Document, DocumentStatus
 from app.core.exceptions import DocumentConflictError
 
 
+# the columns behind DocumentRead, the default projection of the list queries
+DOCUMENT_COLUMNS = ("document_uuid", "name", "url", "summary", "status", "truncated")
+
+
+def _select_columns(columns: Sequence[str]) -> Select:
+    """Plain rows of only `columns` (no ORM objects), plus the keyset columns a next-page cursor is built from."""
+    names = dict.fromkeys((*columns, "created_at", "document_uuid"))
+    return select(*(Document.__table__.c[name] for name in names))
+
+
 class DocumentRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def list_all(self, *, limit: int = 100, offset: int = 0) -> list[Document]:
+    async def list_all(
+        self, *, limit: int = 100, offset: int = 0, columns: Sequence[str] = DOCUMENT_COLUMNS
+    ) -> Sequence[Row]:
         result = await self.session.execute(
-            select(Document)
-            .order_by(Document.created_at.desc())
+            _select_columns(columns)
+            .order_by(Document.created_at.desc(), Document.document_uuid.desc())
             .offset(offset)
             .limit(limit)
         )
-        return list(result.scalars().all())
+        return result.all()
+
+    async def list_page(
+        self, *, limit: int = 100, after: Optional[Cursor] = None, columns: Sequence[str] = DOCUMENT_COLUMNS
+    ) -> Sequence[Row]:
+        """Keyset pagination: rows strictly after the cursor, served by ix_documents_created_at_uuid at any depth."""
+        stmt = _select_columns(columns)
+        if after is not None:
+            stmt = stmt.where(tuple_(Document.created_at, Document.document_uuid) < tuple_(*after))
+        result = await self.session.execute(
+            stmt.order_by(Document.created_at.desc(), Document.document_uuid.desc()).limit(limit)
+        )
+        return result.all()
+
+    async def iter_export(
+        self,
+        *,
+        columns: Sequence[str] = DOCUMENT_COLUMNS,
+        statuses: Sequence[DocumentStatus] = (),
+        updated_after: Optional[dt.datetime] = None,
+        updated_before: Optional[dt.datetime] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Every matching row, oldest update first, in batches of `batch_size` read from a server-side cursor:
+        memory stays bounded by one batch whatever the table size."""
+        stmt = _select_columns(columns)
+        if statuses:
+            stmt = stmt.where(Document.status.in_(statuses))
+        if updated_after is not None:
+            stmt = stmt.where(Document.updated_at >= updated_after)
+        if updated_before is not None:
+            stmt = stmt.where(Document.updated_at < updated_before)
+        result = await self.session.stream(
+            stmt.order_by(Document.updated_at).execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions():
+            yield rows
 
     async def get(self, doc_id: UUID) -> DocumentRead:
         result = await self.session.execute(select(Document).where(Document.document_uuid == doc_id))
         return result.scalar_one_or_none()
 
+    async def release(self) -> None:
+        """End the read transaction so the pooled connection goes back before a long wait (e.g. a long-poll)."""
+        await self.session.close()
+
     async def add(self, doc: Document) -> Document:
         self.session.add(doc)
         await self.session.commit()
         await self.session.refresh(doc)
         return doc
 
-    async def _find_by_name_or_url(
-        self, *, name: str, url: str
-    ) -> Tuple[Optional[Document], Optional[Document], Optional[Document]]:
-        """Returns (exact_match, name_clash, url_clash)."""
-        result = await self.session.execute(
-            select(Document).where((Document.name == name) | (Document.url == url))
-        )
-        rows: Iterable[Document] = result.scalars().all()
-
-        exact = name_clash = url_clash = None
-        for d in rows:
-            if d.name == name and d.url == url:
-                exact = d
-            elif d.name == name:
-                name_clash = d
-            elif d.url == url:
-                url_clash = d
-        return exact, name_clash, url_clash
-
-    async def _set_status(self, doc_id: UUID, status: DocumentStatus) -> None:
-        await self.session.execute(
-            update(Document)
-            .where(Document.document_uuid == doc_id)
-            .values(status=status)
-        )
-        await self.session.commit()
-
-    async def submit_or_resummarize(self, *, name: str, url: str) -> tuple[Document, bool]:
+    async def submit_or_resummarize(
+        self, *, name: str, url: str, callback_url: Optional[str] = None
+    ) -> tuple[Document, bool]:
         """
-        Smart submission:
+        Smart submission in a single atomic statement (relies on the unique indexes on name and url):
           - If exact (same name+url): set to PENDING and return (doc, True)  # re-summarize
           - If name xor url clashes: raise DocumentConflictError
           - Else: create new doc with PENDING and return (doc, False)
+        A given `callback_url` replaces the document's; without one the registered callback is kept.
+
+        INSERT ... ON CONFLICT (name) DO UPDATE ... WHERE url matches RETURNING:
+          - a fresh row comes back with xmax = 0 (created), an updated one with xmax <> 0 (resummarized)
+          - a name clash with another url updates nothing and returns no row
+          - a url clash with another name violates the url index
         """
-        exact, name_clash, url_clash = await self._find_by_name_or_url(name=name, url=url)
+        stmt = pg_insert(Document).values(
+            name=name, url=url, status=DocumentStatus.PENDING, callback_url=callback_url
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Document.name],
+            set_={
+                "status": DocumentStatus.PENDING,
+                "callback_url": func.coalesce(stmt.excluded.callback_url, Document.callback_url),
+            },
+            where=Document.url == stmt.excluded.url,
+        ).returning(Document, literal_column("xmax = 0", Boolean).label("created"))
 
-        if exact:
-            await self._set_status(exact.document_uuid, DocumentStatus.PENDING)
-            # get fresh state to return (optional)
-            refreshed = await self.get(exact.document_uuid)
-            return (refreshed or exact, True)
+        try:
+            result = await self.session.execute(stmt, execution_options={"populate_existing": True})
+            row = result.one_or_none()
+        except IntegrityError as e:
+            await self.session.rollback()
+            raise DocumentConflictError("Document with same name or URL exists") from e
 
-        if name_clash or url_clash:
+        if row is None:
+            await self.session.rollback()
             raise DocumentConflictError("Document with same name or URL exists")
 
-        doc = Document(name=name, url=url, status=DocumentStatus.PENDING)
-        doc = await self.add(doc)
-        return (doc, False)
+        await self.session.commit()
+        doc, created = row
+        return (doc, not created)
+
+    async def submit_many(
+        self, items: Sequence[DocumentCreate]
+    ) -> list[Tuple[SubmissionResult, Optional[Document]]]:
+        """Set-based smart submission for a batch, see `_submit_many`.
+
+        A concurrent submission can claim a name/url between our SELECT and INSERT; the unique indexes then
+        reject the INSERT and the batch is resolved once more against the committed rows.
+        """
+        try:
+            return await self._submit_many(items)
+        except IntegrityError:
+            await self.session.rollback()
+            return await self._submit_many(items)
+
+    async def _submit_many(
+        self, items: Sequence[DocumentCreate]
+    ) -> list[Tuple[SubmissionResult, Optional[Document]]]:
+        """
+        Smart submission for a whole batch, set-based:
+          - one SELECT resolves exact matches and name/url clashes for every item
+          - one UPDATE sets all exact matches back to PENDING
+          - one multi-row INSERT ... RETURNING creates the new documents
+        Items repeating an earlier item of the same batch resolve to the same document (resummarized);
+        items clashing with an earlier item of the batch are conflicts.
+        Returns one (result, document) pair per item, in order; document is None for conflicts.
+        """
+        names = {item.name for item in items}
+        urls = {item.url for item in items}
+        result = await self.session.execute(
+            select(Document).where(Document.name.in_(names) | Document.url.in_(urls))
+        )
+        by_name: dict[str, Document] = {}
+        by_url: dict[str, Document] = {}
+        for d in result.scalars().all():
+            by_name[d.name] = d
+            by_url[d.url] = d
+
+        resummarize: dict[UUID, Document] = {}
+        callbacks: dict[UUID, str] = {}
+        new_docs: list[Document] = []
+        outcomes: list[Tuple[SubmissionResult, Optional[Document]]] = []
+        for item in items:
+            named, located = by_name.get(item.name), by_url.get(item.url)
+            if named is not None and named is located:
+                if named.document_uuid is not None:
+                    resummarize[named.document_uuid] = named
+                    if item.callback_url:
+                        callbacks[named.document_uuid] = item.callback_url
+                elif item.callback_url:
+                    named.callback_url = item.callback_url
+                outcomes.append((SubmissionResult.RESUMMARIZED, named))
+            elif named is not None or located is not None:
+                outcomes.append((SubmissionResult.CONFLICT, None))
+            else:
+                doc = Document(
+                    name=item.name, url=item.url, status=DocumentStatus.PENDING, callback_url=item.callback_url
+                )
+                by_name[item.name] = by_url[item.url] = doc
+                new_docs.append(doc)
+                outcomes.append((SubmissionResult.CREATED, doc))
+
+        refreshed: dict[UUID, Document] = {}
+        if resummarize:
+            stmt = (
+                update(Document)
+                .where(Document.document_uuid.in_(resummarize))
+                .values(
+                    status=DocumentStatus.PENDING,
+                    callback_url=(
+                        case(callbacks, value=Document.document_uuid, else_=Document.callback_url)
+                        if callbacks
+                        else Document.callback_url
+                    ),
+                )
+                .returning(Document)
+            )
+            # loaded through from_statement so the returned rows overwrite the objects the SELECT above loaded
+            # (an ORM UPDATE ... RETURNING leaves identity-map objects stale)
+            updated = await self.session.scalars(
+                select(Document).from_statement(stmt).execution_options(populate_existing=True)
+            )
+            refreshed = {d.document_uuid: d for d in updated.all()}
+
+        inserted: dict[int, Document] = {}
+        if new_docs:
+            rows = await self.session.scalars(
+                insert(Document).returning(Document, sort_by_parameter_order=True),
+                [{"name": d.name, "url": d.url, "status": d.status, "callback_url": d.callback_url} for d in new_docs],
+            )
+            inserted = {id(placeholder): row for placeholder, row in zip(new_docs, rows.all(), strict=True)}
+
+        await self.session.commit()
+
+        resolved: list[Tuple[SubmissionResult, Optional[Document]]] = []
+        for outcome, doc in outcomes:
+            if doc is not None:
+                doc = inserted.get(id(doc)) or refreshed.get(doc.document_uuid, doc)
+            resolved.append((outcome, doc))
+        return resolved
@@ -2,10 +2,12 @@ import logging
 from contextlib import asynccontextmanager
 from typing import AsyncIterator
 from fastapi import FastAPI
+from starlette.middleware.gzip import GZipMiddleware
 
-from app.api.routers import router_documents
-from app.core.middleware import LoggingMiddleware
-from .depends import init_redis_pool, close_redis_pool
+from app.api.routers import router_documents, router_metrics
+from app.core.config import GZIP_COMPRESSLEVEL, GZIP_MINIMUM_SIZE
+from app.core.middleware import LoggingMiddleware, MetricsMiddleware
+from .depends import close_event_subscriber, close_redis_pool, init_event_subscriber, init_redis_pool
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s %(levelname)-8s %(name)s — %(message)s [%(pathname)s:%(lineno)d]"
@@ -14,13 +16,18 @@ logging.basicConfig(
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    await init_redis_pool()
+    init_event_subscriber(await init_redis_pool())
     yield
+    await close_event_subscriber()
     await close_redis_pool()
 
 
 app = FastAPI(title="Summarizer API", lifespan=lifespan)
 
+# last added runs first: latency metrics and access logs include the compression time
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESSLEVEL)
 app.add_middleware(LoggingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(router_documents.router, prefix="/documents", tags=["documents"])
+app.include_router(router_metrics.router)
@@ -0,0 +1,26 @@
+import base64
+import binascii
+import datetime as dt
+import json
+from typing import Tuple
+from uuid import UUID
+
+from app.core.models import Document
+
+Cursor = Tuple[dt.datetime, UUID]
+
+
+def encode_cursor(doc: Document) -> str:
+    """Opaque keyset cursor pointing just after `doc` in (created_at DESC, document_uuid DESC) order."""
+    raw = json.dumps([doc.created_at.isoformat(), str(doc.document_uuid)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Inverse of `encode_cursor`; raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, document_uuid = json.loads(raw)
+        return dt.datetime.fromisoformat(created_at), UUID(document_uuid)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
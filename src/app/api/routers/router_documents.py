@@ -1,16 +1,46 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import asyncio
+import datetime as dt
+import json
+import time
+import zlib
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Optional
+from uuid import UUID
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from arq.connections import ArqRedis
+from pydantic_core import to_json
 
 from app.api.domain.document_repository import DocumentRepository
-from app.core.schemas import DocumentCreate, DocumentRead
-from app.core.models import Document
+from app.api.pagination import decode_cursor, encode_cursor
+from app.core.cache import cache_document, cache_documents, get_cached_document
+from app.core.config import (
+    BATCH_MAX_ITEMS,
+    EXPORT_BATCH_SIZE,
+    LONG_POLL_MAX_SECONDS,
+    SSE_KEEPALIVE_SECONDS,
+    SSE_MAX_SECONDS,
+)
+from app.core.events import TERMINAL_STATUSES, EventSubscriber
+from app.core.jobs import enqueue_document, enqueue_documents
+from app.core.metrics import DOCUMENT_CACHE_LOOKUPS, DOCUMENT_STATUS_TRANSITIONS
+from app.core.schemas import (
+    DOCUMENT_READ_FIELDS,
+    DocumentBatchItemResult,
+    DocumentCreate,
+    DocumentPriority,
+    DocumentRead,
+    SubmissionResult,
+    status_progress,
+)
+from app.core.models import DocumentStatus
 from app.core.exceptions import DocumentConflictError
 
 from .. import depends
 
 router = APIRouter()
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
 @router.post("/", status_code=status.HTTP_202_ACCEPTED, response_model=DocumentRead)
 async def create_document(
@@ -19,31 +49,290 @@ async def create_document(
     redis: ArqRedis = Depends(depends.get_redis),
 ) -> DocumentRead:
     try:
-        doc, _resummarized = await repo.submit_or_resummarize(name=payload.name, url=payload.url)
+        doc, _resummarized = await repo.submit_or_resummarize(
+            name=payload.name, url=payload.url, callback_url=payload.callback_url
+        )
     except DocumentConflictError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
 
-    await redis.enqueue_job("process_document", str(doc.document_uuid))
-    return doc
+    result = DocumentRead.model_validate(doc)
+    DOCUMENT_STATUS_TRANSITIONS.labels(status=DocumentStatus.PENDING.value).inc()
+    # the status went back to PENDING: refresh the GET cache before anyone reads the old state
+    await cache_document(redis, result)
+    # a resubmit while a job is queued or running is coalesced into that job
+    await enqueue_document(redis, str(doc.document_uuid), payload.priority)
+    return result
+
+
+@router.post("/batch", status_code=status.HTTP_202_ACCEPTED, response_model=list[DocumentBatchItemResult])
+async def create_documents_batch(
+    payload: list[DocumentCreate] = Body(..., min_length=1, max_length=BATCH_MAX_ITEMS),
+    repo: DocumentRepository = Depends(depends.get_document_repository),
+    redis: ArqRedis = Depends(depends.get_redis),
+) -> list[DocumentBatchItemResult]:
+    """Smart submission for many documents at once; reports created / resummarized / conflict per item."""
+    outcomes = await repo.submit_many(payload)
+    documents = {doc.document_uuid: DocumentRead.model_validate(doc) for _, doc in outcomes if doc is not None}
+    DOCUMENT_STATUS_TRANSITIONS.labels(status=DocumentStatus.PENDING.value).inc(len(documents))
+    await cache_documents(redis, documents.values())
+
+    # one job per document, even if the batch names it several times (interactive wins over bulk)
+    queued: dict[str, DocumentPriority] = {}
+    for item, (_, doc) in zip(payload, outcomes, strict=True):
+        if doc is not None and queued.get(str(doc.document_uuid)) is not DocumentPriority.INTERACTIVE:
+            queued[str(doc.document_uuid)] = item.priority
+    for priority in DocumentPriority:
+        group = [document_uuid for document_uuid, p in queued.items() if p is priority]
+        if group:
+            await enqueue_documents(redis, group, priority)
+
+    return [
+        DocumentBatchItemResult(
+            index=index,
+            result=result,
+            document=documents[doc.document_uuid] if doc is not None else None,
+            detail="Document with same name or URL exists" if result is SubmissionResult.CONFLICT else None,
+        )
+        for index, (result, doc) in enumerate(outcomes)
+    ]
 
 
 @router.get("/", response_model=list[DocumentRead])
 async def list_documents(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(
+        None, description="Keyset cursor from a previous page's X-Next-Cursor header (empty for the first page)"
+    ),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated DocumentRead fields to return, e.g. document_uuid,name,status (default: all)"
+    ),
     repo: DocumentRepository = Depends(depends.get_document_repository),
-) -> list[DocumentRead]:
-    docs: list[Document] = await repo.list_all(limit=limit, offset=offset)
-    return [DocumentRead.model_validate(d) for d in docs]
+) -> Response:
+    """
+    Newest first. Two paging modes:
+      - offset/limit (kept for compatibility; cost grows with the offset)
+      - cursor/limit (keyset; constant cost at any depth)
+    Whenever the page is full, the X-Next-Cursor response header carries the cursor of the next page.
+
+    Only the columns behind the requested `fields` are selected (leave out `summary` for light pages), and
+    rows are serialized straight to JSON without building ORM objects or models.
+    """
+    selected = _parse_fields(fields)
+    columns = _columns(selected)
+
+    if cursor is not None:
+        if offset:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either cursor or offset")
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+        rows = await repo.list_page(limit=limit, after=after, columns=columns)
+    else:
+        rows = await repo.list_all(limit=limit, offset=offset, columns=columns)
+
+    headers = {NEXT_CURSOR_HEADER: encode_cursor(rows[-1])} if len(rows) == limit else None
+    return Response(
+        content=to_json([_project(row, selected) for row in rows]), media_type="application/json", headers=headers
+    )
+
+
+def _parse_fields(fields: Optional[str]) -> list[str]:
+    """Requested fields in DocumentRead order; every field when none is given."""
+    requested = {f.strip() for f in (fields or "").split(",") if f.strip()}
+    if not requested:
+        return list(DOCUMENT_READ_FIELDS)
+    unknown = requested.difference(DOCUMENT_READ_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}; choose from {', '.join(DOCUMENT_READ_FIELDS)}",
+        )
+    return [f for f in DOCUMENT_READ_FIELDS if f in requested]
+
+
+def _columns(fields: list[str]) -> list[str]:
+    # data_progress is computed from the status
+    return list(dict.fromkeys("status" if f == "data_progress" else f for f in fields))
+
+
+def _project(row: Any, fields: list[str]) -> dict[str, Any]:
+    return {f: status_progress(row.status) if f == "data_progress" else getattr(row, f) for f in fields}
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_documents(
+    request: Request,
+    *,
+    statuses: Optional[list[DocumentStatus]] = Query(None, alias="status", description="Repeat to match several"),
+    updated_after: Optional[dt.datetime] = Query(None, description="Only documents updated at or after this time"),
+    updated_before: Optional[dt.datetime] = Query(None, description="Only documents updated before this time"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated DocumentRead fields to export, e.g. document_uuid,summary (default: all)"
+    ),
+    open_repository: Callable[[], AsyncContextManager[DocumentRepository]] = Depends(
+        depends.get_document_repository_factory
+    ),
+) -> StreamingResponse:
+    """
+    Every matching document as newline-delimited JSON (one DocumentRead per line), oldest update first.
+
+    Rows are read from a server-side cursor EXPORT_BATCH_SIZE at a time and written out as they arrive, so
+    memory stays flat at any table size. Sent gzip-compressed when the client accepts it
+    (`curl --compressed`).
+    """
+    selected = _parse_fields(fields)
+    columns = _columns(selected)
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+
+    async def _lines() -> AsyncIterator[bytes]:
+        # wbits=31: a gzip container around the deflate stream
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        async with open_repository() as repo:
+            async for rows in repo.iter_export(
+                columns=columns,
+                statuses=statuses or (),
+                updated_after=updated_after,
+                updated_before=updated_before,
+                batch_size=EXPORT_BATCH_SIZE,
+            ):
+                chunk = b"".join(to_json(_project(row, selected)) + b"\n" for row in rows)
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+        if compressor is not None:
+            yield compressor.flush()
+
+    headers = {"Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(_lines(), media_type="application/x-ndjson", headers=headers)
 
 
 @router.get("/{document_uuid}/", response_model=DocumentRead)
 async def get_document(
-    document_uuid: str,
-    repo: DocumentRepository = Depends(depends.get_document_repository)
-) -> DocumentRead:
+    document_uuid: UUID,
+    wait: float = Query(
+        0,
+        ge=0,
+        le=LONG_POLL_MAX_SECONDS,
+        description="Long-poll: wait up to this many seconds for SUCCESS/FAILED before answering",
+    ),
+    repo: DocumentRepository = Depends(depends.get_document_repository),
+    redis: ArqRedis = Depends(depends.get_redis),
+    events: EventSubscriber = Depends(depends.get_event_subscriber),
+) -> Any:
+    """Read-through cache: polled documents are served from Redis; the API and worker refresh it on every change.
+
+    With `wait`, a document still PENDING/PROCESSING is returned as soon as the worker announces a terminal
+    status on its pub/sub channel (or in its current state once `wait` expires), instead of being polled for.
+    """
+    if wait:
+        return await _wait_for_terminal_status(document_uuid, wait, repo, redis, events)
+
+    cached = await get_cached_document(redis, str(document_uuid))
+    if cached is not None:
+        DOCUMENT_CACHE_LOOKUPS.labels(result="hit").inc()
+        return Response(content=cached, media_type="application/json")
+
+    DOCUMENT_CACHE_LOOKUPS.labels(result="miss").inc()
     doc = await repo.get(document_uuid)
-    return doc
+    if doc is None:
+        return None
+    result = DocumentRead.model_validate(doc)
+    await cache_document(redis, result)
+    return result
+
+
+async def _wait_for_terminal_status(
+    document_uuid: UUID, wait: float, repo: DocumentRepository, redis: ArqRedis, events: EventSubscriber
+) -> Optional[DocumentRead]:
+    # Subscribe before reading the current state so no transition can slip in between
+    queue = await events.subscribe(str(document_uuid))
+    try:
+        cached = await get_cached_document(redis, str(document_uuid))
+        if cached is not None:
+            DOCUMENT_CACHE_LOOKUPS.labels(result="hit").inc()
+            current = DocumentRead.model_validate_json(cached)
+        else:
+            DOCUMENT_CACHE_LOOKUPS.labels(result="miss").inc()
+            doc = await repo.get(document_uuid)
+            if doc is None:
+                return None
+            current = DocumentRead.model_validate(doc)
+            await cache_document(redis, current)
+        if current.status in TERMINAL_STATUSES:
+            return current
+        # nothing more to read from Postgres: don't hold its connection while we wait
+        await repo.release()
+
+        deadline = time.monotonic() + wait
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if event.pop("type", None) != "status":
+                continue
+            current = DocumentRead.model_validate(event)
+            if current.status in TERMINAL_STATUSES:
+                break
+        return current
+    finally:
+        await events.unsubscribe(str(document_uuid), queue)
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.get("/{document_uuid}/stream", response_class=StreamingResponse)
+async def stream_document(
+    document_uuid: UUID,
+    repo: DocumentRepository = Depends(depends.get_document_repository),
+    events: EventSubscriber = Depends(depends.get_event_subscriber),
+) -> StreamingResponse:
+    """
+    Server-Sent-Events relay of the worker's live events for one document:
+      - `status`: the document (as returned by GET /documents/{uuid}/) on every status change
+      - `progress`: partial summary text and token count while Ollama generates
+    The stream ends once the document reaches SUCCESS or FAILED.
+    """
+    # Subscribe before reading the current state so no transition can slip in between
+    queue = await events.subscribe(str(document_uuid))
+
+    doc = await repo.get(document_uuid)
+    if not doc:
+        await events.unsubscribe(str(document_uuid), queue)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    snapshot = DocumentRead.model_validate(doc)
+
+    async def _events() -> AsyncIterator[str]:
+        try:
+            yield _sse("status", snapshot.model_dump_json())
+            if snapshot.status in TERMINAL_STATUSES:
+                return
+
+            deadline = time.monotonic() + SSE_MAX_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                event_type = event.pop("type", "message")
+                yield _sse(event_type, json.dumps(event))
+                if event_type == "status" and event.get("status") in TERMINAL_STATUSES:
+                    return
+        finally:
+            await events.unsubscribe(str(document_uuid), queue)
+
+    return StreamingResponse(
+        _events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/health")
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Response
+from arq.connections import ArqRedis
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from redis.exceptions import RedisError
+
+from app.core.jobs import QUEUE_NAMES, queue_depth
+from app.core.metrics import QUEUE_DEPTH
+
+from .. import depends
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(redis: ArqRedis = Depends(depends.get_redis)) -> Response:
+    """Prometheus scrape endpoint; the queue depth is read from Redis at scrape time."""
+    try:
+        for queue_name in QUEUE_NAMES.values():
+            QUEUE_DEPTH.labels(queue=queue_name).set(await queue_depth(redis, queue_name))
+    except RedisError:
+        pass  # still serve the other metrics, the gauges keep their last value
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
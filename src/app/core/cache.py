@@ -0,0 +1,49 @@
+import logging
+from typing import Iterable, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import DOCUMENT_CACHE_TTL
+from app.core.schemas import DocumentRead
+
+logger = logging.getLogger("app")
+
+
+def document_cache_key(document_uuid: str) -> str:
+    """Serialized DocumentRead as returned by GET /documents/{uuid}/."""
+    return f"summarizer:documents:{document_uuid}:read"
+
+
+async def get_cached_document(redis: Redis, document_uuid: str) -> Optional[bytes]:
+    try:
+        cached: Optional[bytes] = await redis.get(document_cache_key(document_uuid))
+        return cached
+    except RedisError as e:
+        logger.warning(f"[Cache] Read failed for {document_uuid}: {e}")
+        return None
+
+
+async def cache_document(redis: Optional[Redis], document: DocumentRead) -> None:
+    """Write-through of the latest state. Best effort: a failure only means a later cache miss."""
+    if redis is None:
+        return
+    try:
+        await redis.set(
+            document_cache_key(str(document.document_uuid)), document.model_dump_json(), ex=DOCUMENT_CACHE_TTL
+        )
+    except RedisError as e:
+        logger.warning(f"[Cache] Write failed for {document.document_uuid}: {e}")
+
+
+async def cache_documents(redis: Optional[Redis], documents: Iterable[DocumentRead]) -> None:
+    """`cache_document` for many documents in one pipeline."""
+    if redis is None:
+        return
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for doc in documents:
+                pipe.set(document_cache_key(str(doc.document_uuid)), doc.model_dump_json(), ex=DOCUMENT_CACHE_TTL)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"[Cache] Write failed: {e}")
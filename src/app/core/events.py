@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Optional
+
+from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+
+from app.core.models import DocumentStatus
+from app.core.schemas import DocumentRead
+
+logger = logging.getLogger("app")
+
+TERMINAL_STATUSES = frozenset({DocumentStatus.SUCCESS, DocumentStatus.FAILED})
+
+
+def document_channel(document_uuid: str) -> str:
+    """Redis pub/sub channel carrying live events for one document."""
+    return f"summarizer:documents:{document_uuid}:events"
+
+
+async def publish_event(redis: Optional[Redis], document_uuid: str, event: dict[str, Any]) -> None:
+    """Best effort: live events must never fail the job that emits them."""
+    if redis is None:
+        return
+    try:
+        await redis.publish(document_channel(document_uuid), json.dumps(event))
+    except RedisError as e:
+        logger.warning(f"[Events] Failed to publish {event.get('type')} event for {document_uuid}: {e}")
+
+
+async def publish_status(redis: Optional[Redis], document: DocumentRead) -> None:
+    """Status event: the full document as the API would return it."""
+    await publish_event(redis, str(document.document_uuid), {"type": "status", **document.model_dump(mode="json")})
+
+
+class ProgressPublisher:
+    """Accumulates streamed tokens and publishes the partial summary, at most once per `interval` seconds."""
+
+    def __init__(self, redis: Optional[Redis], document_uuid: str, interval: float = 0.25) -> None:
+        self._redis = redis
+        self._document_uuid = document_uuid
+        self._interval = interval
+        self._parts: list[str] = []
+        self._tokens = 0
+        self._last_publish = 0.0
+        self._started = time.monotonic()
+        self._first_token_at: Optional[float] = None
+
+    async def __call__(self, piece: str, tokens: int, done: bool = False) -> None:
+        if piece:
+            self._parts.append(piece)
+            if self._first_token_at is None:
+                self._first_token_at = time.monotonic()
+        self._tokens = tokens
+
+        now = time.monotonic()
+        if done or now - self._last_publish >= self._interval:
+            self._last_publish = now
+            await publish_event(
+                self._redis,
+                self._document_uuid,
+                {
+                    "type": "progress",
+                    "partial_summary": "".join(self._parts),
+                    "tokens": self._tokens,
+                    "done": done,
+                    "time_to_first_token": (
+                        None if self._first_token_at is None else round(self._first_token_at - self._started, 3)
+                    ),
+                },
+            )
+
+
+class EventSubscriber:
+    """One pub/sub connection per API process, shared by every stream and long-poll listening to a document.
+
+    A document's channel is subscribed while at least one listener holds it; a single reader task fans each
+    decoded event out to the listeners' queues (each gets its own copy).
+    """
+
+    def __init__(self, redis: Redis, read_timeout: float = 1.0) -> None:
+        self._pubsub: PubSub = redis.pubsub()
+        self._read_timeout = read_timeout
+        self._listeners: dict[str, set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+        self._reader: Optional[asyncio.Task] = None
+
+    async def subscribe(self, document_uuid: str) -> asyncio.Queue:
+        """Queue receiving the document's events from now on; hand it back with `unsubscribe`."""
+        channel = document_channel(document_uuid)
+        queue: asyncio.Queue = asyncio.Queue()
+        async with self._lock:
+            if channel not in self._listeners:
+                await self._pubsub.subscribe(channel)
+                self._listeners[channel] = set()
+            self._listeners[channel].add(queue)
+            # the pub/sub connection only exists once something is subscribed
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._read())
+        return queue
+
+    async def unsubscribe(self, document_uuid: str, queue: asyncio.Queue) -> None:
+        channel = document_channel(document_uuid)
+        async with self._lock:
+            listeners = self._listeners.get(channel)
+            if listeners is None:
+                return
+            listeners.discard(queue)
+            if not listeners:
+                del self._listeners[channel]
+                try:
+                    await self._pubsub.unsubscribe(channel)
+                except RedisError as e:
+                    logger.warning(f"[Events] Failed to unsubscribe from {channel}: {e}")
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        self._listeners.clear()
+        await self._pubsub.aclose()
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=self._read_timeout)
+            except RedisError as e:
+                # redis-py reconnects and resubscribes on the next read; events published meanwhile are lost
+                logger.warning(f"[Events] Pub/sub read failed, retrying: {e}")
+                await asyncio.sleep(self._read_timeout)
+                continue
+            if message is None:
+                continue
+            channel = message["channel"]
+            channel = channel.decode() if isinstance(channel, bytes) else channel
+            try:
+                event = json.loads(message["data"])
+            except ValueError:
+                logger.warning(f"[Events] Dropping malformed event on {channel}")
+                continue
+            for queue in self._listeners.get(channel, ()):
+                queue.put_nowait(dict(event))
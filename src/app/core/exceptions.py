@@ -1,2 +1,10 @@
 class DocumentConflictError(Exception):
     """Name or URL already used by another document (but not an exact match)."""
+
+
+class UnsupportedContentTypeError(Exception):
+    """The document URL serves something other than an HTML page (PDF, video, ...)."""
+
+
+class CallbackNotAllowedError(Exception):
+    """The callback URL resolves to an address webhooks may not reach (loopback, private, link-local, ...)."""
@@ -0,0 +1,135 @@
+from typing import Iterable
+
+from arq.connections import ArqRedis
+from arq.constants import in_progress_key_prefix, job_key_prefix, result_key_prefix
+from arq.jobs import serialize_job
+from arq.utils import timestamp_ms
+
+from app.core.config import BULK_QUEUE_NAME, INTERACTIVE_QUEUE_NAME, RERUN_MARKER_TTL
+from app.core.metrics import COALESCED_SUBMISSIONS
+from app.core.schemas import DocumentPriority
+
+PROCESS_DOCUMENT = "process_document"
+
+QUEUE_NAMES = {DocumentPriority.INTERACTIVE: INTERACTIVE_QUEUE_NAME, DocumentPriority.BULK: BULK_QUEUE_NAME}
+
+# ArqRedis.enqueue_job's writes as one step: the queue entry is only added when the job key was created, so a
+# document whose job already sits in (or runs from) the other queue is never queued twice. The keys after the
+# queue must not exist either: the result key, and the job key of the document's follow-up run.
+# KEYS: job key, queue, result key, follow-up job key; ARGV: serialized job, job key expiry (ms), score, job id
+_ENQUEUE_JOB = """
+if redis.call("EXISTS", KEYS[1], unpack(KEYS, 3)) > 0 then return 0 end
+redis.call("SET", KEYS[1], ARGV[1], "PX", ARGV[2])
+redis.call("ZADD", KEYS[2], "NX", ARGV[3], ARGV[4])
+return 1
+"""
+
+# Move a job that has not started yet from the bulk queue to the interactive one, keeping its score.
+# KEYS: bulk queue, interactive queue, the job's in-progress key; ARGV: job id
+_PROMOTE_JOB = """
+if redis.call("EXISTS", KEYS[3]) == 1 then return 0 end
+local score = redis.call("ZSCORE", KEYS[1], ARGV[1])
+if not score then return 0 end
+redis.call("ZREM", KEYS[1], ARGV[1])
+redis.call("ZADD", KEYS[2], score, ARGV[1])
+return 1
+"""
+
+
+def process_document_job_id(document_uuid: str) -> str:
+    """Deterministic job id: ARQ refuses a second job with the same id while one is queued or running."""
+    return f"{PROCESS_DOCUMENT}:{document_uuid}"
+
+
+def followup_job_id(document_uuid: str) -> str:
+    """Id of a follow-up run scheduled by a running job, whose own id is still taken until it returns.
+
+    Submissions treat either id as "a job exists", so a document never has two runs at once.
+    """
+    return f"{process_document_job_id(document_uuid)}:followup"
+
+
+def rerun_key(document_uuid: str) -> str:
+    """Set when a submission is coalesced into a running job; the worker then schedules one follow-up run."""
+    return f"summarizer:documents:{document_uuid}:rerun"
+
+
+async def enqueue_document(
+    redis: ArqRedis, document_uuid: str, priority: DocumentPriority = DocumentPriority.INTERACTIVE
+) -> bool:
+    """Enqueue `process_document` on the queue of `priority` unless a job for this document already exists.
+
+    Returns False when the submission was coalesced into the existing job.
+    """
+    return await enqueue_documents(redis, [document_uuid], priority) == 1
+
+
+async def enqueue_documents(
+    redis: ArqRedis,
+    document_uuids: Iterable[str],
+    priority: DocumentPriority = DocumentPriority.INTERACTIVE,
+    *,
+    coalesce: bool = True,
+) -> int:
+    """
+    Enqueue one `process_document` job per document in a single Redis pipeline (one round-trip).
+
+    Writes the same keys as `ArqRedis.enqueue_job`, one script per document: documents that already have a job
+    (or an unexpired result, or a follow-up run) are skipped, in whichever queue that job is. A skipped document
+    counts as a resubmission (see `_coalesce`) unless `coalesce` is False. Returns the number of jobs enqueued.
+    """
+    enqueue_time_ms = timestamp_ms()
+    uuids = list(document_uuids)
+    if not uuids:
+        return 0
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for document_uuid in uuids:
+            job_id = process_document_job_id(document_uuid)
+            job = serialize_job(
+                PROCESS_DOCUMENT, (document_uuid,), {}, None, enqueue_time_ms, serializer=redis.job_serializer
+            )
+            pipe.eval(
+                _ENQUEUE_JOB,
+                4,
+                job_key_prefix + job_id,
+                QUEUE_NAMES[priority],
+                result_key_prefix + job_id,
+                job_key_prefix + followup_job_id(document_uuid),
+                job,
+                redis.expires_extra_ms,
+                enqueue_time_ms,
+                job_id,
+            )
+        replies = await pipe.execute()
+
+    coalesced = [document_uuid for document_uuid, created in zip(uuids, replies, strict=True) if not created]
+    if coalesced and coalesce:
+        await _coalesce(redis, coalesced, priority)
+    return len(uuids) - len(coalesced)
+
+
+async def queue_depth(redis: ArqRedis, queue_name: str) -> int:
+    """Number of jobs waiting in the queue (queued, deferred or being retried)."""
+    return await redis.zcard(queue_name)
+
+
+async def _coalesce(redis: ArqRedis, document_uuids: list[str], priority: DocumentPriority) -> None:
+    """Count coalesced submissions and leave a rerun marker for each document.
+
+    The worker clears the marker when a run starts, so a submission coalesced into a queued job costs nothing,
+    while one that arrives during a run (which may have fetched the page already) gets exactly one follow-up.
+    An interactive submission also moves a job (or follow-up) still waiting in the bulk queue over to the
+    interactive one.
+    """
+    COALESCED_SUBMISSIONS.inc(len(document_uuids))
+    async with redis.pipeline(transaction=False) as pipe:
+        for document_uuid in document_uuids:
+            pipe.set(rerun_key(document_uuid), 1, ex=RERUN_MARKER_TTL)
+            if priority is not DocumentPriority.INTERACTIVE:
+                continue
+            for job_id in (process_document_job_id(document_uuid), followup_job_id(document_uuid)):
+                pipe.eval(
+                    _PROMOTE_JOB, 3, BULK_QUEUE_NAME, INTERACTIVE_QUEUE_NAME, in_progress_key_prefix + job_id, job_id
+                )
+        await pipe.execute()
@@ -0,0 +1,117 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+SUMMARY_CACHE_LOOKUPS = Counter(
+    "summarizer_summary_cache_lookups_total",
+    "Content-hash summary cache lookups in the worker (hit = LLM call skipped).",
+    ["result"],
+)
+
+JOB_STAGE_SECONDS = Histogram(
+    "summarizer_job_stage_seconds",
+    "Time spent per worker job stage (fetch, extract, preprocess, llm, db_write).",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+COALESCED_SUBMISSIONS = Counter(
+    "summarizer_coalesced_submissions_total",
+    "Submissions folded into an already queued or running process_document job.",
+)
+
+FOLLOWUP_RUNS = Counter(
+    "summarizer_followup_runs_total",
+    "Follow-up process_document runs scheduled for submissions that arrived during a run.",
+)
+
+WEBHOOK_ATTEMPTS = Counter(
+    "summarizer_webhook_attempts_total",
+    "Completion webhook delivery attempts (delivered, retried, failed for good, or refused by the address check).",
+    ["outcome"],
+)
+
+WEBHOOK_DELIVERY_SECONDS = Histogram(
+    "summarizer_webhook_delivery_seconds",
+    "Time from a document's final status to its webhook being delivered, retries included.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+
+ORPHANS_REQUEUED = Counter(
+    "summarizer_orphans_requeued_total",
+    "Documents left waiting without a job (PENDING, or abandoned PROCESSING) and enqueued again by the sweep.",
+)
+
+REFRESH_ENQUEUED = Counter(
+    "summarizer_refresh_enqueued_total",
+    "Stale documents put back to PENDING and enqueued on the bulk queue by the scheduled refresh.",
+)
+
+DOCUMENT_CACHE_LOOKUPS = Counter(
+    "summarizer_document_cache_lookups_total",
+    "GET /documents/{uuid}/ read-through cache lookups (each hit is a Postgres query saved).",
+    ["result"],
+)
+
+OLLAMA_BACKEND_IN_FLIGHT = Gauge(
+    "summarizer_ollama_backend_in_flight", "Ollama requests currently outstanding per backend.", ["backend"]
+)
+
+OLLAMA_BACKEND_REQUEST_SECONDS = Histogram(
+    "summarizer_ollama_backend_request_seconds",
+    "Duration of Ollama generations per backend.",
+    ["backend", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+
+OLLAMA_BACKEND_HEALTHY = Gauge(
+    "summarizer_ollama_backend_healthy", "1 while an Ollama backend is in rotation, 0 while it is ejected.", ["backend"]
+)
+
+OLLAMA_BACKEND_EJECTIONS = Counter(
+    "summarizer_ollama_backend_ejections_total", "Times an Ollama backend was taken out of rotation.", ["backend"]
+)
+
+STAGE_CONCURRENCY_LIMIT = Gauge(
+    "summarizer_stage_concurrency_limit",
+    "Current concurrency limit of a worker stage (the LLM stage adapts it to Ollama latency and errors).",
+    ["stage"],
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "summarizer_http_request_seconds",
+    "API request latency per route template (streaming responses count until the stream ends).",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+QUEUE_DEPTH = Gauge(
+    "summarizer_queue_depth", "Jobs waiting in the ARQ queue, refreshed on every /metrics scrape of the API.", ["queue"]
+)
+
+DOCUMENT_STATUS_TRANSITIONS = Counter(
+    "summarizer_document_status_transitions_total",
+    "Documents moved to a status (PENDING on submission, the rest by the worker).",
+    ["status"],
+)
+
+PROMPT_TOKENS = Histogram(
+    "summarizer_prompt_tokens",
+    "Prompt size per Ollama generation, as counted by Ollama (estimated when it does not report it).",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+
+OLLAMA_TOKENS_PER_SECOND = Histogram(
+    "summarizer_ollama_tokens_per_second",
+    "Generation speed reported by Ollama (eval_count / eval_duration) per generation.",
+    buckets=(1, 2.5, 5, 10, 20, 40, 80, 160, 320),
+)
+
+PREPROCESS_TOKENS_SAVED = Histogram(
+    "summarizer_preprocess_tokens_saved",
+    "Estimated prompt tokens removed per document by deduplication and sentence ranking.",
+    buckets=(0, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000),
+)
+
+PREPROCESS_SECONDS_SAVED = Counter(
+    "summarizer_preprocess_seconds_saved_total",
+    "Ollama prompt evaluation time saved by preprocessing, estimated from the observed prompt eval speed.",
+)
@@ -1,24 +1,91 @@
 import logging
+import random
 import time
-from typing import Awaitable, Callable
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request, Response
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import ACCESS_LOG_SAMPLE_RATE
+from app.core.metrics import HTTP_REQUEST_SECONDS
 
 logger = logging.getLogger("app")
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(
-            self, request: Request,
-            call_next: Callable[[Request], Awaitable[Response]]
-    ) -> Response:
-        start_time = time.time()
-        response = None
+class LoggingMiddleware:
+    """One access log line per request, written once the response is complete (plain ASGI, so streamed bodies
+    pass straight through).
+
+    Successful requests are sampled at `sample_rate`; server errors are always logged, at WARNING. Nothing is
+    formatted unless the "app" logger would emit the line.
+    """
+
+    def __init__(self, app: ASGIApp, *, sample_rate: float = ACCESS_LOG_SAMPLE_RATE) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code: Optional[int] = None
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            level = self._level(status_code)
+            if level is not None and logger.isEnabledFor(level):
+                duration = (time.perf_counter() - start_time) * 1000
+                logger.log(
+                    level,
+                    f"{scope['method']} {scope['path']} completed with status {status_code or 'N/A'} "
+                    f"in {duration:.2f}ms",
+                )
+
+    def _level(self, status_code: Optional[int]) -> Optional[int]:
+        # no status: the app raised before answering
+        if status_code is None or status_code >= 500:
+            return logging.WARNING
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:  # noqa: S311 - sampling, not crypto
+            return logging.INFO
+        return None
+
+
+class MetricsMiddleware:
+    """Records request latency per route template (plain ASGI, so streamed bodies pass straight through).
+
+    The route is read from the scope after routing (FastAPI stores the matched route there), which keeps
+    the label set bounded: unmatched paths are all reported as "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         try:
-            logger.info(f"Incoming request: {request.method} {request.url}")
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_with_status)
         finally:
-            duration = (time.time() - start_time) * 1000
-            status_code = response.status_code if response else "N/A"
-            logger.info(f"Completed {request.method} {request.url} with status {status_code} in {duration:.2f}ms")
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(method=scope["method"], route=route, status=str(status_code)).observe(
+                time.perf_counter() - start_time
+            )
@@ -1,7 +1,7 @@
 import enum
 import uuid
 
-from sqlalchemy import Column, Enum, String, Text, DateTime, func
+from sqlalchemy import Boolean, Column, Enum, Index, String, Text, DateTime, false, func
 from sqlalchemy.sql.functions import now
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import DeclarativeBase
@@ -19,11 +19,28 @@ class DocumentStatus(str, enum.Enum):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ux_documents_name", "name", unique=True),
+        Index("ux_documents_url", "url", unique=True),
+        Index("ix_documents_created_at_uuid", "created_at", "document_uuid"),
+        Index("ix_documents_updated_at", "updated_at"),
+    )
 
     document_uuid = Column(UUID(as_uuid=True), default=uuid.uuid4, primary_key=True, nullable=False)
     name = Column(String, nullable=False)
     url = Column(String, nullable=False)
     summary = Column(Text, nullable=True)
     status = Column(Enum(DocumentStatus), nullable=False) # type: ignore
+    # sha256 of (model, prompt version, extracted text) of the last successful summary
+    content_hash = Column(String(64), nullable=True)
+    # model and prompt version of the last successful summary (see app.worker.utils.summary_key)
+    summary_key = Column(String, nullable=True)
+    # HTTP validators of the page behind the last successful summary (conditional re-fetch)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    # the page behind the summary was cut at FETCH_MAX_BYTES
+    truncated = Column(Boolean, nullable=False, default=False, server_default=false())
+    # POSTed the final document once a run ends in SUCCESS/FAILED (see app.worker.webhooks)
+    callback_url = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.timezone("utc", now()))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.timezone("utc", now()))
@@ -1,14 +1,25 @@
+import enum
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel, computed_field
+from pydantic import BaseModel, Field, computed_field
 
 from app.core.models import DocumentStatus
 
 
+class DocumentPriority(str, enum.Enum):
+    # someone is waiting for this summary
+    INTERACTIVE = "interactive"
+    # refreshes and large imports: processed alongside interactive work, never ahead of it
+    BULK = "bulk"
+
+
 class DocumentCreate(BaseModel):
     name: str
     url: str
+    priority: DocumentPriority = DocumentPriority.INTERACTIVE
+    # receives a POST of the final DocumentRead when processing ends (SUCCESS or FAILED)
+    callback_url: Optional[str] = Field(None, pattern=r"^https?://")
 
 
 class DocumentRead(BaseModel):
@@ -17,19 +28,42 @@ class DocumentRead(BaseModel):
     url: str
     summary: Optional[str] = None
     status: DocumentStatus
+    # the summary was made from a page cut at the download size limit
+    truncated: bool = False
 
     @computed_field(return_type=float)
     def data_progress(self) -> float:
-        match self.status:
-            case DocumentStatus.PENDING:
-                return 0.0
-            case DocumentStatus.PROCESSING:
-                return 0.5
-            case DocumentStatus.SUCCESS:
-                return 1.0
-            case DocumentStatus.FAILED:
-                return -1.0
-        return 0.0
+        return status_progress(self.status)
 
     class Config:
         from_attributes = True
+
+
+def status_progress(status: DocumentStatus) -> float:
+    match status:
+        case DocumentStatus.PENDING:
+            return 0.0
+        case DocumentStatus.PROCESSING:
+            return 0.5
+        case DocumentStatus.SUCCESS:
+            return 1.0
+        case DocumentStatus.FAILED:
+            return -1.0
+    return 0.0
+
+
+# what GET /documents/?fields= may select, in response order
+DOCUMENT_READ_FIELDS = (*DocumentRead.model_fields, *DocumentRead.model_computed_fields)
+
+
+class SubmissionResult(str, enum.Enum):
+    CREATED = "created"
+    RESUMMARIZED = "resummarized"
+    CONFLICT = "conflict"
+
+
+class DocumentBatchItemResult(BaseModel):
+    index: int
+    result: SubmissionResult
+    document: Optional[DocumentRead] = None
+    detail: Optional[str] = None
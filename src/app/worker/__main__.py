@@ -0,0 +1,7 @@
+import asyncio
+
+from app.worker.runner import run_workers
+from app.worker.tasks import WebhookWorkerSettings, WorkerSettings
+
+if __name__ == "__main__":
+    asyncio.run(run_workers(WorkerSettings, WebhookWorkerSettings))
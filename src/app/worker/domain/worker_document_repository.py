@@ -1,28 +1,36 @@
-from typing import Optional, Type
+from datetime import timedelta
+from typing import AsyncIterator, Optional, Sequence, Type
 from types import TracebackType
 
-from sqlalchemy import select, update
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
 from app.core.models import Document, DocumentStatus
-from app.core.config import DATABASE_URL
+from app.core.config import CLAIM_STALE_SECONDS, DATABASE_URL
 
 
 # Async engine & session factory
 engine = create_async_engine(DATABASE_URL, echo=False, future=True)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
+# PROCESSING but untouched for CLAIM_STALE_SECONDS: its worker died, and claim() may take it over
+_ABANDONED = (Document.status == DocumentStatus.PROCESSING) & (
+    Document.updated_at < func.now() - timedelta(seconds=CLAIM_STALE_SECONDS)
+)
+
 
 class WorkerDocumentRepository:
-    def __init__(self, session: Optional[AsyncSession] = None):
-        self._external_session = session
-        self._session: Optional[AsyncSession] = None
+    """
+    Document access for the worker. Every method is a single statement on an AUTOCOMMIT connection:
+    one round-trip, no transaction held open while the job fetches pages or waits on the LLM.
+    Safe to share between the concurrent jobs of a worker (each call checks out its own connection).
+    """
+
+    def __init__(self, bind: Optional[AsyncEngine] = None):
+        self._engine = (bind or engine).execution_options(isolation_level="AUTOCOMMIT")
+        self._sessions = async_sessionmaker(self._engine, expire_on_commit=False)
 
     async def __aenter__(self) -> "WorkerDocumentRepository":
-        if self._external_session:
-            self._session = self._external_session
-        else:
-            self._session = AsyncSessionLocal()
         return self
 
     async def __aexit__(
@@ -31,26 +39,120 @@ class WorkerDocumentRepository:
             exc: Optional[BaseException],
             tb: Optional[TracebackType],
     ) -> None:
-        if not self._external_session and self._session:
-            await self._session.close()
+        await self.close()
 
     async def close(self) -> None:
-        if self._session:
-            await self._session.close()
+        await self._engine.dispose()
 
     async def get_by_id(self, document_uuid: str) -> Optional[Document]:
-        async with AsyncSessionLocal() as session:
+        async with self._sessions() as session:
             result = await session.execute(select(Document).where(Document.document_uuid == document_uuid))
             return result.scalar_one_or_none()
 
+    async def claim(self, document_uuid: str) -> Optional[Document]:
+        """
+        Atomically move a PENDING document to PROCESSING and return it, or None if it is missing or another
+        worker owns it. The row is picked with FOR UPDATE SKIP LOCKED, so concurrent claims never both win.
+        A PROCESSING row untouched for CLAIM_STALE_SECONDS (its worker died) can be claimed again.
+        """
+        claimable = (
+            select(Document.document_uuid)
+            .where(Document.document_uuid == document_uuid, or_(Document.status == DocumentStatus.PENDING, _ABANDONED))
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with self._sessions() as session:
+            result = await session.execute(
+                update(Document)
+                .where(Document.document_uuid == claimable)
+                .values(status=DocumentStatus.PROCESSING)
+                .returning(Document),
+                execution_options={"synchronize_session": False},
+            )
+            return result.scalar_one_or_none()
+
     async def update_status(self, document_uuid: str, status: DocumentStatus) -> None:
-        async with AsyncSessionLocal() as session:
+        async with self._sessions() as session:
             await session.execute(update(Document).where(Document.document_uuid == document_uuid).values(status=status))
-            await session.commit()
 
-    async def update_summary(self, document_uuid: str, summary: str, status: DocumentStatus) -> None:
-        async with AsyncSessionLocal() as session:
+    async def update_summary(
+            self,
+            document_uuid: str,
+            summary: str,
+            status: DocumentStatus,
+            *,
+            content_hash: Optional[str] = None,
+            summary_key: Optional[str] = None,
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None,
+            truncated: bool = False,
+    ) -> None:
+        async with self._sessions() as session:
             await session.execute(
-                update(Document).where(Document.document_uuid == document_uuid).values(summary=summary, status=status)
+                update(Document)
+                .where(Document.document_uuid == document_uuid)
+                .values(
+                    summary=summary,
+                    status=status,
+                    content_hash=content_hash,
+                    summary_key=summary_key,
+                    etag=etag,
+                    last_modified=last_modified,
+                    truncated=truncated,
+                )
+            )
+
+    async def iter_unclaimed(self, pending_for: timedelta, *, batch_size: int) -> AsyncIterator[list[str]]:
+        """
+        Uuids of the documents waiting for a run, oldest update first, in batches of `batch_size`: PENDING for
+        at least `pending_for`, or abandoned in PROCESSING (see `claim`). Keyset-paginated on
+        (updated_at, document_uuid), one short query per batch.
+        """
+        waiting = select(Document.updated_at, Document.document_uuid).where(
+            or_(
+                (Document.status == DocumentStatus.PENDING) & (Document.updated_at < func.now() - pending_for),
+                _ABANDONED,
+            )
+        )
+        after = None
+        while True:
+            stmt = waiting
+            if after is not None:
+                stmt = stmt.where(tuple_(Document.updated_at, Document.document_uuid) > tuple_(*after))
+            async with self._sessions() as session:
+                result = await session.execute(
+                    stmt.order_by(Document.updated_at, Document.document_uuid).limit(batch_size)
+                )
+                rows = result.all()
+            if rows:
+                yield [str(document_uuid) for _, document_uuid in rows]
+            if len(rows) < batch_size:
+                return
+            after = tuple(rows[-1])
+
+    async def mark_stale_pending(self, older_than: timedelta, *, limit: int) -> Sequence[Document]:
+        """
+        Move up to `limit` SUCCESS/FAILED documents not updated for `older_than` back to PENDING, oldest first,
+        and return them. One statement: a short range scan of the updated_at index, rows locked with
+        FOR UPDATE SKIP LOCKED so concurrent callers never pick the same document. PENDING/PROCESSING
+        documents are left alone, and the update (which bumps updated_at) takes the rows out of the next call.
+        """
+        stale = (
+            select(Document.document_uuid)
+            .where(
+                Document.updated_at < func.now() - older_than,
+                Document.status.in_([DocumentStatus.SUCCESS, DocumentStatus.FAILED]),
+            )
+            .order_by(Document.updated_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with self._sessions() as session:
+            result = await session.execute(
+                update(Document)
+                .where(Document.document_uuid.in_(stale))
+                .values(status=DocumentStatus.PENDING)
+                .returning(Document),
+                execution_options={"synchronize_session": False},
             )
-            await session.commit()
+            return result.scalars().all()
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.core.metrics import STAGE_CONCURRENCY_LIMIT
+
+logger = logging.getLogger("app")
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """Errors that mean "the model server is saturated", as opposed to a bad request or a dead host."""
+    if isinstance(exc, httpx.TimeoutException):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == httpx.codes.TOO_MANY_REQUESTS or exc.response.status_code >= 500
+    return False
+
+
+class SlotTimeoutError(TimeoutError):
+    """No slot of an `AdaptiveLimiter` freed up in time: the stage is saturated, the request itself is fine."""
+
+
+@dataclass
+class LimiterSample:
+    """Filled in by the caller while holding a slot; `latency` defaults to the time the slot was held."""
+
+    started: float
+    latency: Optional[float] = None
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit.
+
+    Every sample at or under `latency_target` taken while the limit was reached grows it by 1/limit
+    (about +1 per full window of requests); a slower sample or an overload error multiplies it by
+    `backoff`. Only requests started after the last decrease can trigger another one, so a burst of
+    in-flight failures halves the limit once instead of collapsing it to the minimum.
+
+    Freed slots go to waiting foreground callers first; `background` callers only get a slot nobody
+    else is waiting for.
+    """
+
+    def __init__(
+        self, name: str, *, initial: int, minimum: int, maximum: int, latency_target: float, backoff: float = 0.5
+    ) -> None:
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._background_waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        STAGE_CONCURRENCY_LIMIT.labels(stage=name).set(self.limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @asynccontextmanager
+    async def acquire(
+        self, *, background: bool = False, timeout: Optional[float] = None
+    ) -> AsyncIterator[LimiterSample]:
+        """Hold one slot for the block; raises SlotTimeoutError if none frees up within `timeout` seconds."""
+        try:
+            async with asyncio.timeout(timeout):
+                await self._wait_for_slot(self._background_waiters if background else self._waiters)
+        except TimeoutError:
+            raise SlotTimeoutError(f"No {self.name} slot free after {timeout:.0f}s (limit {self.limit})") from None
+        sample = LimiterSample(started=time.monotonic())
+        error: Optional[BaseException] = None
+        try:
+            yield sample
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # only grow a limit that is actually binding, not one that is never reached
+            saturated = self._in_flight >= self.limit
+            self._in_flight -= 1
+            if error is not None:
+                # other failures (bad request, unreachable host) say nothing about the model's capacity, and a
+                # block cancelled by a job timeout or a shutdown was cut short, so its elapsed time is no latency
+                if is_overload_error(error):
+                    self._decrease(sample.started)
+            else:
+                latency = sample.latency if sample.latency is not None else time.monotonic() - sample.started
+                if latency > self.latency_target:
+                    self._decrease(sample.started)
+                elif saturated:
+                    self._increase()
+            self._wake()
+
+    async def _wait_for_slot(self, waiters: deque[asyncio.Future]) -> None:
+        # background callers also queue up behind waiting foreground ones, not just behind a full limit
+        while self._in_flight >= self.limit or (waiters is self._background_waiters and self._has_waiters()):
+            waiter = asyncio.get_running_loop().create_future()
+            waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # we may have been woken just before the cancellation: pass the turn on
+                self._wake()
+                raise
+            finally:
+                if waiter in waiters:
+                    waiters.remove(waiter)
+        self._in_flight += 1
+
+    def _has_waiters(self) -> bool:
+        return any(not waiter.done() for waiter in self._waiters)
+
+    def _wake(self) -> None:
+        free = self.limit - self._in_flight
+        for waiter in (*self._waiters, *self._background_waiters):
+            if free <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _increase(self) -> None:
+        previous = self.limit
+        self._limit = min(self.maximum, self._limit + 1 / self._limit)
+        if self.limit != previous:
+            STAGE_CONCURRENCY_LIMIT.labels(stage=self.name).set(self.limit)
+
+    def _decrease(self, started: float) -> None:
+        if started < self._last_decrease:
+            return
+        previous = self.limit
+        self._limit = max(float(self.minimum), self._limit * self.backoff)
+        self._last_decrease = time.monotonic()
+        if self.limit != previous:
+            logger.info(f"[Worker] {self.name} concurrency limit lowered from {previous} to {self.limit}")
+            STAGE_CONCURRENCY_LIMIT.labels(stage=self.name).set(self.limit)
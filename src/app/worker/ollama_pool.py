@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Collection, Optional, Sequence
+
+import httpx
+
+from app.core.config import (
+    LLM_CONCURRENCY_INITIAL,
+    LLM_CONCURRENCY_MAX,
+    LLM_CONCURRENCY_MIN,
+    LLM_LATENCY_TARGET,
+    OLLAMA_EJECT_FAILURES,
+    OLLAMA_EJECT_SECONDS,
+    OLLAMA_HEALTH_INTERVAL,
+)
+from app.core.metrics import (
+    OLLAMA_BACKEND_EJECTIONS,
+    OLLAMA_BACKEND_HEALTHY,
+    OLLAMA_BACKEND_IN_FLIGHT,
+    OLLAMA_BACKEND_REQUEST_SECONDS,
+)
+from app.worker.limits import AdaptiveLimiter
+
+logger = logging.getLogger("app")
+
+
+@dataclass
+class OllamaBackend:
+    """One Ollama endpoint and the routing state the pool keeps for it."""
+
+    base_url: str
+    in_flight: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+
+    def is_available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class OllamaPool:
+    """Routes Ollama requests across several backends, least outstanding requests first.
+
+    A backend failing `max_failures` requests in a row is ejected for `eject_seconds`; the background
+    health check brings it back early once it answers again. When every backend is ejected the pool
+    fails open and keeps routing to the one whose ejection ends first.
+
+    `limiter` bounds concurrent generations across all backends (see `_generate`); by default an AIMD
+    limit configured by the LLM_CONCURRENCY_* settings.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        backends: Sequence[str],
+        *,
+        max_failures: int = OLLAMA_EJECT_FAILURES,
+        eject_seconds: float = OLLAMA_EJECT_SECONDS,
+        health_interval: float = OLLAMA_HEALTH_INTERVAL,
+        limiter: Optional[AdaptiveLimiter] = None,
+    ) -> None:
+        if not backends:
+            raise ValueError("OllamaPool needs at least one backend")
+        self.client = client
+        self.backends = [OllamaBackend(url.rstrip("/")) for url in backends]
+        self.max_failures = max(1, max_failures)
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.limiter = limiter or AdaptiveLimiter(
+            "llm",
+            initial=LLM_CONCURRENCY_INITIAL,
+            minimum=LLM_CONCURRENCY_MIN,
+            maximum=LLM_CONCURRENCY_MAX,
+            latency_target=LLM_LATENCY_TARGET,
+        )
+        # rotating start index so equally loaded backends take turns
+        self._ties = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+        for backend in self.backends:
+            OLLAMA_BACKEND_IN_FLIGHT.labels(backend=backend.base_url).set(0)
+            OLLAMA_BACKEND_HEALTHY.labels(backend=backend.base_url).set(1)
+
+    def pick(self, exclude: Collection[str] = ()) -> OllamaBackend:
+        """Least in-flight backend in rotation, skipping `exclude` (base URLs) unless nothing else is left."""
+        now = time.monotonic()
+        offset = next(self._ties) % len(self.backends)
+        rotated = [b for b in self.backends[offset:] + self.backends[:offset] if b.base_url not in exclude]
+        rotated = rotated or self.backends
+        available = [b for b in rotated if b.is_available(now)]
+        if not available:
+            return min(rotated, key=lambda b: b.ejected_until)
+        return min(available, key=lambda b: b.in_flight)
+
+    @asynccontextmanager
+    async def lease(self, exclude: Collection[str] = ()) -> AsyncIterator[OllamaBackend]:
+        """Pick a backend and account for one request against it for the duration of the block."""
+        backend = self.pick(exclude)
+        backend.in_flight += 1
+        OLLAMA_BACKEND_IN_FLIGHT.labels(backend=backend.base_url).inc()
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield backend
+            outcome = "success"
+            self._record_success(backend)
+        except Exception:
+            self._record_failure(backend)
+            raise
+        finally:
+            backend.in_flight -= 1
+            OLLAMA_BACKEND_IN_FLIGHT.labels(backend=backend.base_url).dec()
+            OLLAMA_BACKEND_REQUEST_SECONDS.labels(backend=backend.base_url, outcome=outcome).observe(
+                time.perf_counter() - started
+            )
+
+    def _record_success(self, backend: OllamaBackend) -> None:
+        backend.consecutive_failures = 0
+        if backend.ejected_until:
+            logger.info(f"[Ollama] Backend {backend.base_url} is healthy again")
+            backend.ejected_until = 0.0
+            OLLAMA_BACKEND_HEALTHY.labels(backend=backend.base_url).set(1)
+
+    def _record_failure(self, backend: OllamaBackend) -> None:
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.max_failures:
+            if backend.is_available(time.monotonic()):
+                logger.warning(
+                    f"[Ollama] Ejecting backend {backend.base_url} for {self.eject_seconds:.0f}s "
+                    f"after {backend.consecutive_failures} consecutive failures"
+                )
+                OLLAMA_BACKEND_EJECTIONS.labels(backend=backend.base_url).inc()
+                OLLAMA_BACKEND_HEALTHY.labels(backend=backend.base_url).set(0)
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+
+    async def _probe(self, backend: OllamaBackend) -> None:
+        try:
+            r = await self.client.get(f"{backend.base_url}/api/version", timeout=self.health_interval or None)
+            r.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.info(f"[Ollama] Health check failed for {backend.base_url}: {e!r}")
+            # a failed probe ejects right away, a request failure needs max_failures in a row
+            backend.consecutive_failures = max(backend.consecutive_failures, self.max_failures - 1)
+            self._record_failure(backend)
+        else:
+            self._record_success(backend)
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*(self._probe(b) for b in self.backends))
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+    def start(self) -> None:
+        """Start background health checks (only useful with more than one backend)."""
+        if self._health_task is None and self.health_interval > 0 and len(self.backends) > 1:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def aclose(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        await self.client.aclose()
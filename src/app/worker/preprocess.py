@@ -0,0 +1,125 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from app.worker.utils import CHARS_PER_TOKEN, estimate_tokens
+
+# Sentence boundary: terminal punctuation followed by whitespace and something that can start a sentence
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+(?=[\"'“(\[]?[A-Z0-9À-Ý])")
+_WORD = re.compile(r"[^\W\d_]{3,}")
+
+# Small English list: enough to keep function words from dominating the frequency scores
+_STOPWORDS = frozenset(
+    """
+    about above after again against all also and any are because been before being below between both but
+    can could did does doing down during each few for from further had has have having her here hers herself
+    him himself his how into its itself just more most myself nor not now off once only other our ours
+    ourselves out over own same she should some such than that the their theirs them themselves then there
+    these they this those through too under until very was were what when where which while who whom why
+    will with would you your yours yourself yourselves one two may might must shall also however
+    """.split()
+)
+
+
+@dataclass(frozen=True)
+class PreprocessedText:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    duplicate_paragraphs: int
+    # sentences were dropped to fit the token budget
+    ranked: bool
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def dedupe_paragraphs(text: str) -> tuple[list[str], int]:
+    """Drop empty and repeated paragraphs (compared case- and whitespace-insensitively), keeping the first."""
+    seen: set[str] = set()
+    kept: list[str] = []
+    duplicates = 0
+    for paragraph in text.splitlines():
+        key = " ".join(paragraph.casefold().split())
+        if not key:
+            continue
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        kept.append(paragraph.strip())
+    return kept, duplicates
+
+
+def split_sentences(paragraph: str) -> list[str]:
+    return [s for s in _SENTENCE_END.split(paragraph) if s.strip()]
+
+
+def _content_words(sentence: str) -> list[str]:
+    return [w for w in (m.group().casefold() for m in _WORD.finditer(sentence)) if w not in _STOPWORDS]
+
+
+def select_sentences(paragraphs: list[str], budget_tokens: int) -> str:
+    """Cheap extractive ranking: keep the highest scoring sentences that fit the budget, in document order.
+
+    A sentence scores the document frequency of its distinct content words, normalized by the square root
+    of their count so long sentences are not favoured just for their length. Sentences without at least
+    three content words (menus, captions, "Read more") score zero and are dropped.
+    """
+    sentences = [(p_index, s) for p_index, paragraph in enumerate(paragraphs) for s in split_sentences(paragraph)]
+    words = [_content_words(s) for _, s in sentences]
+    frequency = Counter(w for sentence_words in words for w in set(sentence_words))
+
+    def score(index: int) -> float:
+        distinct = set(words[index])
+        if len(distinct) < 3:
+            return 0.0
+        return sum(frequency[w] for w in distinct) / math.sqrt(len(distinct))
+
+    chosen: set[int] = set()
+    used = 0
+    scores = {index: score(index) for index in range(len(sentences))}
+    for index in sorted((i for i in scores if scores[i] > 0), key=scores.__getitem__, reverse=True):
+        cost = estimate_tokens(sentences[index][1]) + 1
+        if used + cost > budget_tokens:
+            continue
+        chosen.add(index)
+        used += cost
+
+    if not chosen:
+        # nothing sentence-like fits (e.g. one huge unpunctuated block): keep the start of the text
+        return "\n".join(paragraphs)[: budget_tokens * CHARS_PER_TOKEN]
+
+    # rebuild in the original order, keeping paragraph breaks
+    out: list[list[str]] = []
+    last_paragraph = None
+    for index in sorted(chosen):
+        p_index, sentence = sentences[index]
+        if p_index != last_paragraph:
+            out.append([])
+            last_paragraph = p_index
+        out[-1].append(sentence)
+    return "\n".join(" ".join(group) for group in out)
+
+
+def preprocess(text: str, budget_tokens: int) -> PreprocessedText:
+    """Shrink the prompt before generation: dedupe paragraphs, then rank sentences if still over budget.
+
+    `budget_tokens` <= 0 only deduplicates. CPU-bound on long pages, so the worker runs it in the
+    extraction process pool.
+    """
+    tokens_before = estimate_tokens(text)
+    paragraphs, duplicates = dedupe_paragraphs(text)
+    deduped = "\n".join(paragraphs)
+
+    ranked = budget_tokens > 0 and estimate_tokens(deduped) > budget_tokens
+    result = select_sentences(paragraphs, budget_tokens) if ranked else deduped
+    return PreprocessedText(
+        text=result,
+        tokens_before=tokens_before,
+        tokens_after=estimate_tokens(result),
+        duplicate_paragraphs=duplicates,
+        ranked=ranked,
+    )
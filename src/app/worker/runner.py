@@ -0,0 +1,111 @@
+"""Worker entrypoint consuming every queue in one process.
+
+An ARQ `Worker` polls a single queue, so this runs one per queue (`python -m app.worker`). They share one
+Redis pool and the context built by the settings' `on_startup` hooks (HTTP clients, Ollama pool and stage
+limits). The summarization workers split `WorkerSettings.max_jobs` between them by
+`WorkerSettings.queue_weights`: a backlog of bulk jobs never holds the interactive queue's job slots, and the
+LLM limiter serves interactive jobs first. Settings without `queue_weights` (webhooks) get one worker on
+their `queue_name` with their own `max_jobs`.
+"""
+
+import asyncio
+import logging
+import signal
+from typing import Any, Mapping
+
+from arq.connections import create_pool
+from arq.worker import Worker, get_kwargs
+
+from app.core.jobs import QUEUE_NAMES
+from app.core.schemas import DocumentPriority
+
+logger = logging.getLogger("app")
+
+# set once for all workers by run_workers, instead of by each Worker
+_SHARED_SETTINGS = (
+    "queue_name",
+    "max_jobs",
+    "redis_settings",
+    "redis_pool",
+    "ctx",
+    "on_startup",
+    "on_shutdown",
+    "cron_jobs",
+)
+
+
+def queue_job_slots(max_jobs: int, weights: Mapping[DocumentPriority, int]) -> dict[DocumentPriority, int]:
+    """Split `max_jobs` by weight; every queue with a positive weight keeps at least one slot."""
+    total = sum(w for w in weights.values() if w > 0)
+    return {priority: max(1, round(max_jobs * weight / total)) for priority, weight in weights.items() if weight > 0}
+
+
+def create_workers(settings: Any, *, redis_pool: Any, ctx: dict[str, Any]) -> list[Worker]:
+    """One ARQ worker per weighted queue, each with its own copy of `ctx` telling jobs their priority.
+
+    Cron jobs run once, on the worker of the lowest priority queue.
+    """
+    kwargs = {k: v for k, v in get_kwargs(settings).items() if k not in _SHARED_SETTINGS}
+    if not hasattr(settings, "queue_weights"):
+        logger.info(f"[Worker] Consuming {settings.queue_name} with up to {settings.max_jobs} jobs")
+        return [
+            Worker(
+                queue_name=settings.queue_name,
+                max_jobs=settings.max_jobs,
+                redis_pool=redis_pool,
+                ctx=ctx,
+                handle_signals=False,
+                cron_jobs=getattr(settings, "cron_jobs", None),
+                **kwargs,
+            )
+        ]
+    slots_by_priority = queue_job_slots(settings.max_jobs, settings.queue_weights)
+    lowest = max(slots_by_priority, key=list(DocumentPriority).index)
+    workers = []
+    for priority, slots in slots_by_priority.items():
+        logger.info(f"[Worker] Consuming {QUEUE_NAMES[priority]} ({priority.value}) with up to {slots} jobs")
+        workers.append(
+            Worker(
+                queue_name=QUEUE_NAMES[priority],
+                max_jobs=slots,
+                redis_pool=redis_pool,
+                ctx={**ctx, "priority": priority},
+                handle_signals=False,
+                cron_jobs=getattr(settings, "cron_jobs", None) if priority is lowest else None,
+                **kwargs,
+            )
+        )
+    return workers
+
+
+async def run_workers(*all_settings: Any) -> None:
+    """Run until SIGINT/SIGTERM; like `arq`, jobs still running then are cancelled and retried later."""
+    redis = await create_pool(all_settings[0].redis_settings)
+    ctx: dict[str, Any] = {"redis": redis}
+    for settings in all_settings:
+        await settings.on_startup(ctx)
+
+    workers = [w for settings in all_settings for w in create_workers(settings, redis_pool=redis, ctx=ctx)]
+    for worker in workers:
+        worker.main_task = asyncio.create_task(worker.main())
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    stopped = asyncio.create_task(stop.wait())
+    try:
+        done, _ = await asyncio.wait([stopped, *(w.main_task for w in workers)], return_when=asyncio.FIRST_COMPLETED)
+        for task in done - {stopped}:
+            task.result()  # a worker loop only ends on error: surface it
+    finally:
+        stopped.cancel()
+        for worker in workers:
+            worker.handle_sig(signal.SIGTERM)
+        await asyncio.gather(
+            *(w.main_task for w in workers), *(t for w in workers for t in w.tasks.values()), return_exceptions=True
+        )
+        await redis.delete(*(w.health_check_key for w in workers))
+        for settings in reversed(all_settings):
+            await settings.on_shutdown(ctx)
+        await redis.close(close_connection_pool=True)
@@ -1,13 +1,87 @@
+import asyncio
+import contextlib
+import httpx
 import logging
-from typing import Any, MutableMapping
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Any, MutableMapping, Optional
 import os
-from app.core.models import DocumentStatus
+from app.core.cache import cache_document, cache_documents
+from app.core.config import (
+    BULK_QUEUE_WEIGHT,
+    CLAIM_STALE_SECONDS,
+    EXTRACT_POOL_WORKERS,
+    FETCH_CONCURRENCY,
+    INTERACTIVE_QUEUE_WEIGHT,
+    LLM_SLOT_RETRY_DELAY,
+    OLLAMA_BACKENDS,
+    ORPHAN_PENDING_SECONDS,
+    ORPHAN_SWEEP_BATCH_SIZE,
+    ORPHAN_SWEEP_EVERY_MINUTES,
+    PREPROCESS_ENABLED,
+    PREPROCESS_TOKEN_BUDGET,
+    PROCESS_DOCUMENT_MAX_TRIES,
+    PROCESS_DOCUMENT_TIMEOUT,
+    REFRESH_BATCH_SIZE,
+    REFRESH_ENABLED,
+    REFRESH_EVERY_MINUTES,
+    REFRESH_MAX_AGE_SECONDS,
+    REFRESH_MAX_PER_RUN,
+    REFRESH_RATE_PER_SECOND,
+    STREAM_PROGRESS_INTERVAL,
+    WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_MAX_JOBS,
+    WEBHOOK_QUEUE_NAME,
+    WORKER_MAX_JOBS,
+    WORKER_METRICS_PORT,
+)
+from app.core.events import ProgressPublisher, publish_status
+from app.core.jobs import (
+    PROCESS_DOCUMENT,
+    QUEUE_NAMES,
+    enqueue_documents,
+    followup_job_id,
+    process_document_job_id,
+    queue_depth,
+    rerun_key,
+)
+from app.core.metrics import (
+    DOCUMENT_STATUS_TRANSITIONS,
+    FOLLOWUP_RUNS,
+    JOB_STAGE_SECONDS,
+    ORPHANS_REQUEUED,
+    PREPROCESS_SECONDS_SAVED,
+    PREPROCESS_TOKENS_SAVED,
+    REFRESH_ENQUEUED,
+    STAGE_CONCURRENCY_LIMIT,
+    SUMMARY_CACHE_LOOKUPS,
+)
+from app.core.models import Document, DocumentStatus
+from app.core.schemas import DocumentPriority, DocumentRead
 
 
 from app.worker.domain.worker_document_repository import WorkerDocumentRepository
-from app.worker.utils import call_ollama, fetch_and_extract
+from app.worker.limits import SlotTimeoutError
+from app.worker.ollama_pool import OllamaPool
+from app.worker.preprocess import preprocess
+from app.worker import webhooks
+from app.worker.utils import (
+    FetchedPage,
+    call_ollama,
+    content_hash,
+    create_fetch_client,
+    create_ollama_client,
+    estimate_prompt_seconds,
+    extract_text,
+    fetch_page,
+    summary_key,
+)
 
-from arq.connections import RedisSettings
+from arq import Retry, cron, func
+from arq.connections import ArqRedis, RedisSettings
+from prometheus_client import start_http_server
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s %(levelname)-8s %(name)s — %(message)s [%(pathname)s:%(lineno)d]"
@@ -17,44 +91,368 @@ logger = logging.getLogger("app")
 
 
 async def startup(ctx: MutableMapping[str, Any]) -> None:
+    if CLAIM_STALE_SECONDS <= PROCESS_DOCUMENT_TIMEOUT:
+        # claim() would hand a document to a second worker while its first job is still allowed to run
+        raise RuntimeError(
+            f"CLAIM_STALE_SECONDS ({CLAIM_STALE_SECONDS}) must be longer than "
+            f"PROCESS_DOCUMENT_TIMEOUT ({PROCESS_DOCUMENT_TIMEOUT})"
+        )
     ctx["document_repo"] = WorkerDocumentRepository()
+    if WORKER_METRICS_PORT:
+        # Prometheus side port (the worker has no HTTP server of its own); served from a daemon thread
+        try:
+            ctx["metrics_server"], _thread = start_http_server(WORKER_METRICS_PORT)
+            logger.info(f"[Worker] Serving metrics on :{WORKER_METRICS_PORT}/metrics")
+        except OSError as e:
+            logger.warning(f"[Worker] Could not serve metrics on :{WORKER_METRICS_PORT}: {e}")
+    # Long-lived pooled clients: keep-alive connections are reused across jobs
+    ctx["fetch_client"] = create_fetch_client()
+    # Stage limits: cheap fetch/extract work gets its own bound, the LLM stage adapts inside the Ollama pool
+    ctx["fetch_limit"] = asyncio.Semaphore(FETCH_CONCURRENCY)
+    STAGE_CONCURRENCY_LIMIT.labels(stage="fetch").set(FETCH_CONCURRENCY)
+    # One client shared by all Ollama backends; the pool routes each generation to the least busy one
+    ctx["ollama_pool"] = OllamaPool(create_ollama_client(), OLLAMA_BACKENDS)
+    ctx["ollama_pool"].start()
+    logger.info(f"[Worker] Summarizing with {len(OLLAMA_BACKENDS)} Ollama backend(s): {', '.join(OLLAMA_BACKENDS)}")
+    # spawn (not fork) so the pool processes don't inherit the running event loop
+    ctx["extract_pool"] = (
+        ProcessPoolExecutor(max_workers=EXTRACT_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        if EXTRACT_POOL_WORKERS > 0
+        else None
+    )
 
 
 async def shutdown(ctx: MutableMapping[str, Any]) -> None:
+    metrics_server = ctx.pop("metrics_server", None)
+    if metrics_server:
+        metrics_server.shutdown()
+        metrics_server.server_close()
+
     document_repo: WorkerDocumentRepository = ctx.get("document_repo")
     if document_repo:
         await document_repo.close()
 
+    fetch_client: httpx.AsyncClient | None = ctx.pop("fetch_client", None)
+    if fetch_client:
+        await fetch_client.aclose()
+
+    ollama_pool: OllamaPool | None = ctx.pop("ollama_pool", None)
+    if ollama_pool:
+        await ollama_pool.aclose()
+
+    extract_pool: ProcessPoolExecutor | None = ctx.pop("extract_pool", None)
+    if extract_pool:
+        extract_pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _document_read(
+    document: Document, *, status: DocumentStatus, summary: Optional[str] = None, truncated: Optional[bool] = None
+) -> DocumentRead:
+    """The document as the API would now return it, without reading it back from the DB."""
+    return DocumentRead(
+        document_uuid=document.document_uuid,
+        name=document.name,
+        url=document.url,
+        summary=summary if summary is not None else document.summary,
+        status=status,
+        truncated=truncated if truncated is not None else bool(document.truncated),
+    )
+
+
+async def _announce(redis: Optional[ArqRedis], document: DocumentRead) -> None:
+    """After every status change: refresh the API's GET cache, then notify live listeners."""
+    DOCUMENT_STATUS_TRANSITIONS.labels(status=document.status.value).inc()
+    await cache_document(redis, document)
+    await publish_status(redis, document)
+
+
+async def _fetch_content(ctx: MutableMapping[str, Any], document: Document) -> tuple[FetchedPage, Optional[str]]:
+    """Fetch, extract and preprocess the page under the fetch stage limit; content is None on 304."""
+    document_uuid = str(document.document_uuid)
+    # Only revalidate when a 304 leaves a summary to fall back on that the current model and prompt produced
+    revalidate = bool(document.summary) and document.summary_key == summary_key()
+    async with ctx.get("fetch_limit") or contextlib.nullcontext():
+        with JOB_STAGE_SECONDS.labels(stage="fetch").time():
+            page = await fetch_page(
+                ctx["fetch_client"],
+                document.url,
+                etag=document.etag if revalidate else None,
+                last_modified=document.last_modified if revalidate else None,
+            )
+        if page.not_modified:
+            return page, None
+
+        started = time.perf_counter()
+        content = await asyncio.get_running_loop().run_in_executor(ctx.get("extract_pool"), extract_text, page.text)
+        extract_seconds = time.perf_counter() - started
+        JOB_STAGE_SECONDS.labels(stage="extract").observe(extract_seconds)
+        logger.info(f"[Worker] Extracted {len(page.text)} chars for {document_uuid} in {extract_seconds * 1000:.1f}ms")
+        if PREPROCESS_ENABLED:
+            content = await _preprocess(ctx, document_uuid, content)
+        return page, content
+
+
+async def _preprocess(ctx: MutableMapping[str, Any], document_uuid: str, content: str) -> str:
+    """Shrink the prompt (see app.worker.preprocess) and report what it saves."""
+    with JOB_STAGE_SECONDS.labels(stage="preprocess").time():
+        result = await asyncio.get_running_loop().run_in_executor(
+            ctx.get("extract_pool"), preprocess, content, PREPROCESS_TOKEN_BUDGET
+        )
+    PREPROCESS_TOKENS_SAVED.observe(result.tokens_saved)
+    seconds_saved = estimate_prompt_seconds(result.tokens_saved)
+    if seconds_saved is not None:
+        PREPROCESS_SECONDS_SAVED.inc(seconds_saved)
+    saved = f", ~{seconds_saved:.1f}s of prompt evaluation saved" if seconds_saved is not None else ""
+    logger.info(
+        f"[Worker] Preprocessed {document_uuid}: {result.tokens_before} -> {result.tokens_after} tokens "
+        f"({result.duplicate_paragraphs} duplicate paragraphs, ranked={result.ranked}{saved})"
+    )
+    return result.text
+
+
+# The job's own time limit: a little under arq's timeout, which leaves room to record the failure
+PROCESS_DOCUMENT_TIME_LIMIT = PROCESS_DOCUMENT_TIMEOUT - min(30, PROCESS_DOCUMENT_TIMEOUT / 10)
+
+
+async def _take_rerun_request(redis: Optional[ArqRedis], document_uuid: str) -> bool:
+    return redis is not None and bool(await redis.delete(rerun_key(document_uuid)))
+
+
+async def _schedule_followup(
+    redis: ArqRedis, document_uuid: str, priority: DocumentPriority, job_id: Optional[str]
+) -> None:
+    """Our own job id is still taken until this job returns, so the follow-up gets the document's other id.
+
+    Submissions coalesce on both ids (see `enqueue_documents`), so nothing else can start a run meanwhile.
+    """
+    FOLLOWUP_RUNS.inc()
+    logger.info(f"[Worker] Document {document_uuid} was resubmitted during processing, scheduling a follow-up run")
+    followup_id = followup_job_id(document_uuid)
+    await redis.enqueue_job(
+        PROCESS_DOCUMENT,
+        document_uuid,
+        _job_id=process_document_job_id(document_uuid) if job_id == followup_id else followup_id,
+        _queue_name=QUEUE_NAMES[priority],
+    )
+
+
+async def _release(document_repo: WorkerDocumentRepository, redis: Optional[ArqRedis], document: Document) -> None:
+    """Hand a claimed document back (PROCESSING -> PENDING) so the job's next try can claim it again."""
+    await document_repo.update_status(str(document.document_uuid), DocumentStatus.PENDING)
+    await _announce(redis, _document_read(document, status=DocumentStatus.PENDING))
+
+
+async def _record_failure(
+    document_repo: WorkerDocumentRepository, redis: Optional[ArqRedis], document: Document, error: Exception
+) -> tuple[bool, DocumentRead]:
+    """FAILED, or PENDING when resubmitted meanwhile; returns whether a follow-up is due and the final document."""
+    document_uuid = str(document.document_uuid)
+    logger.info(f"[Worker] Failed to process document {document_uuid}: {error!r}")
+    followup = await _take_rerun_request(redis, document_uuid)
+    final_status = DocumentStatus.PENDING if followup else DocumentStatus.FAILED
+    with JOB_STAGE_SECONDS.labels(stage="db_write").time():
+        await document_repo.update_status(document_uuid, final_status)
+    final = _document_read(document, status=final_status)
+    await _announce(redis, final)
+    return followup, final
+
+
+async def _summarize(
+    ctx: MutableMapping[str, Any], document: Document, priority: DocumentPriority
+) -> tuple[FetchedPage, Optional[str], Optional[str], bool]:
+    """Fetch the page and summarize it, reusing the stored summary when the page is unchanged.
+
+    Returns the fetched page, the summary, the content hash behind it and whether the page was truncated.
+    """
+    document_uuid = str(document.document_uuid)
+    page, content = await _fetch_content(ctx, document)
+    if content is None:
+        logger.info(f"[Worker] Page not modified for {document_uuid}, keeping summary")
+        return page, document.summary, document.content_hash, bool(document.truncated)
+
+    digest = content_hash(content)
+    if document.summary and document.content_hash == digest:
+        # Page unchanged since the last successful run: reuse the stored summary
+        SUMMARY_CACHE_LOOKUPS.labels(result="hit").inc()
+        logger.info(f"[Worker] Content unchanged for {document_uuid}, reusing summary")
+        return page, document.summary, digest, page.truncated
+
+    SUMMARY_CACHE_LOOKUPS.labels(result="miss").inc()
+    progress = ProgressPublisher(ctx.get("redis"), document_uuid, interval=STREAM_PROGRESS_INTERVAL)
+    with JOB_STAGE_SECONDS.labels(stage="llm").time():
+        summary = await call_ollama(ctx["ollama_pool"], content, progress, background=priority is DocumentPriority.BULK)
+    return page, summary, digest, page.truncated
+
 
 async def process_document(ctx: MutableMapping[str, Any], document_uuid: str) -> None:
     """
     Worker task to fetch, summarize, and update a document.
     """
     document_repo: WorkerDocumentRepository = ctx["document_repo"]
+    # set per queue by app.worker.runner; a plain `arq` worker only serves the interactive queue
+    priority: DocumentPriority = ctx.get("priority", DocumentPriority.INTERACTIVE)
 
-    document = await document_repo.get_by_id(document_uuid)
+    # PENDING -> PROCESSING in one statement; None if missing or another worker already owns it
+    document = await document_repo.claim(document_uuid)
     if not document:
-        logger.info(f"[Worker] Document {document_uuid} not found")
+        logger.info(f"[Worker] Document {document_uuid} not found or not claimable")
         return
 
-    await document_repo.update_status(document_uuid, DocumentStatus.PROCESSING)
+    redis = ctx.get("redis")
+    if redis is not None:
+        # this run sees the latest submission, so earlier "rerun" requests are satisfied by it
+        await redis.delete(rerun_key(document_uuid))
+    await _announce(redis, _document_read(document, status=DocumentStatus.PROCESSING))
 
     try:
-        content = await fetch_and_extract(document.url)
-        summary = await call_ollama(content)
+        # a run out of time fails like any other error; arq's own timeout is only a backstop
+        async with asyncio.timeout(PROCESS_DOCUMENT_TIME_LIMIT):
+            page, summary, digest, truncated = await _summarize(ctx, document, priority)
 
-        await document_repo.update_summary(document_uuid, summary=summary, status=DocumentStatus.SUCCESS)
+        # resubmitted while we were running: keep the document PENDING for one follow-up run
+        followup = await _take_rerun_request(redis, document_uuid)
+        final_status = DocumentStatus.PENDING if followup else DocumentStatus.SUCCESS
+        with JOB_STAGE_SECONDS.labels(stage="db_write").time():
+            await document_repo.update_summary(
+                document_uuid,
+                summary=summary,
+                status=final_status,
+                content_hash=digest,
+                summary_key=summary_key(),
+                etag=page.etag,
+                last_modified=page.last_modified,
+                truncated=truncated,
+            )
+        final = _document_read(document, status=final_status, summary=summary, truncated=truncated)
+        await _announce(redis, final)
+
+    except asyncio.CancelledError:
+        # worker shutdown: arq runs the job again later, and its claim() must find the document PENDING
+        logger.info(f"[Worker] Processing of document {document_uuid} was cancelled, handing it back")
+        await asyncio.shield(_release(document_repo, redis, document))
+        raise
+
+    except SlotTimeoutError as e:
+        # the model server is saturated, not failing: hand the document back and run again later
+        if ctx.get("job_try", 1) < PROCESS_DOCUMENT_MAX_TRIES:
+            logger.info(f"[Worker] {e}, retrying document {document_uuid} in {LLM_SLOT_RETRY_DELAY:.0f}s")
+            await _release(document_repo, redis, document)
+            raise Retry(defer=LLM_SLOT_RETRY_DELAY) from e
+        followup, final = await _record_failure(document_repo, redis, document, e)
 
     except Exception as e:
-        logger.info(f"[Worker] Failed to process document {document_uuid}: {e}")
-        await document_repo.update_status(document_uuid, DocumentStatus.FAILED)
+        followup, final = await _record_failure(document_repo, redis, document, e)
+
+    if followup:
+        await _schedule_followup(redis, document_uuid, priority, ctx.get("job_id"))
+    elif document.callback_url:
+        await webhooks.enqueue_webhook(redis, document.callback_url, final)
+
+
+async def refresh_stale_documents(ctx: MutableMapping[str, Any]) -> int:
+    """
+    Cron: re-summarize documents not updated for REFRESH_MAX_AGE_SECONDS.
+
+    Batches of stale SUCCESS/FAILED documents go back to PENDING (see `mark_stale_pending`) and onto the bulk
+    queue, paced at REFRESH_RATE_PER_SECOND; unchanged pages come back cheaply through the HTTP validators and
+    the content-hash cache. Skipped while a previous run's jobs are still waiting. Returns the number enqueued.
+
+    A batch left PENDING by a failed or cancelled enqueue is not lost: `requeue_orphaned_documents` enqueues it
+    once it has waited ORPHAN_PENDING_SECONDS.
+    """
+    redis: ArqRedis = ctx["redis"]
+    document_repo: WorkerDocumentRepository = ctx["document_repo"]
+    bulk_queue = QUEUE_NAMES[DocumentPriority.BULK]
+    waiting = await queue_depth(redis, bulk_queue)
+    if waiting >= REFRESH_MAX_PER_RUN:
+        logger.info(f"[Worker] Refresh skipped: {waiting} jobs still waiting in {bulk_queue}")
+        return 0
+
+    queued = 0
+    while queued < REFRESH_MAX_PER_RUN:
+        started = time.monotonic()
+        batch_size = min(REFRESH_BATCH_SIZE, REFRESH_MAX_PER_RUN - queued)
+        documents = await document_repo.mark_stale_pending(timedelta(seconds=REFRESH_MAX_AGE_SECONDS), limit=batch_size)
+        if not documents:
+            break
+        # same bookkeeping as a submission through the API: status metric and GET cache, then the jobs
+        DOCUMENT_STATUS_TRANSITIONS.labels(status=DocumentStatus.PENDING.value).inc(len(documents))
+        await cache_documents(redis, [_document_read(d, status=DocumentStatus.PENDING) for d in documents])
+        await enqueue_documents(redis, [str(d.document_uuid) for d in documents], DocumentPriority.BULK)
+        REFRESH_ENQUEUED.inc(len(documents))
+        queued += len(documents)
+        if len(documents) < batch_size:
+            break
+        await asyncio.sleep(max(0.0, len(documents) / REFRESH_RATE_PER_SECOND - (time.monotonic() - started)))
+
+    logger.info(f"[Worker] Refresh enqueued {queued} stale documents on {bulk_queue}")
+    return queued
+
+
+async def requeue_orphaned_documents(ctx: MutableMapping[str, Any]) -> int:
+    """
+    Cron: give every document that waits for a run a job.
+
+    A document can be left PENDING without one: resubmitted just after its run took the rerun marker, put back
+    by a refresh whose enqueue then failed, or given up on by arq after its last try. Documents PENDING for
+    ORPHAN_PENDING_SECONDS (or abandoned in PROCESSING) are enqueued on the bulk queue; those that still have a
+    job are skipped by `enqueue_documents`. Returns the number enqueued.
+    """
+    redis: ArqRedis = ctx["redis"]
+    document_repo: WorkerDocumentRepository = ctx["document_repo"]
+    requeued = 0
+    async for document_uuids in document_repo.iter_unclaimed(
+        timedelta(seconds=ORPHAN_PENDING_SECONDS), batch_size=ORPHAN_SWEEP_BATCH_SIZE
+    ):
+        # not resubmissions: a document whose job exists needs no rerun marker
+        requeued += await enqueue_documents(redis, document_uuids, DocumentPriority.BULK, coalesce=False)
+
+    if requeued:
+        ORPHANS_REQUEUED.inc(requeued)
+        logger.warning(f"[Worker] Enqueued {requeued} documents that were waiting without a job")
+    return requeued
 
 
 class WorkerSettings:
     redis_settings = RedisSettings(
         host=os.getenv("REDIS_HOST", "redis"), port=int(os.getenv("REDIS_PORT", "6379")), database=0
     )
-    functions = [process_document]
-    max_jobs = 10
+    # no stored result: the deterministic job id must be reusable as soon as the job finishes
+    functions = [
+        func(process_document, keep_result=0, timeout=PROCESS_DOCUMENT_TIMEOUT, max_tries=PROCESS_DOCUMENT_MAX_TRIES)
+    ]
+    # results arq writes without the function's settings (e.g. for an expired job) use the worker's keep_result
+    keep_result = 0
+    # app.worker.runner gives the cron jobs to the lowest priority queue's worker
+    cron_jobs = [cron(requeue_orphaned_documents, minute=set(range(0, 60, max(1, ORPHAN_SWEEP_EVERY_MINUTES))))] + (
+        [
+            cron(
+                refresh_stale_documents,
+                minute=set(range(0, 60, max(1, REFRESH_EVERY_MINUTES))),
+                timeout=REFRESH_MAX_PER_RUN / REFRESH_RATE_PER_SECOND + 60,
+            )
+        ]
+        if REFRESH_ENABLED
+        else []
+    )
+    # jobs in progress per worker; the fetch and LLM stages have their own limits (see startup)
+    max_jobs = WORKER_MAX_JOBS
+    # app.worker.runner splits max_jobs between the queues by these weights
+    queue_weights = {
+        DocumentPriority.INTERACTIVE: INTERACTIVE_QUEUE_WEIGHT,
+        DocumentPriority.BULK: BULK_QUEUE_WEIGHT,
+    }
     on_startup = startup
     on_shutdown = shutdown
+
+
+class WebhookWorkerSettings:
+    """Completion webhooks, on their own queue so deliveries never take a summarization job slot."""
+
+    redis_settings = WorkerSettings.redis_settings
+    queue_name = WEBHOOK_QUEUE_NAME
+    functions = [func(webhooks.deliver_webhook, keep_result=0, max_tries=WEBHOOK_MAX_ATTEMPTS)]
+    keep_result = 0
+    max_jobs = WEBHOOK_MAX_JOBS
+    on_startup = webhooks.startup
+    on_shutdown = webhooks.shutdown
@@ -1,19 +1,210 @@
+import asyncio
+import codecs
+import hashlib
+import importlib.util
+import json
+import re
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
 import httpx
 import logging
 import trafilatura
 import unicodedata
 
-from app.core.config import MAX_SUMMARY_CHARS, OLLAMA_API
+from app.core.config import (
+    FETCH_CONNECT_TIMEOUT,
+    FETCH_MAX_BYTES,
+    FETCH_MAX_CONNECTIONS,
+    FETCH_MAX_KEEPALIVE_CONNECTIONS,
+    FETCH_READ_TIMEOUT,
+    HTTP2_ENABLED,
+    HTTP_KEEPALIVE_EXPIRY,
+    LLM_SLOT_TIMEOUT,
+    MAX_SUMMARY_CHARS,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+    OLLAMA_MODEL,
+    OLLAMA_READ_TIMEOUT,
+    PROMPT_VERSION,
+    SUMMARY_CHUNK_OVERLAP_TOKENS,
+    SUMMARY_CHUNK_PARALLELISM,
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_CHUNKING_ENABLED,
+)
+from app.core.exceptions import UnsupportedContentTypeError
+from app.core.metrics import OLLAMA_TOKENS_PER_SECOND, PROMPT_TOKENS
+
+from app.worker.limits import LimiterSample
+from app.worker.ollama_pool import OllamaPool
 
 logger = logging.getLogger("app")
 
 
-async def fetch_and_extract(url: str) -> str:
-    """Fetch a webpage and extract cleaned text."""
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, timeout=20)
+def _build_client(
+    *, max_connections: int, max_keepalive_connections: int, connect_timeout: float, read_timeout: float
+) -> httpx.AsyncClient:
+    """Long-lived pooled client; HTTP/2 is only enabled when the optional `h2` package is installed."""
+    http2 = HTTP2_ENABLED
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("[HTTP] HTTP2_ENABLED is set but 'h2' is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+    )
+
+
+def create_fetch_client() -> httpx.AsyncClient:
+    """Client used to download the pages to summarize."""
+    return _build_client(
+        max_connections=FETCH_MAX_CONNECTIONS,
+        max_keepalive_connections=FETCH_MAX_KEEPALIVE_CONNECTIONS,
+        connect_timeout=FETCH_CONNECT_TIMEOUT,
+        read_timeout=FETCH_READ_TIMEOUT,
+    )
+
+
+def create_ollama_client() -> httpx.AsyncClient:
+    """Client used to talk to Ollama (shared by every backend of the pool)."""
+    return _build_client(
+        max_connections=OLLAMA_MAX_CONNECTIONS,
+        max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+        connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+        read_timeout=OLLAMA_READ_TIMEOUT,
+    )
+
+
+@dataclass(frozen=True)
+class FetchedPage:
+    """Result of a (possibly conditional) page fetch."""
+
+    text: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+    # the body was cut at FETCH_MAX_BYTES
+    truncated: bool = False
+
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+# like the HTML spec's encoding prescan, only the start of the document is searched for <meta charset>
+CHARSET_SNIFF_BYTES = 1024
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9._:-]+)""", re.IGNORECASE)
+
+
+def _charset(resp: httpx.Response, head: bytes) -> str:
+    """Charset from the Content-Type header, else from a <meta> tag near the top, else UTF-8."""
+    for candidate in (resp.charset_encoding, _sniff_meta_charset(head)):
+        if candidate:
+            try:
+                return codecs.lookup(candidate).name
+            except LookupError:
+                continue
+    return "utf-8"
+
+
+def _sniff_meta_charset(head: bytes) -> Optional[str]:
+    match = _META_CHARSET.search(head[:CHARSET_SNIFF_BYTES])
+    return match.group(1).decode("ascii") if match else None
+
+
+async def fetch_page(
+    client: httpx.AsyncClient,
+    url: str,
+    *,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    max_bytes: int = FETCH_MAX_BYTES,
+) -> FetchedPage:
+    """Fetch a webpage, revalidating with If-None-Match / If-Modified-Since when validators are known.
+
+    The body is streamed and decoded as it arrives: non-HTML content types are rejected from the headers
+    before any of the body is read, and the download stops after `max_bytes` (decompressed) with the page
+    marked as truncated instead of failing.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    async with client.stream("GET", url, headers=headers) as r:
+        if r.status_code == httpx.codes.NOT_MODIFIED and headers:
+            return FetchedPage(
+                etag=r.headers.get("ETag", etag),
+                last_modified=r.headers.get("Last-Modified", last_modified),
+                not_modified=True,
+            )
         r.raise_for_status()
-        return trafilatura.extract(r.text) or ""
+
+        content_type = r.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in HTML_CONTENT_TYPES:
+            raise UnsupportedContentTypeError(f"Unsupported content type {content_type!r} for {url}")
+
+        parts: list[str] = []
+        # the first bytes are held back until a <meta charset> would have been seen
+        head = b""
+        decoder: Optional[codecs.IncrementalDecoder] = None
+        received, truncated = 0, False
+        async for chunk in r.aiter_bytes():
+            if received + len(chunk) > max_bytes:
+                chunk, truncated = chunk[: max_bytes - received], True
+            received += len(chunk)
+            if decoder is None:
+                head += chunk
+                if len(head) < CHARSET_SNIFF_BYTES and not truncated:
+                    continue
+                decoder = codecs.getincrementaldecoder(_charset(r, head))(errors="replace")
+                chunk = head
+            parts.append(decoder.decode(chunk))
+            if truncated:
+                # a multi-byte character cut at the limit is dropped, not turned into garbage
+                logger.info(f"[Fetch] Truncated {url} at {max_bytes} bytes")
+                break
+
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(_charset(r, head))(errors="replace")
+            parts.append(decoder.decode(head))
+        if not truncated:
+            parts.append(decoder.decode(b"", final=True))
+
+    return FetchedPage(
+        text="".join(parts),
+        etag=r.headers.get("ETag"),
+        last_modified=r.headers.get("Last-Modified"),
+        truncated=truncated,
+    )
+
+
+def extract_text(html: str) -> str:
+    """Extract the main cleaned text from a webpage.
+
+    Runs in the worker's extraction process pool (CPU-bound).
+    """
+    return trafilatura.extract(html) or ""
+
+
+def summary_key() -> str:
+    """Model and prompt version summaries are currently produced with; a summary stored under another is stale."""
+    return f"{OLLAMA_MODEL}:prompt-{PROMPT_VERSION}"
+
+
+def content_hash(content: str) -> str:
+    """Hash of the extracted text, keyed by model and prompt version (a change to either invalidates it)."""
+    digest = hashlib.sha256()
+    for part in (OLLAMA_MODEL, PROMPT_VERSION, content):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
 
 
 def _clean_summary(text: str) -> str:
@@ -48,27 +239,181 @@ def _clean_summary(text: str) -> str:
     return cleaned
 
 
-async def call_ollama(content: str) -> str:
-    """Call Ollama with Gemma3:1B model and return summary."""
+# Rough heuristic for gemma-style tokenizers on English prose; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgeting (no tokenizer round-trip)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_into_chunks(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> list[str]:
+    """Split text on word boundaries into chunks of at most ~chunk_tokens, overlapping by ~overlap_tokens."""
+    pieces = re.findall(r"\S+\s*", text)
+    costs = [estimate_tokens(p) for p in pieces]
+
+    chunks: list[str] = []
+    start = 0
+    while start < len(pieces):
+        end, used = start, 0
+        # always take at least one word so an oversized word cannot stall the loop
+        while end < len(pieces) and (end == start or used + costs[end] <= chunk_tokens):
+            used += costs[end]
+            end += 1
+        chunks.append("".join(pieces[start:end]).strip())
+        if end >= len(pieces):
+            break
+
+        # step back for the overlap, but always make progress
+        back, overlap = end, 0
+        while back > start + 1 and overlap + costs[back - 1] <= overlap_tokens:
+            back -= 1
+            overlap += costs[back]
+        start = back
+    return chunks
+
+
+# Receives each streamed piece of text, the running token count, and whether generation is done.
+ProgressCallback = Callable[[str, int, bool], Awaitable[None]]
+
+
+async def _generate(
+    pool: OllamaPool, prompt: str, on_progress: Optional[ProgressCallback] = None, *, background: bool = False
+) -> str:
+    """Run a single streaming generation and return the cleaned response.
+
+    Waits up to LLM_SLOT_TIMEOUT for a slot of the pool's adaptive LLM limit (after every foreground waiter if
+    `background`), then goes to the least busy backend; a backend that cannot even be connected to is skipped
+    for the next one, since nothing has been generated yet.
+    """
+    async with pool.limiter.acquire(background=background, timeout=LLM_SLOT_TIMEOUT) as slot:
+        tried: set[str] = set()
+        for _ in range(len(pool.backends) - 1):
+            try:
+                async with pool.lease(exclude=tried) as backend:
+                    return await _stream_generation(pool.client, backend.base_url, prompt, on_progress, slot)
+            except httpx.ConnectError as e:
+                tried.add(backend.base_url)
+                logger.info(f"[Ollama] Could not connect to {backend.base_url} ({e!r}), trying another backend")
+        async with pool.lease(exclude=tried) as backend:
+            return await _stream_generation(pool.client, backend.base_url, prompt, on_progress, slot)
+
+
+async def _stream_generation(
+    client: httpx.AsyncClient,
+    base_url: str,
+    prompt: str,
+    on_progress: Optional[ProgressCallback],
+    slot: LimiterSample,
+) -> str:
+    logger.info(f"[Ollama] Sending request to {base_url} with prompt length {len(prompt)}")
+    parts: list[str] = []
+    tokens = 0
+    async with client.stream(
+        "POST",
+        f"{base_url}/api/generate",
+        json={
+            "model": OLLAMA_MODEL,
+            "prompt": prompt,
+            "stream": True,
+            "options": {"temperature": 0.7, "num_predict": MAX_SUMMARY_CHARS},
+        },
+    ) as resp:
+        resp.raise_for_status()
+        # Ollama streams one JSON object per line; the last one has done=true and the final counters
+        async for line in resp.aiter_lines():
+            if not line.strip():
+                continue
+            if slot.latency is None:
+                # queueing + prompt evaluation: the part of the latency that grows when Ollama is saturated
+                slot.latency = time.monotonic() - slot.started
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(f"Ollama error: {chunk['error']}")
+
+            piece = chunk.get("response", "") or ""
+            if piece:
+                parts.append(piece)
+                tokens += 1
+            done = bool(chunk.get("done"))
+            if done:
+                tokens = chunk.get("eval_count", tokens)
+                _observe_generation(chunk, prompt)
+            if on_progress and (piece or done):
+                await on_progress(piece, tokens, done)
+
+    raw = "".join(parts).strip()
+    return _clean_summary(raw)
+
+
+# Moving average of Ollama's prompt evaluation speed (tokens/s), used to price prompt tokens in seconds
+_prompt_eval_rate: Optional[float] = None
+
+
+def _observe_generation(final_chunk: dict, prompt: str) -> None:
+    """Prompt size and generation speed from the counters of Ollama's final chunk."""
+    global _prompt_eval_rate
+    PROMPT_TOKENS.observe(final_chunk.get("prompt_eval_count") or estimate_tokens(prompt))
+    eval_count, eval_ns = final_chunk.get("eval_count"), final_chunk.get("eval_duration")
+    if eval_count and eval_ns:
+        OLLAMA_TOKENS_PER_SECOND.observe(eval_count / (eval_ns / 1e9))
+    prompt_count, prompt_ns = final_chunk.get("prompt_eval_count"), final_chunk.get("prompt_eval_duration")
+    if prompt_count and prompt_ns:
+        rate = prompt_count / (prompt_ns / 1e9)
+        _prompt_eval_rate = rate if _prompt_eval_rate is None else 0.8 * _prompt_eval_rate + 0.2 * rate
+
+
+def estimate_prompt_seconds(tokens: int) -> Optional[float]:
+    """Prompt evaluation time Ollama would spend on `tokens`, once a generation has reported its speed."""
+    return tokens / _prompt_eval_rate if _prompt_eval_rate else None
+
+
+async def _summarize_chunked(
+    pool: OllamaPool, content: str, on_progress: Optional[ProgressCallback] = None, *, background: bool = False
+) -> str:
+    """Map: summarize chunks with bounded fan-out. Reduce: merge the partial summaries into one."""
+    chunks = split_into_chunks(content, SUMMARY_CHUNK_TOKENS, SUMMARY_CHUNK_OVERLAP_TOKENS)
+    logger.info(f"[Ollama] Map-reduce summarization over {len(chunks)} chunks")
+    semaphore = asyncio.Semaphore(max(1, SUMMARY_CHUNK_PARALLELISM))
+
+    async def _summarize_chunk(index: int, chunk: str) -> str:
+        prompt = (
+            f"The following is part {index + 1} of {len(chunks)} of a longer text. "
+            f"Summarize this part in under {MAX_SUMMARY_CHARS} characters, "
+            f"please skip the prefaces and just give raw summary:\n\n{chunk}"
+        )
+        async with semaphore:
+            return (await _generate(pool, prompt, background=background))[:MAX_SUMMARY_CHARS]
+
+    partials = await asyncio.gather(*(_summarize_chunk(i, c) for i, c in enumerate(chunks)))
+    combined = "\n\n".join(p for p in partials if p)
+
+    # Partials of a very long text may still not fit: reduce them again, as long as that shrinks the input
+    if estimate_tokens(combined) > SUMMARY_CHUNK_TOKENS and len(combined) < len(content):
+        return await _summarize_chunked(pool, combined, on_progress, background=background)
+
     prompt = (
-        f"Summarize the following text in under {MAX_SUMMARY_CHARS} characters, "
-        f"please skip the prefaces and just give raw summary:\n\n{content}"
+        f"The following are summaries of consecutive parts of one text. "
+        f"Combine them into a single summary of the whole text in under {MAX_SUMMARY_CHARS} characters, "
+        f"please skip the prefaces and just give raw summary:\n\n{combined}"
     )
+    return await _generate(pool, prompt, on_progress, background=background)
 
-    async with httpx.AsyncClient(timeout=120) as client:
-        logger.info(f"[Ollama] Sending request to {OLLAMA_API} with prompt length {len(prompt)}")
-        resp = await client.post(
-            OLLAMA_API,
-            json={
-                "model": "gemma3:1b",
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.7, "num_predict": MAX_SUMMARY_CHARS},
-            },
-        )
-        resp.raise_for_status()
-        data = resp.json()
 
-        raw = (data.get("response", "") or "").strip()
-        summary = _clean_summary(raw)[:MAX_SUMMARY_CHARS]
-        return summary
+async def call_ollama(
+    pool: OllamaPool, content: str, on_progress: Optional[ProgressCallback] = None, *, background: bool = False
+) -> str:
+    """Call Ollama with Gemma3:1B model and return summary (map-reduce for texts over the chunk budget).
+
+    `on_progress` receives the streamed tokens of the final generation (the reduce step in map-reduce mode).
+    `background` generations (bulk jobs) only take LLM slots no interactive job is waiting for.
+    """
+    if SUMMARY_CHUNKING_ENABLED and estimate_tokens(content) > SUMMARY_CHUNK_TOKENS:
+        return (await _summarize_chunked(pool, content, on_progress, background=background))[:MAX_SUMMARY_CHARS]
+
+    prompt = (
+        f"Summarize the following text in under {MAX_SUMMARY_CHARS} characters, "
+        f"please skip the prefaces and just give raw summary:\n\n{content}"
+    )
+    return (await _generate(pool, prompt, on_progress, background=background))[:MAX_SUMMARY_CHARS]
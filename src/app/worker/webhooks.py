@@ -0,0 +1,133 @@
+import asyncio
+import ipaddress
+import logging
+import random
+import socket
+import time
+from typing import Any, MutableMapping, Optional
+
+import httpx
+from arq import Retry
+from arq.connections import ArqRedis
+
+from app.core.config import (
+    WEBHOOK_ALLOWED_HOSTS,
+    WEBHOOK_BACKOFF_MAX_SECONDS,
+    WEBHOOK_BACKOFF_SECONDS,
+    WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_QUEUE_NAME,
+    WEBHOOK_TIMEOUT,
+)
+from app.core.exceptions import CallbackNotAllowedError
+from app.core.metrics import WEBHOOK_ATTEMPTS, WEBHOOK_DELIVERY_SECONDS
+from app.core.schemas import DocumentRead
+
+logger = logging.getLogger("app")
+
+DELIVER_WEBHOOK = "deliver_webhook"
+
+
+def create_webhook_client() -> httpx.AsyncClient:
+    """Client for completion callbacks; redirects are not followed, the registered URL is taken literally."""
+    return httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT, follow_redirects=False)
+
+
+async def startup(ctx: MutableMapping[str, Any]) -> None:
+    ctx["webhook_client"] = create_webhook_client()
+
+
+async def shutdown(ctx: MutableMapping[str, Any]) -> None:
+    webhook_client: httpx.AsyncClient | None = ctx.pop("webhook_client", None)
+    if webhook_client:
+        await webhook_client.aclose()
+
+
+def retry_delay(attempt: int) -> float:
+    """Backoff after the `attempt`-th failed delivery: doubling from WEBHOOK_BACKOFF_SECONDS, capped, jittered
+    over the upper half so receivers coming back from an outage are not hit by every retry at once."""
+    ceiling = min(WEBHOOK_BACKOFF_MAX_SECONDS, WEBHOOK_BACKOFF_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(ceiling / 2, ceiling)  # noqa: S311 - jitter, not crypto
+
+
+def _is_retriable(exc: httpx.HTTPError) -> bool:
+    """Network errors, timeouts, 408/429 and 5xx may succeed later; other answers (4xx, 3xx) will not."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code in (httpx.codes.REQUEST_TIMEOUT, httpx.codes.TOO_MANY_REQUESTS) or code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+async def resolve_host(host: str, port: int) -> list[str]:
+    """Every address `host` resolves to, as the connection would see it."""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [sockaddr[0] for *_, sockaddr in infos]
+
+
+async def check_callback_url(callback_url: str) -> None:
+    """
+    Refuse a callback whose host resolves to anything but public addresses: the worker sits inside the
+    deployment's network, and a submitted URL must not make it POST to Redis, Ollama or a metadata service.
+    Hosts in WEBHOOK_ALLOWED_HOSTS are not checked. A failed lookup is raised as a (retriable) ConnectError.
+    """
+    url = httpx.URL(callback_url)
+    if url.host.lower() in WEBHOOK_ALLOWED_HOSTS:
+        return
+    try:
+        addresses = await resolve_host(url.host, url.port or (443 if url.scheme == "https" else 80))
+    except socket.gaierror as e:
+        raise httpx.ConnectError(f"Cannot resolve {url.host}: {e}") from e
+    for address in addresses:
+        # IPv6 link-local addresses come with a zone ("fe80::1%eth0")
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if not ip.is_global:
+            raise CallbackNotAllowedError(f"{url.host} resolves to the non-public address {ip}")
+
+
+async def enqueue_webhook(redis: Optional[ArqRedis], callback_url: str, document: DocumentRead) -> None:
+    """Hand the delivery to the webhook queue; the summarization job returns right away."""
+    if redis is None:
+        return
+    await redis.enqueue_job(
+        DELIVER_WEBHOOK, callback_url, document.model_dump(mode="json"), time.time(), _queue_name=WEBHOOK_QUEUE_NAME
+    )
+
+
+async def deliver_webhook(
+    ctx: MutableMapping[str, Any], callback_url: str, document: dict[str, Any], completed_at: float
+) -> None:
+    """
+    Worker task: POST the final document to its callback URL; any 2xx answer counts as delivered.
+
+    Retriable failures are re-queued by ARQ (`Retry`) with exponential backoff, up to WEBHOOK_MAX_ATTEMPTS
+    attempts in total; `completed_at` (when the document reached its final status) prices the delivery lag.
+    A callback to a non-public address (see `check_callback_url`) is refused, never retried.
+    """
+    attempt = ctx.get("job_try", 1)
+    document_uuid = document.get("document_uuid")
+    try:
+        await check_callback_url(callback_url)
+        resp = await ctx["webhook_client"].post(callback_url, json=document)
+        resp.raise_for_status()
+    except httpx.HTTPError as e:
+        if _is_retriable(e) and attempt < WEBHOOK_MAX_ATTEMPTS:
+            WEBHOOK_ATTEMPTS.labels(outcome="retried").inc()
+            delay = retry_delay(attempt)
+            logger.info(
+                f"[Webhook] Delivery of {document_uuid} to {callback_url} failed ({e!r}), "
+                f"attempt {attempt + 1} in {delay:.1f}s"
+            )
+            raise Retry(defer=delay) from e
+        WEBHOOK_ATTEMPTS.labels(outcome="failed").inc()
+        logger.warning(f"[Webhook] Giving up on {document_uuid} -> {callback_url} after {attempt} attempt(s): {e!r}")
+        return
+    except CallbackNotAllowedError as e:
+        WEBHOOK_ATTEMPTS.labels(outcome="refused").inc()
+        logger.warning(f"[Webhook] Refused to deliver {document_uuid} to {callback_url}: {e}")
+        return
+
+    lag = max(0.0, time.time() - completed_at)
+    WEBHOOK_ATTEMPTS.labels(outcome="delivered").inc()
+    WEBHOOK_DELIVERY_SECONDS.observe(lag)
+    logger.info(
+        f"[Webhook] Delivered {document_uuid} to {callback_url} ({attempt} attempt(s), {lag:.2f}s after completion)"
+    )
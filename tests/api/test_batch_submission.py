@@ -0,0 +1,156 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from arq.jobs import deserialize_job
+from fastapi import status
+from prometheus_client import REGISTRY
+
+from app.core.jobs import enqueue_document, enqueue_documents, followup_job_id, process_document_job_id, rerun_key
+from app.core.schemas import DocumentPriority
+
+INTERACTIVE, BULK = "arq:queue", "arq:queue:bulk"
+
+
+@pytest.mark.asyncio
+@patch("app.api.routers.router_documents.enqueue_documents", new_callable=AsyncMock)
+async def test_batch_reports_per_item_result_and_enqueues_once_per_document(mock_enqueue, client):
+    existing = (await client.post("/documents/", json={"name": "Existing", "url": "https://existing.test"})).json()
+
+    resp = await client.post(
+        "/documents/batch",
+        json=[
+            {"name": "Existing", "url": "https://existing.test"},  # resummarized
+            {"name": "New", "url": "https://new.test"},  # created
+            {"name": "Existing", "url": "https://other.test"},  # name clash
+            {"name": "New", "url": "https://new.test"},  # repeated within the batch
+        ],
+    )
+
+    assert resp.status_code == status.HTTP_202_ACCEPTED, resp.text
+    items = resp.json()
+    assert [i["result"] for i in items] == ["resummarized", "created", "conflict", "resummarized"]
+    assert [i["index"] for i in items] == [0, 1, 2, 3]
+    assert items[0]["document"]["document_uuid"] == existing["document_uuid"]
+    assert items[2]["document"] is None and "exists" in items[2]["detail"]
+    assert items[3]["document"]["document_uuid"] == items[1]["document"]["document_uuid"]
+
+    mock_enqueue.assert_awaited_once()
+    queued = list(mock_enqueue.await_args.args[1])
+    assert queued == [existing["document_uuid"], items[1]["document"]["document_uuid"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_rejects_empty_payload(client):
+    resp = await client.post("/documents/batch", json=[])
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def _coalesced() -> float:
+    return REGISTRY.get_sample_value("summarizer_coalesced_submissions_total") or 0.0
+
+
+@pytest.mark.asyncio
+async def test_enqueue_documents_uses_single_pipeline_round_trip(fake_redis):
+    count = await enqueue_documents(fake_redis, ["doc-1", "doc-2", "doc-3"])
+
+    assert count == 3
+    assert fake_redis.round_trips == 1
+    jobs = [deserialize_job(v) for k, v in fake_redis.keys.items() if k.startswith("arq:job:")]
+    assert [(j.function, j.args) for j in jobs] == [("process_document", (d,)) for d in ("doc-1", "doc-2", "doc-3")]
+    assert set(fake_redis.queues[INTERACTIVE]) == {process_document_job_id(d) for d in ("doc-1", "doc-2", "doc-3")}
+
+
+@pytest.mark.asyncio
+async def test_resubmits_are_coalesced_into_the_pending_job(fake_redis):
+    before = _coalesced()
+
+    assert await enqueue_document(fake_redis, "doc-1") is True
+    assert await enqueue_document(fake_redis, "doc-1") is False
+    assert await enqueue_documents(fake_redis, ["doc-1", "doc-2"]) == 1
+
+    assert set(fake_redis.queues[INTERACTIVE]) == {process_document_job_id("doc-1"), process_document_job_id("doc-2")}
+    assert _coalesced() == before + 2
+    assert rerun_key("doc-1") in fake_redis.keys
+
+
+@pytest.mark.asyncio
+async def test_enqueue_without_coalescing_only_skips_documents_that_have_a_job(fake_redis):
+    before = _coalesced()
+
+    assert await enqueue_document(fake_redis, "doc-1", DocumentPriority.BULK) is True
+    assert await enqueue_documents(fake_redis, ["doc-1", "doc-2"], coalesce=False) == 1
+
+    assert fake_redis.queues_holding(process_document_job_id("doc-1")) == [BULK]  # not promoted either
+    assert rerun_key("doc-1") not in fake_redis.keys
+    assert _coalesced() == before
+
+
+@pytest.mark.asyncio
+async def test_interactive_resubmit_promotes_a_queued_bulk_job(fake_redis):
+    assert await enqueue_documents(fake_redis, ["doc-1", "doc-2"], DocumentPriority.BULK) == 2
+    fake_redis.keys["arq:in-progress:" + process_document_job_id("doc-2")] = b"1"  # already running
+    assert await enqueue_document(fake_redis, "doc-1") is False
+    assert await enqueue_document(fake_redis, "doc-2") is False
+
+    assert set(fake_redis.queues[INTERACTIVE]) == {process_document_job_id("doc-1")}
+    assert set(fake_redis.queues[BULK]) == {process_document_job_id("doc-2")}
+
+
+@pytest.mark.asyncio
+@patch("app.api.routers.router_documents.enqueue_documents", new_callable=AsyncMock)
+async def test_batch_enqueues_each_priority_on_its_queue(mock_enqueue, client):
+    resp = await client.post(
+        "/documents/batch",
+        json=[
+            {"name": "A", "url": "https://a.test", "priority": "bulk"},
+            {"name": "B", "url": "https://b.test"},
+            {"name": "A", "url": "https://a.test"},  # the interactive repeat wins
+            {"name": "C", "url": "https://c.test", "priority": "bulk"},
+        ],
+    )
+
+    assert resp.status_code == status.HTTP_202_ACCEPTED, resp.text
+    uuids = [item["document"]["document_uuid"] for item in resp.json()]
+    calls = [(list(c.args[1]), c.args[2]) for c in mock_enqueue.await_args_list]
+    assert calls == [([uuids[0], uuids[1]], DocumentPriority.INTERACTIVE), ([uuids[3]], DocumentPriority.BULK)]
+
+
+@pytest.mark.asyncio
+async def test_batch_never_queues_a_job_already_in_the_other_queue(fake_redis):
+    # a bulk batch over a document whose job waits in the interactive queue
+    assert await enqueue_document(fake_redis, "doc-1") is True
+    assert await enqueue_documents(fake_redis, ["doc-1"], DocumentPriority.BULK) == 0
+    assert fake_redis.queues_holding(process_document_job_id("doc-1")) == [INTERACTIVE]
+
+    # an interactive batch over a bulk job that is already running: not promoted, and not queued again
+    assert await enqueue_documents(fake_redis, ["doc-2"], DocumentPriority.BULK) == 1
+    fake_redis.queues[BULK].pop(process_document_job_id("doc-2"))
+    fake_redis.keys["arq:in-progress:" + process_document_job_id("doc-2")] = b"1"
+    assert await enqueue_documents(fake_redis, ["doc-2"]) == 0
+    assert fake_redis.queues_holding(process_document_job_id("doc-2")) == []
+
+
+@pytest.mark.asyncio
+async def test_resubmit_during_a_followup_run_is_coalesced_into_it(fake_redis):
+    # the first run has returned and its follow-up is running under the document's other job id
+    followup_id = followup_job_id("doc-1")
+    fake_redis.keys["arq:job:" + followup_id] = b"job"
+    fake_redis.keys["arq:in-progress:" + followup_id] = b"1"
+
+    assert await enqueue_document(fake_redis, "doc-1") is False
+    assert await enqueue_documents(fake_redis, ["doc-1"], DocumentPriority.BULK) == 0
+
+    assert fake_redis.queues_holding(process_document_job_id("doc-1")) == []
+    assert rerun_key("doc-1") in fake_redis.keys  # the follow-up run schedules the next one
+
+
+@pytest.mark.asyncio
+async def test_interactive_resubmit_promotes_a_queued_bulk_followup(fake_redis):
+    followup_id = followup_job_id("doc-1")
+    fake_redis.keys["arq:job:" + followup_id] = b"job"
+    fake_redis.queues[BULK][followup_id] = 7
+
+    assert await enqueue_document(fake_redis, "doc-1") is False
+
+    assert fake_redis.queues_holding(followup_id) == [INTERACTIVE]
+    assert fake_redis.queues[INTERACTIVE][followup_id] == 7
@@ -0,0 +1,144 @@
+"""DocumentRepository against a real Postgres: the upsert, the unique indexes and the keyset queries."""
+
+import datetime as dt
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.domain.document_repository import DocumentRepository
+from app.core.exceptions import DocumentConflictError
+from app.core.models import Document, DocumentStatus
+from app.core.schemas import DocumentCreate, SubmissionResult
+
+T0 = dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def repo(postgres_engine):
+    async with async_sessionmaker(postgres_engine, expire_on_commit=False)() as session:
+        yield DocumentRepository(session)
+
+
+async def _seed(engine, *rows: dict) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(insert(Document), [{"status": DocumentStatus.SUCCESS, **row} for row in rows])
+
+
+async def _status(engine, name: str) -> DocumentStatus:
+    async with engine.connect() as conn:
+        return (await conn.execute(select(Document.status).where(Document.name == name))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_submit_or_resummarize_creates_then_resummarizes_the_same_row(repo, postgres_engine):
+    doc, resummarized = await repo.submit_or_resummarize(name="A", url="https://a.test", callback_url="https://cb/1")
+    assert resummarized is False and doc.status == DocumentStatus.PENDING
+    async with postgres_engine.begin() as conn:
+        await conn.execute(Document.__table__.update().values(status=DocumentStatus.SUCCESS))
+
+    again, resummarized = await repo.submit_or_resummarize(name="A", url="https://a.test")
+    assert resummarized is True
+    assert again.document_uuid == doc.document_uuid
+    assert again.status == DocumentStatus.PENDING and again.callback_url == "https://cb/1"  # kept without a new one
+
+    again, _ = await repo.submit_or_resummarize(name="A", url="https://a.test", callback_url="https://cb/2")
+    assert again.callback_url == "https://cb/2"
+
+
+@pytest.mark.asyncio
+async def test_submit_or_resummarize_name_clash_is_a_conflict(repo, postgres_engine):
+    await _seed(postgres_engine, {"name": "A", "url": "https://a.test"})
+
+    with pytest.raises(DocumentConflictError):
+        await repo.submit_or_resummarize(name="A", url="https://other.test")
+
+    assert await _status(postgres_engine, "A") == DocumentStatus.SUCCESS
+
+
+@pytest.mark.asyncio
+async def test_submit_or_resummarize_url_clash_is_rejected_by_the_unique_index(repo, postgres_engine):
+    await _seed(postgres_engine, {"name": "A", "url": "https://a.test"})
+
+    with pytest.raises(DocumentConflictError) as exc_info:
+        await repo.submit_or_resummarize(name="B", url="https://a.test")
+
+    assert isinstance(exc_info.value.__cause__, IntegrityError)
+    # the session was rolled back and stays usable
+    doc, resummarized = await repo.submit_or_resummarize(name="B", url="https://b.test")
+    assert resummarized is False and doc.name == "B"
+
+
+@pytest.mark.asyncio
+async def test_submit_many_resolves_a_mixed_batch_and_returns_post_update_rows(repo, postgres_engine):
+    await _seed(postgres_engine, {"name": "Old", "url": "https://old.test", "callback_url": "https://cb/old"})
+
+    outcomes = await repo.submit_many(
+        [
+            DocumentCreate(name="Old", url="https://old.test", callback_url="https://cb/new"),
+            DocumentCreate(name="New", url="https://new.test"),
+            DocumentCreate(name="New", url="https://new.test"),
+            DocumentCreate(name="Old", url="https://elsewhere.test"),
+            DocumentCreate(name="Other", url="https://new.test"),
+        ]
+    )
+
+    assert [result for result, _ in outcomes] == [
+        SubmissionResult.RESUMMARIZED,
+        SubmissionResult.CREATED,
+        SubmissionResult.RESUMMARIZED,
+        SubmissionResult.CONFLICT,
+        SubmissionResult.CONFLICT,
+    ]
+    old, new, repeat = (doc for _, doc in outcomes[:3])
+    assert old.status == DocumentStatus.PENDING and old.callback_url == "https://cb/new"
+    assert new.document_uuid is not None and repeat.document_uuid == new.document_uuid
+    assert await _status(postgres_engine, "Old") == DocumentStatus.PENDING
+    async with postgres_engine.connect() as conn:
+        assert (await conn.execute(select(Document.name).order_by(Document.name))).scalars().all() == ["New", "Old"]
+
+
+@pytest.mark.asyncio
+async def test_list_page_walks_created_at_ties_without_gaps_or_repeats(repo, postgres_engine):
+    # five documents created in the same instant: only document_uuid orders them
+    await _seed(
+        postgres_engine,
+        *({"name": f"tie-{i}", "url": f"https://tie-{i}.test", "created_at": T0} for i in range(5)),
+        {"name": "newer", "url": "https://newer.test", "created_at": T0 + dt.timedelta(seconds=1)},
+        {"name": "older", "url": "https://older.test", "created_at": T0 - dt.timedelta(seconds=1)},
+    )
+    expected = [row.document_uuid for row in await repo.list_all(limit=100)]
+
+    seen, after = [], None
+    while page := await repo.list_page(limit=2, after=after):
+        seen += [row.document_uuid for row in page]
+        after = (page[-1].created_at, page[-1].document_uuid)
+
+    assert seen == expected and len(seen) == 7
+
+
+@pytest.mark.asyncio
+async def test_iter_export_filters_and_streams_oldest_update_first_in_batches(repo, postgres_engine):
+    await _seed(
+        postgres_engine,
+        *(
+            {"name": f"doc-{i}", "url": f"https://doc-{i}.test", "updated_at": T0 + dt.timedelta(hours=i)}
+            for i in range(5)
+        ),
+        {"name": "failed", "url": "https://failed.test", "status": DocumentStatus.FAILED, "updated_at": T0},
+    )
+
+    batches = [
+        [row.name for row in rows]
+        async for rows in repo.iter_export(
+            columns=("name",),
+            statuses=[DocumentStatus.SUCCESS],
+            updated_after=T0 + dt.timedelta(hours=1),
+            updated_before=T0 + dt.timedelta(hours=4),
+            batch_size=2,
+        )
+    ]
+
+    assert batches == [["doc-1", "doc-2"], ["doc-3"]]
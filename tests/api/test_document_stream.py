@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import status
+
+from app.core.events import EventSubscriber, document_channel
+
+
+@pytest.mark.asyncio
+async def test_stream_relays_events_until_terminal_status(client, fake_redis):
+    created = (await client.post("/documents/", json={"name": "Streamed", "url": "https://stream.test"})).json()
+    doc_id = created["document_uuid"]
+    channel = document_channel(doc_id)
+
+    async def _worker() -> None:
+        while not any(channel in ps.channels for ps in fake_redis.pubsubs):
+            await asyncio.sleep(0)
+        await fake_redis.publish(
+            channel, json.dumps({"type": "progress", "partial_summary": "Part", "tokens": 1, "done": False})
+        )
+        await fake_redis.publish(
+            channel, json.dumps({"type": "status", **created, "status": "SUCCESS", "summary": "Partial"})
+        )
+        # anything after the terminal status is not relayed
+        await fake_redis.publish(
+            channel, json.dumps({"type": "progress", "partial_summary": "late", "tokens": 9, "done": True})
+        )
+
+    worker = asyncio.create_task(_worker())
+    resp = await client.get(f"/documents/{doc_id}/stream")
+    await worker
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+        for block in resp.text.strip().split("\n\n")
+    ]
+    assert [name for name, _ in events] == ["status", "progress", "status"]
+    assert events[0][1]["status"] == "PENDING"
+    assert events[1][1]["partial_summary"] == "Part"
+    assert events[2][1]["status"] == "SUCCESS"
+    assert not any(ps.channels for ps in fake_redis.pubsubs)
+
+
+@pytest.mark.asyncio
+async def test_stream_unknown_document_is_404(client, fake_redis):
+    resp = await client.get("/documents/8f1b2a58-3c52-4d8e-9d0a-2f4f5c7a1e11/stream")
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert not any(ps.channels for ps in fake_redis.pubsubs)
+
+
+@pytest.mark.asyncio
+async def test_get_with_wait_returns_once_the_worker_announces_a_terminal_status(client, fake_redis):
+    created = (await client.post("/documents/", json={"name": "Waited", "url": "https://wait.test"})).json()
+    channel = document_channel(created["document_uuid"])
+
+    async def _worker() -> None:
+        while not any(channel in ps.channels for ps in fake_redis.pubsubs):
+            await asyncio.sleep(0)
+        await fake_redis.publish(channel, json.dumps({"type": "status", **created, "status": "PROCESSING"}))
+        await fake_redis.publish(
+            channel, json.dumps({"type": "progress", "partial_summary": "Do", "tokens": 1, "done": False})
+        )
+        await fake_redis.publish(
+            channel, json.dumps({"type": "status", **created, "status": "SUCCESS", "summary": "Done"})
+        )
+
+    worker = asyncio.create_task(_worker())
+    resp = await client.get(f"/documents/{created['document_uuid']}/?wait=5")
+    await worker
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["status"] == "SUCCESS" and resp.json()["summary"] == "Done"
+    assert not any(ps.channels for ps in fake_redis.pubsubs)
+    # a second wait reuses the process's subscriber instead of opening a connection of its own
+    await client.get(f"/documents/{created['document_uuid']}/?wait=0.01")
+    assert len(fake_redis.pubsubs) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_with_wait_answers_with_the_current_state_on_timeout(client, fake_redis):
+    created = (await client.post("/documents/", json={"name": "Slow", "url": "https://slow.test"})).json()
+    resp = await client.get(f"/documents/{created['document_uuid']}/?wait=0.05")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["status"] == "PENDING"
+    assert not any(ps.channels for ps in fake_redis.pubsubs)
+    assert (await client.get(f"/documents/{created['document_uuid']}/?wait=3600")).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_event_subscriber_shares_one_connection_and_fans_out_to_every_listener(fake_redis):
+    events = EventSubscriber(fake_redis, read_timeout=0.01)
+    first, second = await events.subscribe("doc-a"), await events.subscribe("doc-a")
+    other = await events.subscribe("doc-b")
+    try:
+        (pubsub,) = fake_redis.pubsubs
+        assert pubsub.channels == {document_channel("doc-a"), document_channel("doc-b")}
+
+        await fake_redis.publish(document_channel("doc-a"), json.dumps({"type": "status", "status": "SUCCESS"}))
+        events_a = await asyncio.wait_for(asyncio.gather(first.get(), second.get()), 1)
+        assert events_a == [{"type": "status", "status": "SUCCESS"}] * 2
+        assert events_a[0] is not events_a[1]  # listeners may consume (pop) their copy
+        assert other.empty()
+
+        # the channel stays subscribed until its last listener leaves
+        await events.unsubscribe("doc-a", first)
+        assert document_channel("doc-a") in pubsub.channels
+        await events.unsubscribe("doc-a", second)
+        assert pubsub.channels == {document_channel("doc-b")}
+    finally:
+        await events.close()
+
+    assert pubsub.closed
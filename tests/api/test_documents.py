@@ -1,4 +1,13 @@
+import datetime as dt
+import json
+
 import pytest
+from prometheus_client import REGISTRY
+
+from app.api import depends
+from app.api.main import app
+from app.core.models import DocumentStatus
+
 
 @pytest.mark.asyncio
 async def test_document_create_and_get(client):
@@ -30,3 +39,95 @@ async def test_list_documents(client):
     assert isinstance(items, list)
     # newest first per our Fake repo
     assert {items[0]["name"], items[1]["name"]} == {"A", "B"}
+
+
+@pytest.mark.asyncio
+async def test_list_documents_keyset_pagination(client):
+    names = [f"Doc {i}" for i in range(5)]
+    for name in names:
+        await client.post("/documents/", json={"name": name, "url": f"https://{name.replace(' ', '-')}.test"})
+
+    seen, cursor = [], ""
+    while cursor is not None:
+        resp = await client.get("/documents/", params={"limit": 2, "cursor": cursor})
+        assert resp.status_code == 200
+        seen += [d["name"] for d in resp.json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+
+    assert sorted(seen) == sorted(names)
+    assert len(seen) == len(set(seen))
+
+    # offset mode still works and agrees with keyset order
+    offset_page = (await client.get("/documents/", params={"limit": 5, "offset": 0})).json()
+    assert [d["name"] for d in offset_page] == seen
+
+
+@pytest.mark.asyncio
+async def test_list_documents_rejects_bad_cursor(client):
+    assert (await client.get("/documents/", params={"cursor": "not-a-cursor"})).status_code == 400
+    assert (await client.get("/documents/", params={"cursor": "", "offset": 5})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_documents_sparse_fields(client):
+    await client.post("/documents/", json={"name": "A", "url": "https://a.test"})
+    repo = app.dependency_overrides[depends.get_document_repository]()
+
+    resp = await client.get("/documents/", params={"fields": "status,name, data_progress", "cursor": ""})
+    assert resp.status_code == 200
+    assert resp.json() == [{"name": "A", "status": "PENDING", "data_progress": 0.0}]
+    # summary is not read at all
+    assert repo.listed_columns == ["name", "status"]
+
+    full = (await client.get("/documents/")).json()[0]
+    assert list(full) == ["document_uuid", "name", "url", "summary", "status", "truncated", "data_progress"]
+
+    bad = await client.get("/documents/", params={"fields": "name,content_hash"})
+    assert bad.status_code == 400
+    assert "content_hash" in bad.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_export_documents_streams_ndjson(client):
+    for name in ("A", "B", "C"):
+        await client.post("/documents/", json={"name": name, "url": f"https://{name.lower()}.test"})
+    repo = app.dependency_overrides[depends.get_document_repository]()
+    docs = {d.name: d for d in repo._store.values()}
+    docs["B"].status = DocumentStatus.SUCCESS
+    docs["B"].summary = "done"
+
+    resp = await client.get("/documents/export", headers={"Accept-Encoding": "identity"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in resp.headers
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["name"] for line in lines] == ["A", "B", "C"]
+
+    resp = await client.get(
+        "/documents/export", params={"status": "SUCCESS", "fields": "name,summary"}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert resp.headers["content-encoding"] == "gzip"
+    # decoded by httpx
+    assert resp.content == b'{"name":"B","summary":"done"}\n'
+
+    cutoff = (docs["C"].updated_at - dt.timedelta(microseconds=1)).isoformat()
+    resp = await client.get("/documents/export", params={"updated_after": cutoff, "fields": "name"})
+    assert resp.text == '{"name":"C"}\n'
+
+
+@pytest.mark.asyncio
+async def test_get_document_is_served_from_cache_after_first_read(client):
+    def lookups(result: str) -> float:
+        return REGISTRY.get_sample_value("summarizer_document_cache_lookups_total", {"result": result}) or 0.0
+
+    created = (await client.post("/documents/", json={"name": "Cached", "url": "https://cached.test"})).json()
+    hits, misses = lookups("hit"), lookups("miss")
+
+    # the submission wrote the fresh state through to the cache
+    first = await client.get(f"/documents/{created['document_uuid']}/")
+    second = await client.get(f"/documents/{created['document_uuid'].upper()}/")
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() == created
+    assert lookups("hit") == hits + 2
+    assert lookups("miss") == misses
@@ -0,0 +1,52 @@
+"""app.core.jobs against a real Redis: the enqueue and promote scripts, and jobs arq itself can read."""
+
+import pytest
+from arq.constants import in_progress_key_prefix, job_key_prefix, result_key_prefix
+from arq.jobs import Job, JobStatus
+
+from app.core.jobs import enqueue_document, enqueue_documents, followup_job_id, process_document_job_id, rerun_key
+from app.core.schemas import DocumentPriority
+
+INTERACTIVE, BULK = "arq:queue", "arq:queue:bulk"
+
+
+@pytest.mark.asyncio
+async def test_enqueued_jobs_are_read_by_arq_like_its_own(arq_redis):
+    assert await enqueue_documents(arq_redis, ["doc-1", "doc-2"]) == 2
+
+    job_id = process_document_job_id("doc-1")
+    job = Job(job_id, arq_redis)
+    info = await job.info()
+    assert (info.function, info.args) == ("process_document", ("doc-1",))
+    assert await job.status() == JobStatus.queued
+    assert 0 < await arq_redis.pttl(job_key_prefix + job_id) <= arq_redis.expires_extra_ms
+    assert await arq_redis.zcard(INTERACTIVE) == 2
+
+
+@pytest.mark.asyncio
+async def test_a_document_with_a_job_a_result_or_a_followup_is_not_queued_again(arq_redis):
+    assert await enqueue_document(arq_redis, "queued") is True
+    await arq_redis.set(result_key_prefix + process_document_job_id("finished"), b"result")
+    await arq_redis.set(job_key_prefix + followup_job_id("followed-up"), b"job")
+
+    assert await enqueue_documents(arq_redis, ["queued", "finished", "followed-up", "new"], DocumentPriority.BULK) == 1
+
+    assert await arq_redis.zrange(INTERACTIVE, 0, -1) == [process_document_job_id("queued").encode()]
+    assert await arq_redis.zrange(BULK, 0, -1) == [process_document_job_id("new").encode()]
+    for document_uuid in ("queued", "finished", "followed-up"):
+        assert await arq_redis.exists(rerun_key(document_uuid))
+
+
+@pytest.mark.asyncio
+async def test_interactive_resubmit_promotes_a_waiting_bulk_job_but_not_a_running_one(arq_redis):
+    waiting, running = process_document_job_id("waiting"), process_document_job_id("running")
+    assert await enqueue_documents(arq_redis, ["waiting", "running"], DocumentPriority.BULK) == 2
+    score = await arq_redis.zscore(BULK, waiting)
+    await arq_redis.set(in_progress_key_prefix + running, b"1")
+
+    assert await enqueue_documents(arq_redis, ["waiting", "running"]) == 0
+
+    assert await arq_redis.zscore(INTERACTIVE, waiting) == score
+    assert await arq_redis.zscore(BULK, waiting) is None
+    assert await arq_redis.zscore(BULK, running) is not None
+    assert await arq_redis.zscore(INTERACTIVE, running) is None
@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_route_latency_and_queue_depth(client, fake_redis):
+    created = (await client.post("/documents/", json={"name": "Metered", "url": "https://metered.test"})).json()
+    fake_redis.queues["arq:queue"].update({"other-1": 0, "other-2": 0})
+    await client.get(f"/documents/{created['document_uuid']}/")
+
+    resp = await client.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    # labelled by route template, not by the concrete path
+    assert 'route="/documents/{document_uuid}/"' in body
+    assert created["document_uuid"] not in body
+    assert 'summarizer_queue_depth{queue="arq:queue"} 3.0' in body
+    assert 'summarizer_document_status_transitions_total{status="PENDING"}' in body
@@ -0,0 +1,52 @@
+import logging
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.core.middleware import LoggingMiddleware
+
+
+def _app(sample_rate: float) -> LoggingMiddleware:
+    async def ok(_request):
+        return PlainTextResponse("ok")
+
+    async def boom(_request):
+        raise RuntimeError("boom")
+
+    return LoggingMiddleware(Starlette(routes=[Route("/ok", ok), Route("/boom", boom)]), sample_rate=sample_rate)
+
+
+@pytest.mark.asyncio
+async def test_access_log_is_sampled_but_always_reports_errors(caplog):
+    caplog.set_level(logging.INFO, logger="app")
+    transport = ASGITransport(app=_app(sample_rate=0.0), raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as client:
+        assert (await client.get("/ok", params={"cursor": "abc"})).status_code == 200
+        assert (await client.get("/boom")).status_code == 500
+
+    assert [(r.levelno, r.getMessage().split(" in ")[0]) for r in caplog.records if r.name == "app"] == [
+        (logging.WARNING, "GET /boom completed with status 500")
+    ]
+
+    caplog.clear()
+    async with AsyncClient(transport=ASGITransport(app=_app(sample_rate=1.0)), base_url="http://testserver") as client:
+        await client.get("/ok")
+    assert [r.getMessage().split(" in ")[0] for r in caplog.records if r.name == "app"] == [
+        "GET /ok completed with status 200"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_large_list_responses_are_gzipped(client):
+    for i in range(20):
+        await client.post("/documents/", json={"name": f"Doc {i}", "url": f"https://doc-{i}.test"})
+
+    resp = await client.get("/documents/", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert len(resp.json()) == 20
+
+    small = await client.get("/documents/", params={"limit": 1, "fields": "name"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
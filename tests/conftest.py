@@ -1,16 +1,33 @@
+import asyncio
 import datetime as dt
+import json
+import os
+import subprocess
+import sys
 import uuid
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Iterator, List, Optional, Sequence
 
 import pytest
 import pytest_asyncio
+from arq.connections import ArqRedis, RedisSettings, create_pool
+from arq.jobs import deserialize_job, serialize_job
 from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 from app.api.main import app
+from app.core.config import CLAIM_STALE_SECONDS
 from app.core.models import Document, DocumentStatus
 from app.api.domain.document_repository import DocumentRepository
+from app.core.events import EventSubscriber
 from app.core.exceptions import DocumentConflictError
+from app.core.jobs import _ENQUEUE_JOB, _PROMOTE_JOB
+from app.core.schemas import DocumentCreate, SubmissionResult
 from app.api import depends
+from app.api.pagination import Cursor
 
 
 # ---------------------------
@@ -29,10 +46,15 @@ class FakeDocumentRepository(DocumentRepository):
         now = dt.datetime.now(dt.timezone.utc)
         if not getattr(doc, "created_at", None):
             doc.created_at = now
+        if doc.truncated is None:
+            doc.truncated = False
         doc.updated_at = now
         self._store[doc.document_uuid] = doc
         return doc
 
+    async def release(self) -> None:
+        return
+
     async def get(self, doc_id: uuid.UUID) -> Optional[Document]:
         if isinstance(doc_id, str):
             try:
@@ -41,17 +63,49 @@ class FakeDocumentRepository(DocumentRepository):
                 return None
         return self._store.get(doc_id)
 
-    async def list_all(self, *, limit: int = 100, offset: int = 0) -> List[Document]:
-        docs = sorted(self._store.values(), key=lambda d: d.created_at, reverse=True)
+    async def list_all(self, *, limit: int = 100, offset: int = 0, columns: Sequence[str] = ()) -> List[Document]:
+        self.listed_columns = list(columns)
+        docs = sorted(self._store.values(), key=lambda d: (d.created_at, d.document_uuid), reverse=True)
         return docs[offset : offset + limit]
 
+    async def list_page(
+        self, *, limit: int = 100, after: Optional[Cursor] = None, columns: Sequence[str] = ()
+    ) -> List[Document]:
+        self.listed_columns = list(columns)
+        docs = sorted(self._store.values(), key=lambda d: (d.created_at, d.document_uuid), reverse=True)
+        if after is not None:
+            docs = [d for d in docs if (d.created_at, d.document_uuid) < after]
+        return docs[:limit]
+
+    async def iter_export(
+        self,
+        *,
+        columns: Sequence[str] = (),
+        statuses: Sequence[DocumentStatus] = (),
+        updated_after: Optional[dt.datetime] = None,
+        updated_before: Optional[dt.datetime] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[List[Document]]:
+        docs = sorted(self._store.values(), key=lambda d: d.updated_at)
+        docs = [
+            d
+            for d in docs
+            if (not statuses or d.status in statuses)
+            and (updated_after is None or d.updated_at >= updated_after)
+            and (updated_before is None or d.updated_at < updated_before)
+        ]
+        for start in range(0, len(docs), batch_size):
+            yield docs[start : start + batch_size]
+
     async def _set_status(self, doc_id: uuid.UUID, status: DocumentStatus) -> None:
         doc = await self.get(doc_id)
         if doc:
             doc.status = status
             doc.updated_at = dt.datetime.now(dt.timezone.utc)
 
-    async def submit_or_resummarize(self, *, name: str, url: str) -> tuple[Document, bool]:
+    async def submit_or_resummarize(
+        self, *, name: str, url: str, callback_url: Optional[str] = None
+    ) -> tuple[Document, bool]:
         """
         - If exact (same name+url): set to PENDING and return (doc, True)
         - If name xor url clashes: raise DocumentConflictError
@@ -71,46 +125,205 @@ class FakeDocumentRepository(DocumentRepository):
 
         if exact:
             await self._set_status(exact.document_uuid, DocumentStatus.PENDING)
+            exact.callback_url = callback_url or exact.callback_url
             return exact, True
 
         if name_clash or url_clash:
             raise DocumentConflictError("Document with same name or URL exists")
 
-        new_doc = Document(name=name, url=url, summary=None, status=DocumentStatus.PENDING)
+        new_doc = Document(
+            name=name, url=url, summary=None, status=DocumentStatus.PENDING, callback_url=callback_url
+        )
         new_doc = await self.add(new_doc)
         return new_doc, False
 
-# Dummy Redis for API routes
-class _DummyRedis:
+    async def submit_many(self, items: List[DocumentCreate]) -> List[tuple[SubmissionResult, Optional[Document]]]:
+        results: List[tuple[SubmissionResult, Optional[Document]]] = []
+        for item in items:
+            try:
+                doc, resummarized = await self.submit_or_resummarize(
+                    name=item.name, url=item.url, callback_url=item.callback_url
+                )
+            except DocumentConflictError:
+                results.append((SubmissionResult.CONFLICT, None))
+                continue
+            results.append((SubmissionResult.RESUMMARIZED if resummarized else SubmissionResult.CREATED, doc))
+        return results
+
+# ---------------------------
+# In-memory fake Redis
+# ---------------------------
+
+class FakeRedis:
+    """Just enough of ArqRedis for the app: keys, the job scripts of app.core.jobs, arq's enqueue_job and pub/sub.
+
+    Values are stored as redis returns them (bytes). `jobs` lists every job created, by either path, as
+    (function, args, job id); `queues` maps each queue to its job ids and scores.
+    """
+
+    default_queue_name = "arq:queue"
+    job_serializer = None
+    expires_extra_ms = 86_400_000
+
+    def __init__(self) -> None:
+        self.keys: Dict[str, Any] = {}
+        self.queues: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.jobs: List[tuple] = []
+        self.published: List[tuple] = []
+        self.pubsubs: List["FakePubSub"] = []
+        self.round_trips = 0
+
     async def ping(self) -> bool:
         return True
 
-    async def enqueue_job(self, *_: Any, **__: Any) -> None:
+    async def get(self, key: str) -> Any:
+        return self.keys.get(key)
+
+    async def set(self, key: str, value: Any, *, ex: Any = None, px: Any = None, nx: bool = False) -> Optional[bool]:
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.keys.pop(key, None) is not None for key in keys)
+
+    async def zcard(self, key: str) -> int:
+        return len(self.queues[key])
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    async def enqueue_job(
+        self, function: str, *args: Any, _job_id: Optional[str] = None, _queue_name: Optional[str] = None, **_: Any
+    ) -> Optional[object]:
+        job_id = _job_id or uuid.uuid4().hex
+        if f"arq:job:{job_id}" in self.keys:
+            return None
+        self.keys[f"arq:job:{job_id}"] = serialize_job(function, args, {}, None, 0)
+        self.queues[_queue_name or self.default_queue_name][job_id] = 0
+        self.jobs.append((function, args, _job_id))
+        return object()
+
+    def queues_holding(self, job_id: str) -> List[str]:
+        return [name for name, queue in self.queues.items() if job_id in queue]
+
+    async def publish(self, channel: str, data: str) -> int:
+        self.published.append((channel, json.loads(data)))
+        listeners = [ps for ps in self.pubsubs if channel in ps.channels]
+        for ps in listeners:
+            ps.messages.put_nowait({"type": "message", "channel": channel.encode(), "data": data.encode()})
+        return len(listeners)
+
+    def pubsub(self) -> "FakePubSub":
+        ps = FakePubSub()
+        self.pubsubs.append(ps)
+        return ps
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self._redis = redis
+        self._ops: List[Any] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
         return None
 
+    def set(self, *args: Any, **kwargs: Any) -> None:
+        self._ops.append(lambda: self._redis.set(*args, **kwargs))
+
+    def eval(self, script: str, numkeys: int, *keys_and_args: Any) -> None:
+        run = {_ENQUEUE_JOB: self._enqueue, _PROMOTE_JOB: self._promote}[script]
+        self._ops.append(lambda: run(keys_and_args[:numkeys], keys_and_args[numkeys:]))
+
+    async def execute(self) -> List[Any]:
+        self._redis.round_trips += 1
+        return [await op() for op in self._ops]
+
+    async def _enqueue(self, keys: Sequence[str], args: Sequence[Any]) -> int:
+        job_key, queue, *must_not_exist = keys
+        job, _expires_ms, score, job_id = args
+        if any(key in self._redis.keys for key in (job_key, *must_not_exist)):
+            return 0
+        self._redis.keys[job_key] = job
+        self._redis.queues[queue].setdefault(job_id, score)
+        decoded = deserialize_job(job)
+        self._redis.jobs.append((decoded.function, decoded.args, job_id))
+        return 1
+
+    async def _promote(self, keys: Sequence[str], args: Sequence[Any]) -> int:
+        (source, target, in_progress_key), (job_id,) = keys, args
+        if in_progress_key in self._redis.keys or job_id not in self._redis.queues[source]:
+            return 0
+        self._redis.queues[target][job_id] = self._redis.queues[source].pop(job_id)
+        return 1
+
+
+class FakePubSub:
+    def __init__(self) -> None:
+        self.channels: set = set()
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+
+    async def subscribe(self, *channels: str) -> None:
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        self.channels.difference_update(channels or set(self.channels))
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: Optional[float] = 0.0) -> Any:
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self) -> None:
+        self.channels.clear()
+        self.closed = True
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    return FakeRedis()
+
 
 # ---------------------------
 # FastAPI test client fixture
 # ---------------------------
 
 @pytest_asyncio.fixture
-async def client() -> AsyncGenerator[AsyncClient, None]:
+async def client(fake_redis: FakeRedis) -> AsyncGenerator[AsyncClient, None]:
     fake_repo = FakeDocumentRepository()
 
     def _get_repo_override() -> DocumentRepository:
         return fake_repo
 
-    async def _get_redis_override():
-        return _DummyRedis()
+    @asynccontextmanager
+    async def _open_repo() -> AsyncIterator[DocumentRepository]:
+        yield fake_repo
+
+    async def _get_redis_override() -> FakeRedis:
+        return fake_redis
+
+    events = EventSubscriber(fake_redis, read_timeout=0.01)
+
+    async def _get_events_override() -> EventSubscriber:
+        return events
 
     app.dependency_overrides[depends.get_document_repository] = _get_repo_override
+    app.dependency_overrides[depends.get_document_repository_factory] = lambda: _open_repo
     app.dependency_overrides[depends.get_redis] = _get_redis_override
+    app.dependency_overrides[depends.get_event_subscriber] = _get_events_override
 
     async with AsyncClient(app=app, base_url="http://testserver", follow_redirects=True) as ac:
         try:
             yield ac
         finally:
             app.dependency_overrides.clear()
+            await events.close()
 
 
 
@@ -133,19 +346,73 @@ class FakeWorkerDocumentRepository:
             return None
         return self._store.get(key)
 
+    async def claim(self, document_uuid: str) -> Optional[Document]:
+        doc = await self.get_by_id(document_uuid)
+        if doc is None or doc.status != DocumentStatus.PENDING:
+            return None
+        await self.update_status(document_uuid, DocumentStatus.PROCESSING)
+        return doc
+
     async def update_status(self, document_uuid: str, status: DocumentStatus) -> None:
         doc = await self.get_by_id(document_uuid)
         if doc:
             doc.status = status
             doc.updated_at = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
 
-    async def update_summary(self, document_uuid: str, summary: str, status: DocumentStatus) -> None:
+    async def update_summary(
+        self,
+        document_uuid: str,
+        summary: str,
+        status: DocumentStatus,
+        *,
+        content_hash: Optional[str] = None,
+        summary_key: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        truncated: bool = False,
+    ) -> None:
         doc = await self.get_by_id(document_uuid)
         if doc:
             doc.summary = summary
             doc.status = status
+            doc.content_hash = content_hash
+            doc.summary_key = summary_key
+            doc.etag = etag
+            doc.last_modified = last_modified
+            doc.truncated = truncated
             doc.updated_at = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
 
+    async def mark_stale_pending(self, older_than: dt.timedelta, *, limit: int) -> List[Document]:
+        now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+        stale = sorted(
+            (
+                d
+                for d in self._store.values()
+                if d.updated_at < now - older_than and d.status in (DocumentStatus.SUCCESS, DocumentStatus.FAILED)
+            ),
+            key=lambda d: d.updated_at,
+        )[:limit]
+        for doc in stale:
+            await self.update_status(str(doc.document_uuid), DocumentStatus.PENDING)
+        return stale
+
+    async def iter_unclaimed(self, pending_for: dt.timedelta, *, batch_size: int) -> AsyncIterator[List[str]]:
+        now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+        waiting = sorted(
+            (
+                d
+                for d in self._store.values()
+                if (d.status == DocumentStatus.PENDING and d.updated_at < now - pending_for)
+                or (
+                    d.status == DocumentStatus.PROCESSING
+                    and d.updated_at < now - dt.timedelta(seconds=CLAIM_STALE_SECONDS)
+                )
+            ),
+            key=lambda d: (d.updated_at, d.document_uuid),
+        )
+        for start in range(0, len(waiting), batch_size):
+            yield [str(d.document_uuid) for d in waiting[start : start + batch_size]]
+
     # Helper for tests to seed a doc
     async def add(self, doc: Document) -> Document:
         if not getattr(doc, "document_uuid", None):
@@ -160,3 +427,90 @@ class FakeWorkerDocumentRepository:
 @pytest.fixture
 def fake_worker_repo() -> FakeWorkerDocumentRepository:
     return FakeWorkerDocumentRepository()
+
+
+# ---------------------------
+# Postgres for repository tests
+# ---------------------------
+
+def _migrate(url: str) -> None:
+    root = Path(__file__).resolve().parents[1]
+    env = {**os.environ, "DATABASE_URL": url, "PYTHONPATH": str(root / "src")}
+    subprocess.run(  # noqa: S603 - fixed command
+        [sys.executable, "-m", "alembic", "upgrade", "head"], cwd=root, env=env, check=True, capture_output=True
+    )
+
+
+@pytest.fixture(scope="session")
+def postgres_url() -> Iterator[str]:
+    """A migrated Postgres: TEST_DATABASE_URL (a database the tests may empty) or a throwaway container.
+
+    Tests using it are skipped when neither TEST_DATABASE_URL nor testcontainers with a Docker daemon is available.
+    """
+    url = os.getenv("TEST_DATABASE_URL")
+    if url:
+        _migrate(url)
+        yield url
+        return
+
+    postgres = pytest.importorskip("testcontainers.postgres", reason="set TEST_DATABASE_URL or install testcontainers")
+    try:
+        container = postgres.PostgresContainer("postgres:16-alpine", driver="asyncpg").start()
+    except Exception as e:
+        pytest.skip(f"could not start a Postgres container: {e}")
+    try:
+        url = container.get_connection_url()
+        _migrate(url)
+        yield url
+    finally:
+        container.stop()
+
+
+@pytest_asyncio.fixture
+async def postgres_engine(postgres_url: str) -> AsyncGenerator[AsyncEngine, None]:
+    """Engine on an empty documents table."""
+    engine = create_async_engine(postgres_url)
+    async with engine.begin() as conn:
+        await conn.execute(text("TRUNCATE documents"))
+    try:
+        yield engine
+    finally:
+        await engine.dispose()
+
+
+
+# ---------------------------
+# Redis for the job scripts
+# ---------------------------
+
+@pytest.fixture(scope="session")
+def redis_url() -> Iterator[str]:
+    """A real Redis: TEST_REDIS_URL (a database the tests may flush) or a throwaway container.
+
+    Tests using it are skipped when neither TEST_REDIS_URL nor testcontainers with a Docker daemon is available.
+    """
+    url = os.getenv("TEST_REDIS_URL")
+    if url:
+        yield url
+        return
+
+    redis = pytest.importorskip("testcontainers.redis", reason="set TEST_REDIS_URL or install testcontainers")
+    try:
+        container = redis.RedisContainer("redis:7-alpine").start()
+    except Exception as e:
+        pytest.skip(f"could not start a Redis container: {e}")
+    try:
+        yield f"redis://{container.get_container_host_ip()}:{container.get_exposed_port(6379)}/0"
+    finally:
+        container.stop()
+
+
+@pytest_asyncio.fixture
+async def arq_redis(redis_url: str) -> AsyncGenerator[ArqRedis, None]:
+    """ArqRedis on an empty database."""
+    pool = await create_pool(RedisSettings.from_dsn(redis_url))
+    await pool.flushdb()
+    try:
+        yield pool
+    finally:
+        await pool.aclose()
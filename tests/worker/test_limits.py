@@ -0,0 +1,132 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.worker.limits import AdaptiveLimiter, SlotTimeoutError
+
+
+def _limiter(**overrides) -> AdaptiveLimiter:
+    settings = {"initial": 2, "minimum": 1, "maximum": 4, "latency_target": 1.0} | overrides
+    return AdaptiveLimiter("test", **settings)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_bounds_concurrency_and_grows_while_fast():
+    limiter = _limiter()
+    in_flight = peak = 0
+
+    async def job() -> None:
+        nonlocal in_flight, peak
+        async with limiter.acquire() as slot:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            slot.latency = 0.1
+            in_flight -= 1
+
+    await asyncio.gather(*(job() for _ in range(4)))
+    assert peak == 2
+
+    # fast answers at full capacity raise the limit, up to the maximum
+    await asyncio.gather(*(job() for _ in range(40)))
+    assert limiter.limit == 4 and peak == 4
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_halves_once_per_burst_of_overload_errors():
+    limiter = _limiter(initial=4)
+    started = asyncio.Event()
+    entered = 0
+
+    async def timed_out() -> None:
+        nonlocal entered
+        async with limiter.acquire():
+            entered += 1
+            if entered == 4:
+                started.set()
+            await started.wait()
+            raise httpx.ReadTimeout("timed out")
+
+    results = await asyncio.gather(*(timed_out() for _ in range(4)), return_exceptions=True)
+    assert all(isinstance(r, httpx.ReadTimeout) for r in results)
+    # four requests in flight failed together: one multiplicative decrease, not four
+    assert limiter.limit == 2
+
+    with pytest.raises(httpx.ReadTimeout):
+        async with limiter.acquire():
+            raise httpx.ReadTimeout("timed out")
+    assert limiter.limit == 1
+
+    # failures unrelated to load leave the limit alone
+    with pytest.raises(ValueError):
+        async with limiter.acquire():
+            raise ValueError("bad prompt")
+    assert limiter.limit == 1
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_serves_foreground_waiters_before_background_ones():
+    limiter = _limiter(initial=1, maximum=1)
+    release = asyncio.Event()
+    order: list[str] = []
+
+    async def job(name: str, *, background: bool) -> None:
+        async with limiter.acquire(background=background):
+            order.append(name)
+            if name == "holder":
+                await release.wait()
+
+    holder = asyncio.create_task(job("holder", background=False))
+    await asyncio.sleep(0)
+    waiting = [
+        asyncio.create_task(job("bulk-1", background=True)),
+        asyncio.create_task(job("bulk-2", background=True)),
+        asyncio.create_task(job("interactive", background=False)),
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holder, *waiting)
+
+    assert order == ["holder", "interactive", "bulk-1", "bulk-2"]
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_gives_up_waiting_for_a_slot_after_the_timeout():
+    limiter = _limiter(initial=1, maximum=1)
+    release = asyncio.Event()
+
+    async def holder() -> None:
+        async with limiter.acquire():
+            await release.wait()
+
+    task = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    with pytest.raises(SlotTimeoutError, match="No test slot free"):
+        async with limiter.acquire(timeout=0.01):
+            pass
+
+    # the abandoned wait neither took the slot nor lowered the limit
+    assert limiter.in_flight == 1 and limiter.limit == 1
+    release.set()
+    await task
+    async with limiter.acquire(timeout=0.01):
+        assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_takes_no_latency_sample_from_a_cancelled_block():
+    limiter = _limiter(latency_target=0.01)
+
+    async def cut_short() -> None:
+        async with limiter.acquire():
+            await asyncio.sleep(1)
+
+    task = asyncio.create_task(cut_short())
+    await asyncio.sleep(0.05)  # held longer than the latency target before the cancellation
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert limiter.limit == 2 and limiter.in_flight == 0
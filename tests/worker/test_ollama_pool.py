@@ -0,0 +1,67 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.worker.ollama_pool import OllamaPool
+from app.worker.utils import call_ollama
+
+A, B = "http://ollama-a.test", "http://ollama-b.test"
+
+
+def _done(text: str) -> httpx.Response:
+    return httpx.Response(200, text=json.dumps({"response": text, "done": True}) + "\n")
+
+
+@pytest.mark.asyncio
+async def test_pool_routes_to_least_outstanding_backend():
+    release = asyncio.Event()
+    hosts: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if len(hosts) == 1:
+            await release.wait()  # the first generation stays in flight
+        return _done(request.url.host)
+
+    pool = OllamaPool(httpx.AsyncClient(transport=httpx.MockTransport(handler)), [A, B])
+    slow = asyncio.create_task(call_ollama(pool, "first"))
+    while not hosts:
+        await asyncio.sleep(0)
+
+    # the busy backend is skipped three times in a row, whatever the tie-break rotation says
+    fast = [await call_ollama(pool, "next") for _ in range(3)]
+    release.set()
+    first = await slow
+    await pool.aclose()
+
+    assert set(fast) == {h for h in ("ollama-a.test", "ollama-b.test") if h != first}
+    assert [b.in_flight for b in pool.backends] == [0, 0]
+
+
+@pytest.mark.asyncio
+async def test_pool_fails_over_and_ejects_unreachable_backend():
+    hosts: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if request.url.host == "ollama-a.test":
+            raise httpx.ConnectError("connection refused", request=request)
+        return _done("ok")
+
+    pool = OllamaPool(httpx.AsyncClient(transport=httpx.MockTransport(handler)), [A, B], max_failures=2)
+    summaries = [await call_ollama(pool, "text") for _ in range(6)]
+
+    assert summaries == ["ok"] * 6
+    # A was tried until ejected (2 failures), then left out of rotation
+    assert hosts.count("ollama-a.test") == 2
+    assert not pool.backends[0].is_available(time.monotonic())
+
+    # once A answers health checks again it is back in rotation
+    await pool.client.aclose()
+    pool.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={})))
+    await pool.check_health()
+    await pool.aclose()
+    assert pool.backends[0].ejected_until == 0.0 and pool.backends[0].consecutive_failures == 0
@@ -0,0 +1,40 @@
+from app.worker.preprocess import preprocess
+from app.worker.utils import estimate_tokens
+
+
+def test_preprocess_drops_repeated_paragraphs_and_keeps_order():
+    text = "Intro paragraph.\nShare this article\n\nBody paragraph.\n  share THIS   article \nIntro paragraph."
+
+    result = preprocess(text, budget_tokens=1000)
+
+    assert result.text == "Intro paragraph.\nShare this article\nBody paragraph."
+    assert result.duplicate_paragraphs == 2
+    assert not result.ranked
+    assert result.tokens_saved > 0
+
+
+def test_preprocess_ranks_sentences_into_the_budget():
+    related = [
+        f"Engineers traced the reactor cooling failure to pump controller firmware, report {i}." for i in range(20)
+    ]
+    noise = [f"Subscribe today for weekly gardening offers and recipes number {i}." for i in range(20)]
+    text = "\n".join([*(s for pair in zip(related, noise, strict=True) for s in pair), "Read more"])
+
+    result = preprocess(text, budget_tokens=200)
+
+    assert result.ranked
+    assert estimate_tokens(result.text) <= 200
+    # the sentences sharing the page's dominant vocabulary win, in document order
+    kept = result.text.splitlines()
+    assert kept == related[: len(kept)]
+    assert "gardening" not in result.text
+    assert "Read more" not in result.text
+
+
+def test_preprocess_falls_back_to_the_start_of_unpunctuated_text():
+    text = "word " * 5000
+
+    result = preprocess(text, budget_tokens=100)
+
+    assert result.ranked
+    assert 0 < estimate_tokens(result.text) <= 100
@@ -0,0 +1,33 @@
+import pytest
+
+from app.core.config import PROCESS_DOCUMENT_MAX_TRIES, PROCESS_DOCUMENT_TIMEOUT
+from app.core.schemas import DocumentPriority
+from app.worker.runner import create_workers, queue_job_slots
+from app.worker.tasks import WorkerSettings
+
+INTERACTIVE, BULK = DocumentPriority.INTERACTIVE, DocumentPriority.BULK
+
+
+def test_queue_job_slots_split_by_weight_and_keep_one_slot_per_queue():
+    assert queue_job_slots(20, {INTERACTIVE: 3, BULK: 1}) == {INTERACTIVE: 15, BULK: 5}
+    assert queue_job_slots(2, {INTERACTIVE: 9, BULK: 1}) == {INTERACTIVE: 2, BULK: 1}
+    assert queue_job_slots(20, {INTERACTIVE: 1, BULK: 0}) == {INTERACTIVE: 20}
+
+
+@pytest.mark.asyncio
+async def test_create_workers_one_per_queue_sharing_the_pool_and_context():
+    redis, shared = object(), {"ollama_pool": object()}
+
+    workers = create_workers(WorkerSettings, redis_pool=redis, ctx=shared)
+
+    assert [w.queue_name for w in workers] == ["arq:queue", "arq:queue:bulk"]
+    assert all(w.pool is redis and w.ctx["ollama_pool"] is shared["ollama_pool"] for w in workers)
+    assert [w.ctx["priority"] for w in workers] == [INTERACTIVE, BULK]
+    assert "process_document" in workers[0].functions
+    assert workers[0].functions["process_document"].timeout_s == PROCESS_DOCUMENT_TIMEOUT
+    assert workers[0].functions["process_document"].max_tries == PROCESS_DOCUMENT_MAX_TRIES
+    # no result keys, not even for jobs that fail outside the function (they would block the job id)
+    assert all(w.keep_result_s == 0 for w in workers)
+    # the cron jobs run once, on the bulk worker
+    assert workers[0].cron_jobs == []
+    assert [c.name for c in workers[1].cron_jobs] == ["cron:requeue_orphaned_documents", "cron:refresh_stale_documents"]
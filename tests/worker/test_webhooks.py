@@ -0,0 +1,115 @@
+import time
+
+import httpx
+import pytest
+from arq import Retry
+from prometheus_client import REGISTRY
+
+from app.core.config import WEBHOOK_BACKOFF_SECONDS, WEBHOOK_MAX_ATTEMPTS
+from app.worker.webhooks import deliver_webhook, resolve_host
+
+DOCUMENT = {"document_uuid": "0d3c2a4e-3b1f-4a8e-9c55-0b1d2e3f4a5b", "status": "SUCCESS", "summary": "Done"}
+
+
+def _attempts(outcome: str) -> float:
+    return REGISTRY.get_sample_value("summarizer_webhook_attempts_total", {"outcome": outcome}) or 0.0
+
+
+@pytest.fixture(autouse=True)
+def _public_dns(monkeypatch):
+    """*.test hosts resolve to a public address (literal IPs still resolve to themselves)."""
+
+    async def resolve(host: str, _port: int) -> list[str]:
+        return ["93.184.215.14"] if host.endswith(".test") else [host]
+
+    monkeypatch.setattr("app.worker.webhooks.resolve_host", resolve)
+
+
+def _ctx(handler, job_try: int = 1) -> dict:
+    return {"webhook_client": httpx.AsyncClient(transport=httpx.MockTransport(handler)), "job_try": job_try}
+
+
+@pytest.mark.asyncio
+async def test_deliver_webhook_posts_the_final_document():
+    received: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append(request)
+        return httpx.Response(204)
+
+    before = _attempts("delivered")
+    await deliver_webhook(_ctx(handler), "https://hooks.test/done", DOCUMENT, time.time())
+
+    assert [str(r.url) for r in received] == ["https://hooks.test/done"]
+    assert received[0].method == "POST" and received[0].read() == httpx.Request("POST", "/", json=DOCUMENT).read()
+    assert _attempts("delivered") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_deliver_webhook_retries_server_errors_with_backoff_until_the_last_attempt():
+    def handler(_request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+
+    with pytest.raises(Retry) as retry:
+        await deliver_webhook(_ctx(handler, job_try=3), "https://hooks.test/done", DOCUMENT, time.time())
+    # third failure: up to 4x the base delay, jittered over the upper half
+    assert WEBHOOK_BACKOFF_SECONDS * 2 <= retry.value.defer_score / 1000 <= WEBHOOK_BACKOFF_SECONDS * 4
+
+    before = _attempts("failed")
+    await deliver_webhook(_ctx(handler, job_try=WEBHOOK_MAX_ATTEMPTS), "https://hooks.test/done", DOCUMENT, 0.0)
+    assert _attempts("failed") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_deliver_webhook_does_not_retry_client_errors():
+    def handler(_request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404)
+
+    before = _attempts("failed")
+    await deliver_webhook(_ctx(handler), "https://hooks.test/gone", DOCUMENT, time.time())
+    assert _attempts("failed") == before + 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "callback_url",
+    [
+        "http://127.0.0.1:6379/",
+        "http://10.0.0.7/hook",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/hook",
+        "http://[::ffff:192.168.1.5]/hook",
+    ],
+)
+async def test_deliver_webhook_refuses_non_public_addresses_without_retrying(callback_url):
+    received: list[httpx.Request] = []
+
+    before = _attempts("refused")
+    await deliver_webhook(_ctx(received.append), callback_url, DOCUMENT, time.time())
+
+    assert received == []
+    assert _attempts("refused") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_deliver_webhook_checks_where_a_host_name_resolves(monkeypatch):
+    async def resolve(host: str, _port: int) -> list[str]:
+        return {"ollama": ["172.18.0.4"], "hooks.internal": ["172.18.0.9"]}[host]
+
+    monkeypatch.setattr("app.worker.webhooks.resolve_host", resolve)
+    monkeypatch.setattr("app.worker.webhooks.WEBHOOK_ALLOWED_HOSTS", {"hooks.internal"})
+    received: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append(request)
+        return httpx.Response(204)
+
+    await deliver_webhook(_ctx(handler), "http://ollama:11434/api/generate", DOCUMENT, time.time())
+    await deliver_webhook(_ctx(handler), "http://hooks.internal/done", DOCUMENT, time.time())
+
+    assert [str(r.url) for r in received] == ["http://hooks.internal/done"]
+
+
+@pytest.mark.asyncio
+async def test_resolve_host_returns_the_addresses_a_connection_would_use():
+    assert set(await resolve_host("127.0.0.1", 80)) == {"127.0.0.1"}
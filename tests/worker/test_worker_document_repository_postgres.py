@@ -0,0 +1,120 @@
+"""WorkerDocumentRepository against a real Postgres: claims and the refresh batch under concurrency."""
+
+import asyncio
+import datetime as dt
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.core.config import CLAIM_STALE_SECONDS
+from app.core.models import Document, DocumentStatus
+from app.worker.domain.worker_document_repository import WorkerDocumentRepository
+
+NOW = dt.datetime.now(dt.timezone.utc)
+DAY = dt.timedelta(days=1)
+
+
+async def _seed(engine, *rows: dict) -> list[str]:
+    """Insert rows (the updated_at trigger only fires on UPDATE, so an old updated_at sticks); returns their uuids.
+
+    Every row gets the same keys: an executemany INSERT is compiled from the first row's.
+    """
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            insert(Document).returning(Document.document_uuid, sort_by_parameter_order=True),
+            [
+                {"name": f"doc-{i}", "url": f"https://doc-{i}.test", "updated_at": NOW, **row}
+                for i, row in enumerate(rows)
+            ],
+        )
+        return [str(uuid) for uuid in result.scalars().all()]
+
+
+async def _statuses(engine) -> dict[str, DocumentStatus]:
+    async with engine.connect() as conn:
+        rows = await conn.execute(select(Document.document_uuid, Document.status))
+        return {str(uuid): status for uuid, status in rows}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_of_one_document_have_a_single_winner(postgres_engine):
+    (doc_id,) = await _seed(postgres_engine, {"status": DocumentStatus.PENDING})
+    repo = WorkerDocumentRepository(bind=postgres_engine)
+
+    claimed = await asyncio.gather(*(repo.claim(doc_id) for _ in range(8)))
+
+    assert [str(doc.document_uuid) for doc in claimed if doc is not None] == [doc_id]
+    assert (await _statuses(postgres_engine))[doc_id] == DocumentStatus.PROCESSING
+
+
+@pytest.mark.asyncio
+async def test_claim_takes_pending_and_abandoned_processing_documents_only(postgres_engine):
+    abandoned = NOW - dt.timedelta(seconds=CLAIM_STALE_SECONDS + 60)
+    pending, running, stale, done = await _seed(
+        postgres_engine,
+        {"status": DocumentStatus.PENDING},
+        {"status": DocumentStatus.PROCESSING},
+        {"status": DocumentStatus.PROCESSING, "updated_at": abandoned},
+        {"status": DocumentStatus.SUCCESS, "updated_at": abandoned},
+    )
+    repo = WorkerDocumentRepository(bind=postgres_engine)
+
+    assert (await repo.claim(pending)) is not None
+    assert (await repo.claim(running)) is None
+    assert (await repo.claim(stale)) is not None
+    assert (await repo.claim(done)) is None
+    assert (await repo.claim(pending)) is None  # already ours
+
+
+@pytest.mark.asyncio
+async def test_mark_stale_pending_takes_the_oldest_finished_documents_first(postgres_engine):
+    oldest, old_failed, old, pending, processing, fresh = await _seed(
+        postgres_engine,
+        {"status": DocumentStatus.SUCCESS, "updated_at": NOW - 30 * DAY},
+        {"status": DocumentStatus.FAILED, "updated_at": NOW - 20 * DAY},
+        {"status": DocumentStatus.SUCCESS, "updated_at": NOW - 10 * DAY},
+        {"status": DocumentStatus.PENDING, "updated_at": NOW - 30 * DAY},
+        {"status": DocumentStatus.PROCESSING, "updated_at": NOW - 30 * DAY},
+        {"status": DocumentStatus.SUCCESS, "updated_at": NOW},
+    )
+    repo = WorkerDocumentRepository(bind=postgres_engine)
+
+    first = await repo.mark_stale_pending(7 * DAY, limit=2)
+    # the update bumped updated_at, so the same rows are not picked again
+    second = await repo.mark_stale_pending(7 * DAY, limit=2)
+
+    assert {str(d.document_uuid) for d in first} == {oldest, old_failed}
+    assert [str(d.document_uuid) for d in second] == [old]
+    statuses = await _statuses(postgres_engine)
+    assert all(statuses[d] == DocumentStatus.PENDING for d in (oldest, old_failed, old, pending))
+    assert statuses[processing] == DocumentStatus.PROCESSING and statuses[fresh] == DocumentStatus.SUCCESS
+
+
+@pytest.mark.asyncio
+async def test_concurrent_mark_stale_pending_calls_never_pick_the_same_document(postgres_engine):
+    stale = await _seed(postgres_engine, *({"status": DocumentStatus.SUCCESS, "updated_at": NOW - 30 * DAY},) * 6)
+    repo = WorkerDocumentRepository(bind=postgres_engine)
+
+    batches = await asyncio.gather(*(repo.mark_stale_pending(7 * DAY, limit=2) for _ in range(3)))
+
+    picked = [str(d.document_uuid) for batch in batches for d in batch]
+    assert sorted(picked) == sorted(stale)
+
+
+@pytest.mark.asyncio
+async def test_iter_unclaimed_pages_through_pending_and_abandoned_documents_oldest_first(postgres_engine):
+    abandoned = NOW - dt.timedelta(seconds=CLAIM_STALE_SECONDS + 60)
+    old_pending, stale, old_pending_2, _running, _done, _fresh = await _seed(
+        postgres_engine,
+        {"status": DocumentStatus.PENDING, "updated_at": NOW - 3 * DAY},
+        {"status": DocumentStatus.PROCESSING, "updated_at": abandoned},
+        {"status": DocumentStatus.PENDING, "updated_at": NOW - 2 * DAY},
+        {"status": DocumentStatus.PROCESSING, "updated_at": NOW - dt.timedelta(minutes=1)},
+        {"status": DocumentStatus.SUCCESS, "updated_at": NOW - 3 * DAY},
+        {"status": DocumentStatus.PENDING},
+    )
+    repo = WorkerDocumentRepository(bind=postgres_engine)
+
+    batches = [batch async for batch in repo.iter_unclaimed(dt.timedelta(hours=1), batch_size=2)]
+
+    assert batches == [[old_pending, old_pending_2], [stale]]
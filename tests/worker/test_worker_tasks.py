@@ -1,26 +1,479 @@
-from unittest.mock import AsyncMock, patch
+import asyncio
+import datetime as dt
+import json
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import ANY, AsyncMock, patch
+import httpx
 import pytest
+from arq import Retry
+from prometheus_client import REGISTRY
 
-from app.worker.tasks import process_document
+from app.core.cache import document_cache_key
+from app.core.config import ORPHAN_PENDING_SECONDS, PROCESS_DOCUMENT_MAX_TRIES
+from app.core.events import document_channel
+from app.core.jobs import followup_job_id, process_document_job_id, rerun_key
+from app.core.schemas import DocumentPriority
+from app.worker.limits import SlotTimeoutError
+from app.worker.ollama_pool import OllamaPool
+from app.worker.tasks import (
+    process_document,
+    refresh_stale_documents,
+    requeue_orphaned_documents,
+    shutdown,
+    startup,
+)
+from app.worker.utils import FetchedPage, content_hash, summary_key
 from app.core.models import Document, DocumentStatus
 
+
+def _cache_hits() -> float:
+    return REGISTRY.get_sample_value("summarizer_summary_cache_lookups_total", {"result": "hit"}) or 0.0
+
+
 @pytest.mark.asyncio
 @patch("app.worker.tasks.call_ollama", new_callable=AsyncMock)
-@patch("app.worker.tasks.fetch_and_extract", new_callable=AsyncMock)
-async def test_worker_task_updates_doc(mock_fetch, mock_ollama, fake_worker_repo):
-    mock_fetch.return_value = "Some fetched content"
+@patch("app.worker.tasks.extract_text", return_value="Some fetched content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_updates_doc(mock_fetch, mock_extract, mock_ollama, fake_worker_repo):
+    mock_fetch.return_value = FetchedPage(text="<html>page</html>", etag='"v1"', last_modified=None)
     mock_ollama.return_value = "Summarized text"
 
     doc = Document(name="Seed", url="https://seed.test", summary=None, status=DocumentStatus.PENDING)
     await fake_worker_repo.add(doc)
 
-    ctx = {"document_repo": fake_worker_repo}
+    fetch_client, ollama_pool = object(), object()
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": fetch_client, "ollama_pool": ollama_pool}
     await process_document(ctx, str(doc.document_uuid))
 
-    mock_fetch.assert_called_once()
-    mock_ollama.assert_called_once()
+    mock_fetch.assert_called_once_with(fetch_client, "https://seed.test", etag=None, last_modified=None)
+    mock_extract.assert_called_once_with("<html>page</html>")
+    mock_ollama.assert_called_once_with(ollama_pool, "Some fetched content", ANY, background=False)
 
     updated = await fake_worker_repo.get_by_id(str(doc.document_uuid))
     assert updated is not None
     assert updated.status == DocumentStatus.SUCCESS
     assert updated.summary == "Summarized text"
+    assert updated.content_hash == content_hash("Some fetched content")
+    assert updated.summary_key == summary_key()
+    assert updated.etag == '"v1"'
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.call_ollama", new_callable=AsyncMock)
+@patch("app.worker.tasks.extract_text", return_value="Unchanged content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_reuses_summary_when_content_unchanged(
+    mock_fetch, _mock_extract, mock_ollama, fake_worker_repo
+):
+    mock_fetch.return_value = FetchedPage(text="<html>page</html>")
+
+    doc = Document(
+        name="Seed",
+        url="https://seed.test",
+        summary="Previous summary",
+        status=DocumentStatus.PENDING,
+        content_hash=content_hash("Unchanged content"),
+    )
+    await fake_worker_repo.add(doc)
+    hits_before = _cache_hits()
+
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": object(), "ollama_pool": object()}
+    await process_document(ctx, str(doc.document_uuid))
+
+    mock_ollama.assert_not_called()
+    updated = await fake_worker_repo.get_by_id(str(doc.document_uuid))
+    assert updated.status == DocumentStatus.SUCCESS
+    assert updated.summary == "Previous summary"
+    assert _cache_hits() == hits_before + 1
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.call_ollama", new_callable=AsyncMock)
+@patch("app.worker.tasks.extract_text")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_not_modified_skips_extraction_and_llm(
+    mock_fetch, mock_extract, mock_ollama, fake_worker_repo
+):
+    mock_fetch.return_value = FetchedPage(etag='"v1"', last_modified="Wed, 01 Oct 2025 10:00:00 GMT", not_modified=True)
+
+    doc = Document(
+        name="Seed",
+        url="https://seed.test",
+        summary="Previous summary",
+        status=DocumentStatus.PENDING,
+        summary_key=summary_key(),
+        etag='"v1"',
+        last_modified="Wed, 01 Oct 2025 10:00:00 GMT",
+    )
+    await fake_worker_repo.add(doc)
+
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": object(), "ollama_pool": object()}
+    await process_document(ctx, str(doc.document_uuid))
+
+    mock_fetch.assert_called_once_with(
+        ctx["fetch_client"], "https://seed.test", etag='"v1"', last_modified="Wed, 01 Oct 2025 10:00:00 GMT"
+    )
+    mock_extract.assert_not_called()
+    mock_ollama.assert_not_called()
+    updated = await fake_worker_repo.get_by_id(str(doc.document_uuid))
+    assert updated.status == DocumentStatus.SUCCESS
+    assert updated.summary == "Previous summary"
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.call_ollama", new_callable=AsyncMock, return_value="Summary by the new model")
+@patch("app.worker.tasks.extract_text", return_value="Unchanged content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_does_not_revalidate_a_summary_of_another_model_or_prompt(
+    mock_fetch, _mock_extract, mock_ollama, fake_worker_repo
+):
+    mock_fetch.return_value = FetchedPage(text="<html>page</html>", etag='"v1"')
+    doc = Document(
+        name="Seed",
+        url="https://seed.test",
+        summary="Summary by the old model",
+        status=DocumentStatus.PENDING,
+        summary_key="old-model:prompt-0",
+        etag='"v1"',
+    )
+    await fake_worker_repo.add(doc)
+
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": object(), "ollama_pool": object()}
+    await process_document(ctx, str(doc.document_uuid))
+
+    # a 304 would have kept the old summary: ask for the full page instead
+    mock_fetch.assert_called_once_with(ctx["fetch_client"], "https://seed.test", etag=None, last_modified=None)
+    mock_ollama.assert_called_once()
+    updated = await fake_worker_repo.get_by_id(str(doc.document_uuid))
+    assert updated.summary == "Summary by the new model" and updated.summary_key == summary_key()
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_skips_document_it_cannot_claim(mock_fetch, fake_worker_repo):
+    doc = Document(name="Seed", url="https://seed.test", summary="Done", status=DocumentStatus.PROCESSING)
+    await fake_worker_repo.add(doc)
+
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": object(), "ollama_pool": object()}
+    await process_document(ctx, str(doc.document_uuid))
+
+    mock_fetch.assert_not_called()
+    assert (await fake_worker_repo.get_by_id(str(doc.document_uuid))).status == DocumentStatus.PROCESSING
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.extract_text", return_value="Some fetched content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_publishes_status_and_progress_events(
+    mock_fetch, _mock_extract, fake_worker_repo, fake_redis
+):
+    mock_fetch.return_value = FetchedPage(text="<html>page</html>")
+
+    async def fake_ollama(_client, _content, on_progress, **_kwargs):
+        await on_progress("Summarized ", 1, False)
+        await on_progress("text", 2, True)
+        return "Summarized text"
+
+    doc = Document(name="Seed", url="https://seed.test", summary=None, status=DocumentStatus.PENDING)
+    await fake_worker_repo.add(doc)
+
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": object(), "ollama_pool": object(), "redis": fake_redis}
+    with patch("app.worker.tasks.call_ollama", side_effect=fake_ollama):
+        await process_document(ctx, str(doc.document_uuid))
+
+    assert {channel for channel, _ in fake_redis.published} == {document_channel(str(doc.document_uuid))}
+    events = [event for _, event in fake_redis.published]
+    assert [e["type"] for e in events] == ["status", "progress", "progress", "status"]
+    assert events[0]["status"] == "PROCESSING"
+    assert events[2]["partial_summary"] == "Summarized text" and events[2]["tokens"] == 2
+    assert events[-1]["status"] == "SUCCESS" and events[-1]["summary"] == "Summarized text"
+    # the API's GET cache holds the final state
+    cached = json.loads(fake_redis.keys[document_cache_key(str(doc.document_uuid))])
+    assert cached["status"] == "SUCCESS" and cached["summary"] == "Summarized text"
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.call_ollama", new_callable=AsyncMock, return_value="Summary of first fetch")
+@patch("app.worker.tasks.extract_text", return_value="Some fetched content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_schedules_one_followup_when_resubmitted_during_run(
+    mock_fetch, _mock_extract, _mock_ollama, fake_worker_repo, fake_redis):
+    doc = Document(name="Seed", url="https://seed.test", summary=None, status=DocumentStatus.PENDING)
+    await fake_worker_repo.add(doc)
+    doc_id = str(doc.document_uuid)
+    fake_redis.keys[rerun_key(doc_id)] = b"1"  # coalesced while queued: satisfied by this run
+
+    async def fetch_and_get_resubmitted(*_args, **_kwargs):
+        fake_redis.keys[rerun_key(doc_id)] = b"1"  # coalesced while running
+        return FetchedPage(text="<html>page</html>")
+
+    mock_fetch.side_effect = fetch_and_get_resubmitted
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": object(), "ollama_pool": object(), "redis": fake_redis}
+    await process_document(ctx, doc_id)
+
+    updated = await fake_worker_repo.get_by_id(doc_id)
+    assert updated.summary == "Summary of first fetch"
+    assert updated.status == DocumentStatus.PENDING
+    assert fake_redis.jobs == [("process_document", (doc_id,), followup_job_id(doc_id))]
+    assert rerun_key(doc_id) not in fake_redis.keys
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.call_ollama", new_callable=AsyncMock, return_value="Summary of second fetch")
+@patch("app.worker.tasks.extract_text", return_value="Some fetched content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_resubmitted_during_a_followup_run_hands_back_to_the_main_job_id(
+    mock_fetch, _mock_extract, _mock_ollama, fake_worker_repo, fake_redis):
+    doc = Document(name="Seed", url="https://seed.test", summary=None, status=DocumentStatus.PENDING)
+    await fake_worker_repo.add(doc)
+    doc_id = str(doc.document_uuid)
+
+    async def fetch_and_get_resubmitted(*_args, **_kwargs):
+        fake_redis.keys[rerun_key(doc_id)] = b"1"  # coalesced into the follow-up run
+        return FetchedPage(text="<html>page</html>")
+
+    mock_fetch.side_effect = fetch_and_get_resubmitted
+    ctx = {
+        "document_repo": fake_worker_repo,
+        "fetch_client": object(),
+        "ollama_pool": object(),
+        "redis": fake_redis,
+        "job_id": followup_job_id(doc_id),
+    }
+    await process_document(ctx, doc_id)
+
+    # the follow-up's own id is still taken, the main one was released when the first run returned
+    assert fake_redis.jobs == [("process_document", (doc_id,), process_document_job_id(doc_id))]
+    assert (await fake_worker_repo.get_by_id(doc_id)).status == DocumentStatus.PENDING
+
+
+async def _never_answers(*_args, **_kwargs):
+    await asyncio.Event().wait()
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.PROCESS_DOCUMENT_TIME_LIMIT", 0.05)
+@patch("app.worker.tasks.call_ollama", side_effect=_never_answers)
+@patch("app.worker.tasks.extract_text", return_value="Some fetched content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_out_of_time_marks_the_document_failed(
+    mock_fetch, _mock_extract, _mock_ollama, fake_worker_repo, fake_redis):
+    mock_fetch.return_value = FetchedPage(text="<html>page</html>")
+    doc = Document(
+        name="Seed",
+        url="https://seed.test",
+        summary=None,
+        status=DocumentStatus.PENDING,
+        callback_url="https://hooks.test/done",
+    )
+    await fake_worker_repo.add(doc)
+    doc_id = str(doc.document_uuid)
+
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": object(), "ollama_pool": object(), "redis": fake_redis}
+    await process_document(ctx, doc_id)
+
+    assert (await fake_worker_repo.get_by_id(doc_id)).status == DocumentStatus.FAILED
+    assert fake_redis.published[-1][1]["status"] == "FAILED"
+    assert [job[0] for job in fake_redis.jobs] == ["deliver_webhook"]  # a normal failure, webhook included
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("job_try", [1, PROCESS_DOCUMENT_MAX_TRIES])
+@patch("app.worker.tasks.call_ollama", side_effect=SlotTimeoutError("No llm slot free after 300s (limit 2)"))
+@patch("app.worker.tasks.extract_text", return_value="Some fetched content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_without_a_free_llm_slot_retries_later_until_its_last_try(
+    mock_fetch, _mock_extract, _mock_ollama, job_try, fake_worker_repo, fake_redis):
+    mock_fetch.return_value = FetchedPage(text="<html>page</html>")
+    doc = Document(name="Seed", url="https://seed.test", summary="Old", status=DocumentStatus.PENDING)
+    await fake_worker_repo.add(doc)
+    doc_id = str(doc.document_uuid)
+    ctx = {
+        "document_repo": fake_worker_repo,
+        "fetch_client": object(),
+        "ollama_pool": object(),
+        "redis": fake_redis,
+        "job_try": job_try,
+    }
+
+    if job_try < PROCESS_DOCUMENT_MAX_TRIES:
+        with pytest.raises(Retry):
+            await process_document(ctx, doc_id)
+        # handed back for the deferred try, which can claim it again
+        assert (await fake_worker_repo.get_by_id(doc_id)).status == DocumentStatus.PENDING
+    else:
+        await process_document(ctx, doc_id)
+        assert (await fake_worker_repo.get_by_id(doc_id)).status == DocumentStatus.FAILED
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.call_ollama", side_effect=_never_answers)
+@patch("app.worker.tasks.extract_text", return_value="Some fetched content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_cancelled_by_shutdown_hands_the_document_back_for_the_retry(
+    mock_fetch, _mock_extract, _mock_ollama, fake_worker_repo, fake_redis):
+    mock_fetch.return_value = FetchedPage(text="<html>page</html>")
+    doc = Document(name="Seed", url="https://seed.test", summary=None, status=DocumentStatus.PENDING)
+    await fake_worker_repo.add(doc)
+    doc_id = str(doc.document_uuid)
+
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": object(), "ollama_pool": object(), "redis": fake_redis}
+    task = asyncio.create_task(process_document(ctx, doc_id))
+    await asyncio.sleep(0.05)
+    task.cancel()  # what arq does to running jobs on SIGTERM
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert (await fake_worker_repo.get_by_id(doc_id)).status == DocumentStatus.PENDING
+    assert fake_redis.published[-1][1]["status"] == "PENDING"
+    # arq's retry can claim it again
+    assert await fake_worker_repo.claim(doc_id) is not None
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.call_ollama", new_callable=AsyncMock, return_value="Summarized text")
+@patch("app.worker.tasks.extract_text", return_value="Some fetched content")
+@patch("app.worker.tasks.fetch_page", new_callable=AsyncMock)
+async def test_worker_task_hands_the_final_document_to_the_webhook_queue(
+    mock_fetch, _mock_extract, _mock_ollama, fake_worker_repo, fake_redis):
+    mock_fetch.return_value = FetchedPage(text="<html>page</html>")
+    doc = Document(
+        name="Hooked", url="https://hooked.test", status=DocumentStatus.PENDING, callback_url="https://hooks.test/done"
+    )
+    await fake_worker_repo.add(doc)
+
+    ctx = {"document_repo": fake_worker_repo, "fetch_client": object(), "ollama_pool": object(), "redis": fake_redis}
+    await process_document(ctx, str(doc.document_uuid))
+
+    [(function, (callback_url, payload, _completed_at), _job_id)] = fake_redis.jobs
+    assert (function, callback_url) == ("deliver_webhook", "https://hooks.test/done")
+    assert payload["status"] == "SUCCESS" and payload["summary"] == "Summarized text"
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_worker_startup_creates_and_shutdown_closes_http_clients(monkeypatch):
+    monkeypatch.setattr("app.worker.tasks.WORKER_METRICS_PORT", _free_port())
+    ctx = {}
+    await startup(ctx)
+    metrics_port = ctx["metrics_server"].server_port
+    scrape = await asyncio.to_thread(httpx.get, f"http://127.0.0.1:{metrics_port}/metrics")
+    assert "summarizer_job_stage_seconds" in scrape.text
+    fetch_client, ollama_pool = ctx["fetch_client"], ctx["ollama_pool"]
+    assert isinstance(fetch_client, httpx.AsyncClient)
+    assert isinstance(ollama_pool, OllamaPool)
+    assert fetch_client is not ollama_pool.client
+    assert isinstance(ctx["extract_pool"], ProcessPoolExecutor)
+
+    await shutdown(ctx)
+    assert fetch_client.is_closed and ollama_pool.client.is_closed
+    assert "fetch_client" not in ctx and "ollama_pool" not in ctx and "extract_pool" not in ctx
+    assert "metrics_server" not in ctx
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.CLAIM_STALE_SECONDS", 900)
+@patch("app.worker.tasks.PROCESS_DOCUMENT_TIMEOUT", 1800)
+async def test_worker_startup_refuses_a_claim_cutoff_shorter_than_the_job_timeout():
+    ctx = {}
+    with pytest.raises(RuntimeError, match="CLAIM_STALE_SECONDS"):
+        await startup(ctx)
+    assert ctx == {}
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.REFRESH_RATE_PER_SECOND", 1000.0)
+@patch("app.worker.tasks.REFRESH_BATCH_SIZE", 2)
+@patch("app.worker.tasks.cache_documents", new_callable=AsyncMock)
+@patch("app.worker.tasks.enqueue_documents", new_callable=AsyncMock)
+@patch("app.worker.tasks.queue_depth", new_callable=AsyncMock, return_value=0)
+async def test_refresh_enqueues_stale_finished_documents_in_batches_on_the_bulk_queue(
+    _mock_depth, mock_enqueue, _mock_cache, fake_worker_repo
+):
+    old = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=30)
+    docs = []
+    for i, status in enumerate(
+        [DocumentStatus.SUCCESS, DocumentStatus.FAILED, DocumentStatus.SUCCESS, DocumentStatus.PROCESSING]
+    ):
+        doc = await fake_worker_repo.add(Document(name=f"Doc {i}", url=f"https://{i}.test", status=status))
+        doc.updated_at = old + dt.timedelta(minutes=i)
+        docs.append(doc)
+    fresh = await fake_worker_repo.add(Document(name="Fresh", url="https://fresh.test", status=DocumentStatus.SUCCESS))
+
+    queued = await refresh_stale_documents({"redis": object(), "document_repo": fake_worker_repo})
+
+    assert queued == 3
+    batches = [(c.args[1], c.args[2]) for c in mock_enqueue.await_args_list]
+    assert batches == [
+        ([str(docs[0].document_uuid), str(docs[1].document_uuid)], DocumentPriority.BULK),
+        ([str(docs[2].document_uuid)], DocumentPriority.BULK),
+    ]
+    assert [d.status for d in docs] == [DocumentStatus.PENDING] * 3 + [DocumentStatus.PROCESSING]
+    assert fresh.status == DocumentStatus.SUCCESS
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.cache_documents", new_callable=AsyncMock)
+@patch("app.worker.tasks.enqueue_documents", new_callable=AsyncMock)
+@patch("app.worker.tasks.queue_depth", new_callable=AsyncMock, return_value=0)
+async def test_documents_a_failed_refresh_left_pending_are_picked_up_by_the_orphan_sweep(
+    _mock_depth, mock_enqueue, _mock_cache, fake_worker_repo
+):
+    doc = await fake_worker_repo.add(Document(name="Stale", url="https://stale.test", status=DocumentStatus.SUCCESS))
+    doc.updated_at = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=30)
+    ctx = {"redis": object(), "document_repo": fake_worker_repo}
+    mock_enqueue.side_effect = ConnectionError("redis went away")
+
+    with pytest.raises(ConnectionError):
+        await refresh_stale_documents(ctx)
+    assert doc.status == DocumentStatus.PENDING
+
+    mock_enqueue.reset_mock(side_effect=True)
+    mock_enqueue.return_value = 1
+    assert await requeue_orphaned_documents(ctx) == 0  # not yet: it may still be on its way to the queue
+    doc.updated_at -= dt.timedelta(seconds=ORPHAN_PENDING_SECONDS)
+    assert await requeue_orphaned_documents(ctx) == 1
+    assert mock_enqueue.await_args.args[1] == [str(doc.document_uuid)]
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.enqueue_documents", new_callable=AsyncMock)
+@patch("app.worker.tasks.queue_depth", new_callable=AsyncMock, return_value=10_000)
+async def test_refresh_skips_while_the_bulk_queue_is_still_full(_mock_depth, mock_enqueue, fake_worker_repo):
+    assert await refresh_stale_documents({"redis": object(), "document_repo": fake_worker_repo}) == 0
+    mock_enqueue.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.worker.tasks.ORPHAN_SWEEP_BATCH_SIZE", 2)
+@patch("app.worker.tasks.enqueue_documents", new_callable=AsyncMock, side_effect=lambda _redis, uuids, *_a, **_k: 1)
+async def test_orphan_sweep_enqueues_documents_waiting_without_a_job(mock_enqueue, fake_worker_repo):
+    long_ago = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=1)
+    docs = {}
+    for name, status in [
+        ("old-pending", DocumentStatus.PENDING),
+        ("abandoned", DocumentStatus.PROCESSING),
+        ("old-pending-2", DocumentStatus.PENDING),
+        ("done", DocumentStatus.SUCCESS),
+        ("fresh-pending", DocumentStatus.PENDING),
+    ]:
+        docs[name] = await fake_worker_repo.add(Document(name=name, url=f"https://{name}.test", status=status))
+    for i, name in enumerate(["old-pending", "abandoned", "old-pending-2", "done"]):
+        docs[name].updated_at = long_ago + dt.timedelta(minutes=i)
+
+    requeued = await requeue_orphaned_documents({"redis": object(), "document_repo": fake_worker_repo})
+
+    uuid = {name: str(doc.document_uuid) for name, doc in docs.items()}
+    assert [c.args[1] for c in mock_enqueue.await_args_list] == [
+        [uuid["old-pending"], uuid["abandoned"]],
+        [uuid["old-pending-2"]],
+    ]
+    # the ones that still have a job are skipped, and must not be taken for resubmissions
+    calls = mock_enqueue.await_args_list
+    assert all(c.args[2] is DocumentPriority.BULK and c.kwargs == {"coalesce": False} for c in calls)
+    assert requeued == 2
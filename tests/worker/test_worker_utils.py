@@ -0,0 +1,169 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.exceptions import UnsupportedContentTypeError
+from app.worker import utils
+from app.worker.ollama_pool import OllamaPool
+from app.worker.utils import call_ollama, estimate_tokens, fetch_page, split_into_chunks
+
+
+def _ndjson(*chunks: dict) -> str:
+    return "".join(json.dumps(c) + "\n" for c in chunks)
+
+
+def _ollama_pool(handler) -> OllamaPool:
+    return OllamaPool(httpx.AsyncClient(transport=httpx.MockTransport(handler)), ["http://ollama.test"])
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_sends_validators_and_handles_304():
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.update(request.headers)
+        return httpx.Response(304, headers={"ETag": '"v2"'})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        page = await fetch_page(client, "https://seed.test", etag='"v1"', last_modified="Wed, 01 Oct 2025 10:00:00 GMT")
+
+    assert seen["if-none-match"] == '"v1"'
+    assert seen["if-modified-since"] == "Wed, 01 Oct 2025 10:00:00 GMT"
+    assert page.not_modified
+    assert page.etag == '"v2"'
+    assert page.last_modified == "Wed, 01 Oct 2025 10:00:00 GMT"
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_rejects_non_html_before_reading_the_body():
+    async def body():
+        raise AssertionError("body must not be read")
+        yield b""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"Content-Type": "application/pdf"}, content=body())
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(UnsupportedContentTypeError):
+            await fetch_page(client, "https://seed.test/report.pdf")
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_truncates_at_byte_cap_and_decodes_incrementally():
+    html = "<html><head><meta charset='iso-8859-1'></head><body>" + "é" * 100 + "</body></html>"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        # 16-byte chunks of latin-1 declared only in the <meta> tag
+        encoded = html.encode("latin-1")
+
+        async def chunks():
+            for i in range(0, len(encoded), 16):
+                yield encoded[i : i + 16]
+
+        return httpx.Response(200, headers={"Content-Type": "text/html"}, content=chunks())
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        page = await fetch_page(client, "https://seed.test", max_bytes=100)
+        full = await fetch_page(client, "https://seed.test")
+
+    assert page.truncated and len(page.text) == 100
+    assert page.text.endswith("é")
+    assert not full.truncated and full.text == html
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_drops_a_multibyte_character_cut_at_the_cap():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"Content-Type": "text/html; charset=utf-8"}, content="ééé".encode())
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        page = await fetch_page(client, "https://seed.test", max_bytes=5)
+
+    assert page.truncated and page.text == "éé"
+
+
+def test_split_into_chunks_respects_budget_and_overlap():
+    text = " ".join(f"w{i:03d}" for i in range(200))  # every word is ~2 tokens
+
+    chunks = split_into_chunks(text, chunk_tokens=20, overlap_tokens=4)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c) <= 20 for c in chunks)
+    # consecutive chunks share their boundary words, and nothing is lost
+    assert chunks[0].split()[-2:] == chunks[1].split()[:2]
+    assert chunks[-1].split()[-1] == "w199"
+
+
+@pytest.mark.asyncio
+async def test_call_ollama_map_reduce_bounds_fan_out(monkeypatch):
+    monkeypatch.setattr(utils, "SUMMARY_CHUNK_TOKENS", 50)
+    monkeypatch.setattr(utils, "SUMMARY_CHUNK_OVERLAP_TOKENS", 0)
+    monkeypatch.setattr(utils, "SUMMARY_CHUNK_PARALLELISM", 2)
+
+    prompts: list[str] = []
+    in_flight = peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        prompt = json.loads(request.content)["prompt"]
+        prompts.append(prompt)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        answer = "final summary" if prompt.startswith("The following are summaries") else "part"
+        return httpx.Response(200, text=_ndjson({"response": answer, "done": True}))
+
+    content = "lorem ipsum " * 200  # 400 words of ~2 tokens -> 16 chunks
+    pool = _ollama_pool(handler)
+    summary = await call_ollama(pool, content)
+    await pool.aclose()
+
+    assert summary == "final summary"
+    assert len(prompts) == 17  # 16 map calls + 1 reduce
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_call_ollama_short_text_is_single_pass():
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, text=_ndjson({"response": "x" * 5000, "done": True}))
+
+    pool = _ollama_pool(handler)
+    summary = await call_ollama(pool, "short text")
+    await pool.aclose()
+
+    assert calls == 1
+    assert len(summary) == utils.MAX_SUMMARY_CHARS
+
+
+@pytest.mark.asyncio
+async def test_call_ollama_streams_tokens_to_progress_callback():
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(
+            200,
+            text=_ndjson(
+                {"response": "Short ", "done": False},
+                {"response": "summary.", "done": False},
+                {"response": "", "done": True, "eval_count": 2},
+            ),
+        )
+
+    seen: list[tuple[str, int, bool]] = []
+
+    async def on_progress(piece: str, tokens: int, done: bool) -> None:
+        seen.append((piece, tokens, done))
+
+    pool = _ollama_pool(handler)
+    summary = await call_ollama(pool, "short text", on_progress)
+    await pool.aclose()
+
+    assert summary == "Short summary."
+    assert seen == [("Short ", 1, False), ("summary.", 2, False), ("", 2, True)]